@@ -1,20 +1,50 @@
 """Server app config."""
 
+import asyncio as aio
+from collections.abc import Callable
 from contextlib import asynccontextmanager
+from typing import Any
 
-import logfire
-import rollbar
-from beanie import init_beanie
+from beanie import Document
 from fastapi import FastAPI
-from motor.motor_asyncio import AsyncIOMotorClient
-from rollbar.contrib.fastapi import ReporterMiddleware
 from starlette.middleware.cors import CORSMiddleware
 
 from account.config import CONFIG
-from account.models.addon import Addon
-from account.models.plan import Plan
-from account.models.token import TokenUsage
+from account.models.addon import Addon, addons
+from account.models.cache import portal_cache, user_cache
+from account.models.database import init_models, mongo_client
+from account.models.mailing import MailingJob
+from account.models.notification import Notification
+from account.models.outbox import OutboxEmail
+from account.models.plan import Plan, plans
+from account.models.subscription import SubscriptionMirror
+from account.models.token import TokenUsage, TokenUsageMonth, UserUsageMonth
 from account.models.user import User
+from account.models.webhook import WebhookEvent
+from account.startup import startup_timer
+from account.util.billing import billing
+from account.util.mailing import mailchimp, mailing_worker
+from account.util.migration import notifications_migrated
+from account.util.outbox import mail_worker
+from account.util.password import password_pool
+from account.util.recaptcha import recaptcha
+from account.util.rollup import rollup_worker
+from account.util.smtp import smtp_pool
+from account.util.webhook import webhook_worker
+
+DOCUMENTS: list[type[Document]] = [
+    Addon,
+    MailingJob,
+    Notification,
+    OutboxEmail,
+    Plan,
+    SubscriptionMirror,
+    TokenUsage,
+    TokenUsageMonth,
+    User,
+    UserUsageMonth,
+    WebhookEvent,
+]
 
 DESCRIPTION = """
 This API powers the account management portal
@@ -27,17 +57,55 @@ It supports:
 """
 
 
+def no_auto_trace[F: Callable[..., Any]](func: F) -> F:
+    """Keep a function out of logfire auto tracing without importing logfire.
+
+    Auto tracing matches the decorator by name, so this behaves like logfire.no_auto_trace.
+    """
+    return func
+
+
 @asynccontextmanager
-@logfire.no_auto_trace
+@no_auto_trace
 async def lifespan(app: FastAPI):  # type: ignore
     """Initialize application services."""
+    # Time spent in the server between mounting routers and starting the app
+    startup_timer.phase("server")
     # Init Database
-    client: AsyncIOMotorClient = AsyncIOMotorClient(CONFIG.mongo_uri.strip('"'))
+    client = mongo_client()
+    await client.admin.command("ping")
     app.state.db = client[CONFIG.database]
-    documents = [Addon, Plan, TokenUsage, User]
-    await init_beanie(app.state.db, document_models=documents)  # type: ignore
-    print("Startup complete")
+    startup_timer.phase("mongo_connect")
+    await init_models(app.state.db, DOCUMENTS, skip_indexes=CONFIG.skip_indexes)
+    # The user model no longer has the field, so any save would erase unmigrated notifications
+    if not await notifications_migrated():
+        msg = "Users still have embedded notifications. Run util/migrate_notifications.py first"
+        raise RuntimeError(msg)
+    startup_timer.phase("beanie_init")
+    user_cache.clear()
+    portal_cache.clear()
+    await plans.refresh()
+    await addons.refresh()
+    startup_timer.phase("catalogs")
+    recaptcha.start()
+    tasks = []
+    if CONFIG.usage_rollup_interval > 0 and not CONFIG.testing:
+        tasks.append(aio.create_task(rollup_worker(CONFIG.usage_rollup_interval)))
+    if not CONFIG.testing:
+        tasks += [aio.create_task(webhook_worker()) for _ in range(CONFIG.webhook_workers)]
+        tasks += [aio.create_task(mail_worker()) for _ in range(CONFIG.mail_workers)]
+        if mailchimp.enabled:
+            tasks.append(aio.create_task(mailing_worker()))
+    startup_timer.phase("workers")
+    print(f"Startup complete: {startup_timer.report()}")
     yield
+    for task in tasks:
+        task.cancel()
+    password_pool.shutdown()
+    billing.shutdown()
+    mailchimp.shutdown()
+    await smtp_pool.close()
+    await recaptcha.close()
     print("Shutdown complete")
 
 
@@ -59,6 +127,9 @@ app = FastAPI(
 
 # Init error logging
 if CONFIG.log_key:
+    import rollbar
+    from rollbar.contrib.fastapi import ReporterMiddleware
+
     rollbar.init(CONFIG.log_key, environment="production", handler="async")
     app.add_middleware(ReporterMiddleware)
 
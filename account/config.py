@@ -10,10 +10,39 @@ class Settings(BaseModel):
     # Mongo Engine settings
     mongo_uri: str = config("MONGO_URI", default="mongodb://localhost:27017")
     database: str = "account"
+    # Connections per process. Each uvicorn worker has its own pool
+    mongo_max_pool_size: int = config("MONGO_MAX_POOL_SIZE", default=100, cast=int)
+    mongo_min_pool_size: int = config("MONGO_MIN_POOL_SIZE", default=0, cast=int)
+    # Seconds an unused pooled connection is kept open. 0 keeps them indefinitely
+    mongo_max_idle_time: float = config("MONGO_MAX_IDLE_TIME", default=0, cast=float)
+    # Comma-separated wire compressors in order of preference, such as "zstd,zlib"
+    mongo_compressors: str = config("MONGO_COMPRESSORS", default="")
+    # Default read preference and the one used by read-only routes
+    mongo_read_preference: str = config("MONGO_READ_PREFERENCE", default="primary")
+    mongo_secondary_reads: str = config("MONGO_SECONDARY_READS", default="secondaryPreferred")
+    # Max seconds a secondary may lag and still serve reads. -1 has no limit, otherwise at least 90
+    mongo_max_staleness: int = config("MONGO_MAX_STALENESS", default=-1, cast=int)
+    # Start without checking or building indexes. Run util/sync_indexes.py on deploy instead
+    skip_indexes: bool = config("SKIP_INDEXES", default=False, cast=bool)
+    notification_ttl_days: int = config("NOTIFICATION_TTL_DAYS", default=90, cast=int)
+    # Seconds between monthly usage rollup refreshes. 0 disables rollups
+    usage_rollup_interval: int = config("USAGE_ROLLUP_INTERVAL", default=300, cast=int)
+    # Seconds one server process holds the rollup job. Renewed every interval
+    usage_rollup_lease: float = config("USAGE_ROLLUP_LEASE", default=900, cast=float)
+    # Seconds before the rollup watermark that are rescanned each refresh. Daily usage
+    # written late with an older update time is only picked up within this window
+    usage_rollup_overlap: float = config("USAGE_ROLLUP_OVERLAP", default=3600, cast=float)
+
+    # In-process user cache
+    user_cache_size: int = config("USER_CACHE_SIZE", default=1024, cast=int)
+    user_cache_ttl: float = config("USER_CACHE_TTL", default=5, cast=float)
+    # Seconds before the plan and addon catalogs are reloaded
+    catalog_ttl: float = config("CATALOG_TTL", default=300, cast=float)
 
     # Security settings
     authjwt_secret_key: str = config("SECRET_KEY")
     salt: bytes = config("SALT").encode()
+    password_workers: int = config("PASSWORD_WORKERS", default=2, cast=int)
 
     # FastMail SMTP server settings
     mail_console: bool = config("MAIL_CONSOLE", default=False, cast=bool)
@@ -21,24 +50,84 @@ class Settings(BaseModel):
     mail_port: int = config("MAIL_PORT", default=587, cast=int)
     mail_username: str = config("MAIL_USERNAME", default="")
     mail_password: str = config("MAIL_PASSWORD", default="")
+    # Disable only for local relays without TLS
+    mail_starttls: bool = config("MAIL_STARTTLS", default=True, cast=bool)
     mail_sender: str = config("MAIL_SENDER", default="noreply@avwx.rest")
+    # Open SMTP connections kept per process
+    mail_pool_size: int = config("MAIL_POOL_SIZE", default=3, cast=int)
+    # Seconds before an unused SMTP connection is replaced
+    mail_idle_timeout: float = config("MAIL_IDLE_TIMEOUT", default=60, cast=float)
+    mail_timeout: float = config("MAIL_TIMEOUT", default=10, cast=float)
+    # Background outbox delivery. 0 workers leaves emails in the outbox
+    mail_workers: int = config("MAIL_WORKERS", default=3, cast=int)
+    mail_max_attempts: int = config("MAIL_MAX_ATTEMPTS", default=6, cast=int)
+    # Seconds before the first retry, doubled on each attempt
+    mail_retry_delay: float = config("MAIL_RETRY_DELAY", default=30, cast=float)
+    # Seconds a worker may hold an email before another worker can reclaim it
+    mail_lease: float = config("MAIL_LEASE", default=60, cast=float)
+    mail_retention_days: int = config("MAIL_RETENTION_DAYS", default=7, cast=int)
 
     # Mailchimp Mailing List
     mc_key: str = config("MC_KEY", default="")
     mc_list_id: str = config("MC_LIST_ID", default="")
     mc_username: str = config("MC_USERNAME", default="")
+    # Alternate API root, such as a local fake for testing
+    mc_api_base: str = config("MC_API_BASE", default="")
+    # Max concurrent Mailchimp API calls per process
+    mc_workers: int = config("MC_WORKERS", default=2, cast=int)
+    # Seconds before a single Mailchimp API request times out
+    mc_timeout: float = config("MC_TIMEOUT", default=10, cast=float)
+    # Max list changes sent in one batch operation
+    mc_batch_size: int = config("MC_BATCH_SIZE", default=500, cast=int)
+    # Seconds between partial batches, letting repeated changes to an email coalesce
+    mc_sync_interval: float = config("MC_SYNC_INTERVAL", default=10, cast=float)
+    # Seconds between batch status checks and the most to wait for a batch to finish
+    mc_batch_poll: float = config("MC_BATCH_POLL", default=2, cast=float)
+    mc_batch_timeout: float = config("MC_BATCH_TIMEOUT", default=300, cast=float)
+    mc_max_attempts: int = config("MC_MAX_ATTEMPTS", default=6, cast=int)
+    # Seconds before the first retry, doubled on each attempt
+    mc_retry_delay: float = config("MC_RETRY_DELAY", default=60, cast=float)
+    # Seconds a worker may hold a job before another worker can reclaim it
+    mc_lease: float = config("MC_LEASE", default=600, cast=float)
 
     # Stripe Payments
     root_url: str = config("ROOT_URL", default="http://use.ngrok.for.this.locally")
     stripe_pub_key: str = config("STRIPE_PUB_KEY", default="")
     stripe_secret_key: str = config("STRIPE_SECRET_KEY", default="")
     stripe_sign_secret: str = config("STRIPE_SIGN_SECRET", default="")
+    # Max concurrent Stripe API calls per process
+    stripe_workers: int = config("STRIPE_WORKERS", default=8, cast=int)
+    # Seconds before a single Stripe API request times out
+    stripe_timeout: int = config("STRIPE_TIMEOUT", default=10, cast=int)
+    stripe_max_retries: int = config("STRIPE_MAX_RETRIES", default=2, cast=int)
+    # Alternate API host, such as a local fake for testing
+    stripe_api_base: str = config("STRIPE_API_BASE", default="")
+    # Background webhook processing. 0 workers leaves events in the inbox
+    webhook_workers: int = config("WEBHOOK_WORKERS", default=4, cast=int)
+    webhook_max_attempts: int = config("WEBHOOK_MAX_ATTEMPTS", default=8, cast=int)
+    # Seconds before the first retry, doubled on each attempt
+    webhook_retry_delay: float = config("WEBHOOK_RETRY_DELAY", default=5, cast=float)
+    # Seconds a worker may hold an event before another worker can reclaim it
+    webhook_lease: float = config("WEBHOOK_LEASE", default=120, cast=float)
+    webhook_retention_days: int = config("WEBHOOK_RETENTION_DAYS", default=30, cast=int)
+    # Seconds a billing portal URL is reused. Keep below Stripe's session lifetime
+    portal_cache_ttl: float = config("PORTAL_CACHE_TTL", default=240, cast=float)
+    # Seconds a subscription mirror is trusted without hearing from Stripe. Keep it short
+    # since item IDs from a mirror missing subscription webhooks are rejected by Stripe
+    subscription_mirror_ttl: int = config("SUBSCRIPTION_MIRROR_TTL", default=300, cast=int)
 
     # Logging
     log_key: str = config("LOG_KEY", default="")
 
     # reCaptcha
     recaptcha_secret_key: str = config("RECAPTCHA_SECRET_KEY", default="")
+    # Seconds registration waits on the verification call
+    recaptcha_timeout: float = config("RECAPTCHA_TIMEOUT", default=1.5, cast=float)
+    # Accept registrations without a bot check while the service is failing. Off rejects them
+    recaptcha_fail_open: bool = config("RECAPTCHA_FAIL_OPEN", default=False, cast=bool)
+    # Consecutive failed calls that open the breaker, and seconds before it tries again
+    recaptcha_failure_threshold: int = config("RECAPTCHA_FAILURE_THRESHOLD", default=5, cast=int)
+    recaptcha_reset_after: float = config("RECAPTCHA_RESET_AFTER", default=30, cast=float)
 
     admin_root: str = config("ADMIN_ROOT", default="")
     testing: bool = config("TESTING", default=False, cast=bool)
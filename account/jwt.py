@@ -5,7 +5,8 @@ from datetime import timedelta
 from fastapi_jwt import JwtAccessBearer, JwtAuthorizationCredentials, JwtRefreshBearer
 
 from account.config import CONFIG
-from account.models.user import User
+from account.models.cache import user_cache
+from account.models.user import User, View
 
 ACCESS_EXPIRES = timedelta(minutes=15)
 REFRESH_EXPIRES = timedelta(days=30)
@@ -25,7 +26,22 @@ refresh_security = JwtRefreshBearer(
 
 async def user_from_credentials(auth: JwtAuthorizationCredentials) -> User | None:
     """Return the user associated with auth credentials."""
-    return await User.by_email(auth.subject["username"])
+    email = auth.subject["username"]
+    if (user := user_cache.get(email)) is not None:
+        return user
+    epoch = user_cache.epoch
+    user = await User.by_email(email)
+    if user is not None:
+        user_cache.set(email, user, epoch)
+    return user
+
+
+async def view_from_credentials(auth: JwtAuthorizationCredentials, view: type[View]) -> View | None:
+    """Return a partial user view associated with auth credentials."""
+    email = auth.subject["username"]
+    if (user := user_cache.get(email)) is not None:
+        return view.model_validate(user, from_attributes=True)
+    return await User.view_by_email(email, view)
 
 
 async def user_from_token(token: str) -> User | None:
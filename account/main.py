@@ -1,9 +1,23 @@
 """Server main runtime."""
 
+import os
+import sys
+
+from account.startup import startup_timer
+
+# Pydantic loads every installed plugin on the first model, which would import logfire
+# and its OpenTelemetry stack. Only keep it when logfire was set up first like in ../main.py
+if "logfire" not in sys.modules:
+    os.environ.setdefault("PYDANTIC_DISABLE_PLUGINS", "logfire-plugin")
+
+# isort: split
+
 from account import routes
 from account.app import app
 from account.config import CONFIG
 
+startup_timer.phase("imports")
+
 for router in routes.ROUTERS:
     app.include_router(router)
 
@@ -11,3 +25,5 @@ if CONFIG.admin_root:
     from account.routes import admin
 
     app.include_router(admin.router)
+
+startup_timer.phase("routers")
@@ -1,10 +1,19 @@
 """Plan add-on models."""
 
-from typing import Self
-
-from beanie import Document
+from beanie import (
+    Delete,
+    Document,
+    Insert,
+    Replace,
+    Save,
+    SaveChanges,
+    Update,
+    after_event,
+)
 from pydantic import BaseModel
 
+from account.models.catalog import Catalog
+
 
 class AddonOut(BaseModel):
     """Addon fields returned to the user."""
@@ -33,15 +42,25 @@ class Addon(Document, AddonOut):
 
         name = "addon"
 
+    @after_event(Insert, Replace, Save, SaveChanges, Update, Delete)
+    def clear_catalog(self) -> None:
+        """Reload the addon catalog after a write."""
+        addons.invalidate()
+
     @classmethod
-    async def by_key(cls, key: str) -> Self | None:
+    async def by_key(cls, key: str) -> "Addon | None":
         """Get an add-on by internal key."""
-        return await cls.find_one(cls.key == key)
+        return await addons.get("key", key)
 
     @classmethod
-    async def by_product_id(cls, key: str) -> Self | None:
+    async def by_product_id(cls, key: str) -> "Addon | None":
         """Get an add-on by Stripe product ID."""
-        return await cls.find_one(cls.product_id == key)
+        return await addons.get("product_id", key)
+
+    @classmethod
+    async def by_product_ids(cls, *keys: str) -> dict[str, "Addon"]:
+        """Get add-ons by Stripe product IDs in a single lookup."""
+        return await addons.get_many("product_id", keys)
 
     def to_user(self, plan: str) -> UserAddon:
         """Return a user-specific version of the addon."""
@@ -59,3 +78,6 @@ class Addon(Document, AddonOut):
             documentation=self.documentation,
             price_id=price,
         )
+
+
+addons = Catalog(Addon, "key", "product_id")
@@ -0,0 +1,79 @@
+"""In-process document caching."""
+
+from collections import OrderedDict
+from time import monotonic
+from typing import TYPE_CHECKING
+
+from pydantic import BaseModel
+
+from account.config import CONFIG
+from account.models.util import JustUrl
+
+if TYPE_CHECKING:
+    from account.models.user import User
+
+
+class TTLCache[T: BaseModel]:
+    """Bounded LRU cache of model copies with a per-entry time to live.
+
+    Values are copied in and out so request handlers can mutate what they
+    get back without changing the cached version.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Bumped on every invalidation so slow loads can't cache stale data
+        self.epoch = 0
+        self._data: OrderedDict[str, tuple[float, T]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> T | None:
+        """Return a copy of an unexpired cached value."""
+        item = self._data.get(key)
+        if item is not None and item[0] < monotonic():
+            del self._data[key]
+            item = None
+        if item is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1].model_copy(deep=True)
+
+    def set(self, key: str, value: T, epoch: int | None = None) -> None:
+        """Cache a copy of a value unless an invalidation happened after epoch."""
+        if self.maxsize < 1 or self.ttl <= 0:
+            return
+        if epoch is not None and epoch != self.epoch:
+            return
+        self._data[key] = (monotonic() + self.ttl, value.model_copy(deep=True))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, *keys: str) -> None:
+        """Remove cached values by key."""
+        self.epoch += 1
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all cached values."""
+        self.epoch += 1
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return cache size and hit counters."""
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+# Users keyed by JWT subject username
+user_cache: "TTLCache[User]" = TTLCache(CONFIG.user_cache_size, CONFIG.user_cache_ttl)
+
+# Billing portal URLs keyed by Stripe customer ID
+portal_cache: TTLCache[JustUrl] = TTLCache(CONFIG.user_cache_size, CONFIG.portal_cache_ttl)
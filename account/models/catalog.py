@@ -0,0 +1,85 @@
+"""In-memory catalogs of small, rarely changing collections."""
+
+from collections.abc import Iterable
+from time import monotonic
+from typing import Any
+
+from beanie import Document
+
+from account.config import CONFIG
+from account.models.coalesce import lookups
+from account.models.database import primary
+
+
+class Catalog[D: Document]:
+    """Per-process copy of an entire collection indexed by unique fields.
+
+    The collection is reloaded when it is older than the catalog TTL or after
+    it is invalidated by a write in this process.
+    """
+
+    def __init__(self, model: type[D], *fields: str, ttl: float = CONFIG.catalog_ttl) -> None:
+        self.model = model
+        self.fields = fields
+        self.ttl = ttl
+        self.loaded_at: float | None = None
+        # Bumped on every invalidation so a reload that started earlier can't install stale data
+        self.generation = 0
+        self._items: list[D] = []
+        self._index: dict[str, dict[Any, D]] = {field: {} for field in fields}
+
+    @property
+    def is_stale(self) -> bool:
+        """Return True if the catalog needs to be reloaded."""
+        return self.loaded_at is None or monotonic() - self.loaded_at > self.ttl
+
+    async def refresh(self) -> None:
+        """Reload every document in the collection.
+
+        Catalogs are shared by every request in the process, including writes,
+        so they always load from the primary. The result is dropped if the
+        catalog was invalidated while it loaded.
+        """
+        generation = self.generation
+        items = [self.model.model_validate(doc) async for doc in primary(self.model).find()]
+        if generation != self.generation:
+            return
+        index: dict[str, dict[Any, D]] = {field: {} for field in self.fields}
+        for item in items:
+            for field in self.fields:
+                if (value := getattr(item, field)) is not None:
+                    index[field][value] = item
+        self._items, self._index = items, index
+        self.loaded_at = monotonic()
+
+    def invalidate(self) -> None:
+        """Reload the catalog on next use."""
+        self.generation += 1
+        self.loaded_at = None
+
+    async def _ensure(self) -> None:
+        if self.is_stale:
+            # Callers after an invalidation don't join a reload that started before it
+            await lookups.do((self.model.__name__, "catalog", self.generation), self.refresh)
+
+    async def get(self, field: str, value: Any) -> D | None:
+        """Return a copy of the document with a matching field value."""
+        await self._ensure()
+        item = self._index[field].get(value)
+        return item.model_copy(deep=True) if item else None
+
+    async def get_many(self, field: str, values: Iterable[Any]) -> dict[Any, D]:
+        """Return copies of the documents matching any of the values, keyed by value."""
+        await self._ensure()
+        index = self._index[field]
+        return {value: index[value].model_copy(deep=True) for value in values if value in index}
+
+    async def all(self) -> list[D]:
+        """Return copies of every document."""
+        await self._ensure()
+        return [item.model_copy(deep=True) for item in self._items]
+
+    def stats(self) -> dict[str, Any]:
+        """Return catalog size and age."""
+        age = None if self.loaded_at is None else monotonic() - self.loaded_at
+        return {"size": len(self._items), "age": age}
@@ -0,0 +1,62 @@
+"""Coalesce concurrent identical lookups into a single query."""
+
+import asyncio as aio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from pydantic import BaseModel
+
+
+def _copy[T](value: T) -> T:
+    """Return a private copy so callers can't mutate a shared document."""
+    if isinstance(value, BaseModel):
+        return value.model_copy(deep=True)
+    return value
+
+
+async def _run[T](func: Callable[[], Awaitable[T]]) -> T:
+    return await func()
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    The first caller receives the original result and everyone who joined
+    while the call was running receives a copy. Nothing is kept after the
+    call completes, so results are never older than the query itself.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.shared = 0
+        self._flights: dict[Hashable, aio.Future[Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def _done(self, key: Hashable, flight: aio.Future[Any]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the exception as retrieved if every caller was cancelled
+        if not flight.cancelled():
+            flight.exception()
+
+    async def do[T](self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """Await func or join an existing call with the same key."""
+        if (flight := self._flights.get(key)) is not None:
+            self.shared += 1
+            result: T = await aio.shield(flight)
+            return _copy(result)
+        self.calls += 1
+        task = aio.ensure_future(_run(func))
+        self._flights[key] = task
+        task.add_done_callback(lambda f: self._done(key, f))
+        # Shielded so a cancelled caller doesn't cancel the query for the rest
+        return await aio.shield(task)
+
+    def stats(self) -> dict[str, int]:
+        """Return in-flight and sharing counters."""
+        return {"in_flight": len(self._flights), "calls": self.calls, "shared": self.shared}
+
+
+lookups = SingleFlight()
@@ -0,0 +1,107 @@
+"""Mongo client construction and per-request read routing."""
+
+from collections.abc import Callable
+from contextvars import ContextVar
+from typing import Any
+
+from beanie import Document, init_beanie
+from beanie.odm.utils.init import Initializer
+from motor.motor_asyncio import (
+    AsyncIOMotorClient,
+    AsyncIOMotorCollection,
+    AsyncIOMotorDatabase,
+)
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+    _ServerMode,
+)
+
+from account.config import CONFIG
+
+_MODES: dict[str, Callable[..., _ServerMode]] = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Read preference for the current request. None reads with the client default
+_read_preference: ContextVar[_ServerMode | None] = ContextVar("read_preference", default=None)
+
+
+def read_preference(mode: str) -> _ServerMode:
+    """Return a read preference by its connection string name."""
+    if mode == "primary":
+        return Primary()
+    if mode not in _MODES:
+        msg = f"Unknown read preference {mode!r}"
+        raise ValueError(msg)
+    return _MODES[mode](max_staleness=CONFIG.mongo_max_staleness)
+
+
+def mongo_client() -> AsyncIOMotorClient:
+    """Return a client with the configured pool, compression and read settings."""
+    options: dict[str, Any] = {
+        "appname": "account",
+        "maxPoolSize": CONFIG.mongo_max_pool_size,
+        "minPoolSize": CONFIG.mongo_min_pool_size,
+        "read_preference": read_preference(CONFIG.mongo_read_preference),
+    }
+    if CONFIG.mongo_max_idle_time > 0:
+        options["maxIdleTimeMS"] = int(CONFIG.mongo_max_idle_time * 1000)
+    if CONFIG.mongo_compressors:
+        options["compressors"] = CONFIG.mongo_compressors
+    return AsyncIOMotorClient(CONFIG.mongo_uri.strip('"'), **options)
+
+
+# Initializer.init_indexes is private to Beanie, so check this override when upgrading the pinned beanie version
+class _SkipIndexes(Initializer):
+    """Beanie initializer that leaves existing indexes alone and creates none."""
+
+    async def init_indexes(self, cls: type[Document], allow_index_dropping: bool = False) -> None:
+        """Skip reading and building the model's indexes."""
+
+
+async def init_models(
+    db: AsyncIOMotorDatabase,
+    documents: list[type[Document]],
+    *,
+    skip_indexes: bool = False,
+    drop_indexes: bool = False,
+) -> None:
+    """Initialize Beanie models, optionally without index management.
+
+    Drop removes indexes that are no longer declared on a model.
+    """
+    if skip_indexes:
+        await _SkipIndexes(database=db, document_models=documents)  # type: ignore[arg-type]
+    else:
+        await init_beanie(db, document_models=documents, allow_index_dropping=drop_indexes)  # type: ignore[arg-type]
+
+
+async def secondary_reads() -> None:
+    """Route dependency that lets the request's reads use secondaries.
+
+    Only add it to routes that never read their own writes, since secondaries
+    can lag behind the primary.
+    """
+    _read_preference.set(read_preference(CONFIG.mongo_secondary_reads))
+
+
+def primary(model: type[Document]) -> AsyncIOMotorCollection:
+    """Return a model's collection that always reads from the primary."""
+    # Motor's stub expects the ReadPreference namespace class instead of a mode instance
+    return model.get_motor_collection().with_options(read_preference=Primary())  # type: ignore[arg-type]
+
+
+def reader(model: type[Document]) -> AsyncIOMotorCollection:
+    """Return a model's collection using the current request's read preference."""
+    collection = model.get_motor_collection()
+    if (preference := _read_preference.get()) is not None:
+        # Motor's stub expects the ReadPreference namespace class instead of a mode instance
+        return collection.with_options(read_preference=preference)  # type: ignore[arg-type]
+    return collection
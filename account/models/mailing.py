@@ -0,0 +1,47 @@
+"""Mailing list sync models."""
+
+from datetime import UTC, datetime
+from typing import ClassVar, Literal
+
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+MailingAction = Literal["subscribe", "unsubscribe", "update"]
+JobStatus = Literal["pending", "syncing", "failed"]
+
+
+def _now() -> datetime:
+    return datetime.now(tz=UTC)
+
+
+class MailingJob(Document):
+    """Latest mailing list change waiting to be sent to Mailchimp for an email.
+
+    The document ID is the email, so repeated changes before a sync replace
+    each other and only the last one is sent. The version is bumped on every
+    change so a sync that finishes after a newer change doesn't remove it.
+    """
+
+    id: str  # type: ignore[assignment]
+    action: MailingAction
+    # Replacement address for update jobs
+    new_email: str | None = None
+    version: int = 0
+    status: JobStatus = "pending"
+    attempts: int = 0
+    error: str | None = None
+    queued: datetime = Field(default_factory=_now)
+    # Earliest time a worker may pick up the job. Pushed forward on retry or while claimed
+    available: datetime = Field(default_factory=_now)
+    # Marks the jobs claimed together for a single batch
+    lease: str | None = None
+
+    class Settings:
+        """DB collection name and indexes."""
+
+        name = "mailing"
+        indexes: ClassVar[list[IndexModel]] = [
+            IndexModel([("status", ASCENDING), ("available", ASCENDING)], name="status_available"),
+            IndexModel([("lease", ASCENDING)], name="lease", sparse=True),
+        ]
@@ -0,0 +1,56 @@
+"""User notification models."""
+
+from datetime import UTC, datetime, timedelta
+from typing import ClassVar
+
+from beanie import Document, PydanticObjectId
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
+
+from account.config import CONFIG
+
+
+class NotificationOut(BaseModel):
+    """Notification fields returned to the user."""
+
+    id: PydanticObjectId | None = None
+    type: str
+    text: str
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(tz=UTC))
+
+
+class Notification(Document, NotificationOut):
+    """User notification DB representation."""
+
+    user_id: PydanticObjectId
+
+    class Settings:
+        """DB collection name and indexes."""
+
+        name = "notification"
+        indexes: ClassVar[list[IndexModel]] = [
+            # ObjectIds are time-ordered, so this also serves as the timestamp
+            # index and gives a stable cursor for pagination
+            IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_cursor"),
+            IndexModel(
+                [("timestamp", ASCENDING)],
+                name="timestamp_ttl",
+                expireAfterSeconds=int(timedelta(days=CONFIG.notification_ttl_days).total_seconds()),
+            ),
+        ]
+
+    @classmethod
+    async def for_user(
+        cls,
+        user_id: PydanticObjectId,
+        after: PydanticObjectId | None = None,
+        limit: int | None = None,
+    ) -> list["Notification"]:
+        """Return a user's notifications oldest first, optionally a page after a cursor."""
+        query = cls.find(cls.user_id == user_id)
+        if after is not None:
+            query = query.find(cls.id > after)
+        query = query.sort(+cls.id)  # type: ignore[operator]
+        if limit is not None:
+            query = query.limit(limit)
+        return await query.to_list()
@@ -0,0 +1,51 @@
+"""Outbound email models."""
+
+from datetime import UTC, datetime, timedelta
+from typing import ClassVar, Literal
+
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+from account.config import CONFIG
+
+EmailStatus = Literal["pending", "sending", "sent", "dead"]
+
+
+def _now() -> datetime:
+    return datetime.now(tz=UTC)
+
+
+class OutboxEmail(Document):
+    """Email waiting to be delivered by an outbox worker.
+
+    When the caller passes an idempotency key, the document ID is a hash of
+    it and the recipient, so a handler that runs twice doesn't send the same
+    email twice. Other emails get a random ID.
+    """
+
+    id: str  # type: ignore[assignment]
+    email: str
+    title: str
+    body: str
+    status: EmailStatus = "pending"
+    attempts: int = 0
+    error: str | None = None
+    queued: datetime = Field(default_factory=_now)
+    # Earliest time a worker may pick up the email. Pushed forward on retry or while claimed
+    available: datetime = Field(default_factory=_now)
+    sent: datetime | None = None
+
+    class Settings:
+        """DB collection name and indexes."""
+
+        name = "outbox"
+        indexes: ClassVar[list[IndexModel]] = [
+            IndexModel([("status", ASCENDING), ("available", ASCENDING)], name="status_available"),
+            # Only sent emails have the field, so undelivered and dead emails never expire
+            IndexModel(
+                [("sent", ASCENDING)],
+                name="sent_ttl",
+                expireAfterSeconds=int(timedelta(days=CONFIG.mail_retention_days).total_seconds()),
+            ),
+        ]
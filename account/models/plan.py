@@ -1,10 +1,22 @@
 """Pricing plan models."""
 
-from typing import Annotated, Any, Self
-
-from beanie import Document, Indexed
+from typing import Annotated, Any
+
+from beanie import (
+    Delete,
+    Document,
+    Indexed,
+    Insert,
+    Replace,
+    Save,
+    SaveChanges,
+    Update,
+    after_event,
+)
 from pydantic import BaseModel
 
+from account.models.catalog import Catalog
+
 
 class PlanOut(BaseModel):
     """Plan fields returned to the user."""
@@ -65,12 +77,20 @@ class Plan(Document, PlanOut):
 
         name = "plan"
 
+    @after_event(Insert, Replace, Save, SaveChanges, Update, Delete)
+    def clear_catalog(self) -> None:
+        """Reload the plan catalog after a write."""
+        plans.invalidate()
+
     @classmethod
-    async def by_key(cls, key: str) -> Self | None:
+    async def by_key(cls, key: str) -> "Plan | None":
         """Get a plan by key."""
-        return await cls.find_one(cls.key == key)
+        return await plans.get("key", key)
 
     @classmethod
-    async def by_stripe_id(cls, plan_id: str) -> Self | None:
+    async def by_stripe_id(cls, plan_id: str) -> "Plan | None":
         """Get a plan by Stripe product ID."""
-        return await cls.find_one(cls.stripe_id == plan_id)
+        return await plans.get("stripe_id", plan_id)
+
+
+plans = Catalog(Plan, "key", "stripe_id")
@@ -0,0 +1,102 @@
+"""Stripe subscription mirror models."""
+
+from datetime import UTC, datetime, timedelta
+from time import time
+from typing import TYPE_CHECKING, ClassVar
+
+from beanie import Document
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError
+
+from account.config import CONFIG
+
+if TYPE_CHECKING:
+    from stripe import Subscription
+
+
+def _now() -> datetime:
+    return datetime.now(tz=UTC)
+
+
+class MirrorItem(BaseModel):
+    """Billed price on a subscription."""
+
+    id: str
+    price_id: str
+    product_id: str
+    usage_type: str | None = None
+
+
+class SubscriptionMirror(Document):
+    """Local copy of a Stripe subscription and its items.
+
+    as_of is the Stripe time of the state, either the event creation time or
+    when it was fetched, so late webhooks never overwrite newer state. synced
+    is when the mirror last heard from Stripe.
+    """
+
+    id: str  # type: ignore[assignment]
+    customer_id: str
+    status: str
+    cancel_at_period_end: bool = False
+    ended_at: int | None = None
+    items: list[MirrorItem] = Field(default=[])
+    as_of: int
+    synced: datetime = Field(default_factory=_now)
+
+    class Settings:
+        """DB collection name and indexes."""
+
+        name = "subscription"
+        indexes: ClassVar[list[IndexModel]] = [IndexModel([("customer_id", ASCENDING)], name="customer_id")]
+
+    @property
+    def is_fresh(self) -> bool:
+        """Return True if the mirror can be used without checking Stripe."""
+        synced = self.synced if self.synced.tzinfo else self.synced.replace(tzinfo=UTC)
+        return _now() - synced < timedelta(seconds=CONFIG.subscription_mirror_ttl)
+
+    @classmethod
+    def from_stripe(cls, sub: "Subscription", as_of: int | None = None) -> "SubscriptionMirror":
+        """Build a mirror from a Stripe subscription."""
+        items = [
+            MirrorItem(
+                id=item.id,
+                price_id=item.price.id,
+                product_id=item.price.product if isinstance(item.price.product, str) else item.price.product.id,
+                usage_type=item.plan.usage_type if item.get("plan") else None,
+            )
+            for item in sub["items"].data
+        ]
+        customer = sub.customer if isinstance(sub.customer, str) else sub.customer.id
+        return cls(
+            id=sub.id,
+            customer_id=customer,
+            status=sub.status,
+            cancel_at_period_end=sub.cancel_at_period_end,
+            ended_at=sub.ended_at,
+            items=items,
+            as_of=int(time()) if as_of is None else as_of,
+        )
+
+    @classmethod
+    async def store(cls, sub: "Subscription", as_of: int | None = None) -> "SubscriptionMirror":
+        """Save a Stripe subscription unless the mirror already holds newer state."""
+        mirror = cls.from_stripe(sub, as_of)
+        fields = mirror.model_dump(exclude={"id"})
+        try:
+            await cls.get_motor_collection().update_one(
+                {"_id": mirror.id, "as_of": {"$lte": mirror.as_of}},
+                {"$set": fields},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The stored state is newer. The upsert tried to insert a second copy
+            pass
+        return mirror
+
+    @classmethod
+    async def expire(cls, subscription_id: str) -> None:
+        """Force the next read to fetch from Stripe after a partial change."""
+        await cls.find_one({"_id": subscription_id}).update({"$set": {"synced": datetime.fromtimestamp(0, tz=UTC)}})
@@ -1,13 +1,17 @@
 """Token models."""
 
 from datetime import datetime
+from typing import ClassVar, Literal
 
 from beanie import Document, PydanticObjectId
 from bson.objectid import ObjectId
 from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
 
 from account.models.helpers import ObjectIdStr
 
+Granularity = Literal["day", "week", "month"]
+
 
 class TokenUpdate(BaseModel):
     """Updatable token fields."""
@@ -42,9 +46,50 @@ class TokenUsage(Document, TokenUsageOut):
     updated: datetime
 
     class Settings:
-        """DB collection name."""
+        """DB collection name and indexes."""
 
         name = "token"
+        indexes: ClassVar[list[IndexModel]] = [
+            IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_id_date"),
+            IndexModel([("token_id", ASCENDING), ("date", ASCENDING)], name="token_id_date"),
+            IndexModel([("updated", ASCENDING)], name="updated"),
+        ]
+
+
+class TokenUsageMonth(Document, TokenUsageOut):
+    """Monthly token usage rollup."""
+
+    token_id: PydanticObjectId
+    user_id: PydanticObjectId
+    date: datetime
+    updated: datetime
+
+    class Settings:
+        """DB collection name and indexes."""
+
+        name = "token_month"
+        indexes: ClassVar[list[IndexModel]] = [
+            # Unique keys are required by $merge to match existing rollup rows
+            IndexModel([("token_id", ASCENDING), ("date", ASCENDING)], name="token_id_date", unique=True),
+            IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_id_date"),
+            IndexModel([("updated", ASCENDING)], name="updated"),
+        ]
+
+
+class UserUsageMonth(Document, TokenUsageOut):
+    """Monthly rollup of a user's usage across all tokens."""
+
+    user_id: PydanticObjectId
+    date: datetime
+    updated: datetime
+
+    class Settings:
+        """DB collection name and indexes."""
+
+        name = "user_month"
+        indexes: ClassVar[list[IndexModel]] = [
+            IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_id_date", unique=True),
+        ]
 
 
 class AllTokenUsageOut(BaseModel):
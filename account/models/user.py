@@ -1,20 +1,42 @@
 """User models."""
 
+from collections.abc import Awaitable, Callable, Mapping
 from datetime import UTC, datetime
 from secrets import token_urlsafe
-from typing import Annotated, Any, Self
-
-from beanie import Document, Indexed
+from typing import TYPE_CHECKING, Annotated, Any, ClassVar, Self, TypeVar
+
+from beanie import (
+    Delete,
+    Document,
+    Indexed,
+    Insert,
+    PydanticObjectId,
+    Replace,
+    Save,
+    SaveChanges,
+    Update,
+    after_event,
+)
+from beanie.operators import Pull, Push, Set
 from bson.objectid import ObjectId
 from fastapi import HTTPException
-from pydantic import BaseModel, EmailStr, Field
-from stripe.checkout import Session
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError
 
 from account.models.addon import AddonOut, UserAddon
-from account.models.helpers import ObjectIdStr
+from account.models.cache import user_cache
+from account.models.coalesce import lookups
+from account.models.notification import Notification
 from account.models.plan import Plan, PlanOut
 from account.models.token import Token
 
+if TYPE_CHECKING:
+    from stripe.checkout import Session
+
+# Token values are random so a collision is already very unlikely
+TOKEN_ATTEMPTS = 5
+
 
 class Stripe(BaseModel):
     """Stripe IDs."""
@@ -23,48 +45,46 @@ class Stripe(BaseModel):
     subscription_id: str | None
 
 
-class Notification(BaseModel):
-    """User notification."""
-
-    type: str
-    text: str
-    timestamp: datetime = Field(default_factory=lambda: datetime.now(tz=UTC))
-    id: ObjectIdStr = Field(default_factory=ObjectId)
-
-
 class UserToken(Token):
     """API token."""
 
-    async def is_unique(self) -> bool:
-        """Check if the current token.value is unique."""
-        resp = await User.find_one(User.tokens.value == self.value, {"_id": 1})  # type: ignore[attr-defined]
-        return resp is None
-
-    def _gen(self) -> None:
-        value = token_urlsafe(32)
-        if self.type == "dev":
-            value = f"dev-{value[4:]}"
-        self.value = value
-
     @classmethod
-    async def new(cls, name: str = "Token", type: str = "app") -> Self:  # noqa A002
-        """Generate a new unique token."""
+    def new(cls, name: str = "Token", type: str = "app") -> Self:  # noqa A002
+        """Generate a new token.
+
+        Uniqueness is enforced by the tokens.value index when the token is written.
+        """
         token = cls(_id=ObjectId(), name=name, type=type, value="")  # type: ignore[arg-type]
-        await token.refresh()
+        token.refresh()
         return token
 
     @classmethod
-    async def dev(cls) -> Self:
+    def dev(cls) -> Self:
         """Generate a new development token."""
-        return await cls.new("Development", "dev")
+        return cls.new("Development", "dev")
 
-    async def refresh(self) -> None:
+    def refresh(self) -> None:
         """Refresh the token value."""
-        self._gen()
-        unique = await self.is_unique()
-        while not unique:
-            self._gen()
-            unique = await self.is_unique()
+        value = token_urlsafe(32)
+        if self.type == "dev":
+            value = f"dev-{value[4:]}"
+        self.value = value
+
+
+def _id_match(value: str) -> dict[str, Any]:
+    """Match embedded IDs stored as either strings or ObjectIds."""
+    values: list[Any] = [value]
+    if ObjectId.is_valid(value):
+        values.append(ObjectId(value))
+    return {"$in": values}
+
+
+def find_token(tokens: list[UserToken], value: str) -> tuple[int, UserToken | None]:
+    """Return a token and index by its id."""
+    return next(
+        ((i, token) for i, token in enumerate(tokens) if str(token.id) == value),
+        (-1, None),
+    )
 
 
 class UserAuth(BaseModel):
@@ -100,7 +120,6 @@ class UserOut(UserUpdate):
     plan: PlanOut | None = None
     tokens: list[UserToken] = Field(default=[])
     addons: list[AddonOut] = Field(default=[])
-    notifications: list[Notification] = Field(default=[])
 
     allow_overage: bool = False
     subscribed: bool = False
@@ -108,6 +127,56 @@ class UserOut(UserUpdate):
     is_admin: bool = False
 
 
+class UserView(BaseModel):
+    """Projection of the user fields needed to identify them.
+
+    Subclasses add only the fields a route reads so large users aren't
+    fully loaded and validated on every request.
+    """
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: PydanticObjectId = Field(alias="_id")
+    email: str
+
+    @property
+    def jwt_subject(self) -> dict[str, Any]:
+        """JWT subject fields."""
+        return {"username": self.email}
+
+
+class UserLoginView(UserView):
+    """User fields needed to log in."""
+
+    password: str
+    email_confirmed_at: datetime | None = None
+
+
+class UserPlanView(UserView):
+    """User plan projection."""
+
+    plan: PlanOut | None = None
+
+
+class UserAddonView(UserView):
+    """User addon projection."""
+
+    addons: list[UserAddon] = Field(default=[])
+
+
+class UserTokenView(UserView):
+    """User token projection."""
+
+    tokens: list[UserToken] = Field(default=[])
+
+    def get_token(self, value: str) -> tuple[int, UserToken | None]:
+        """Return a token and index by its id."""
+        return find_token(self.tokens, value)
+
+
+View = TypeVar("View", bound=UserView)
+
+
 class User(Document, UserOut):
     """User DB representation."""
 
@@ -121,6 +190,16 @@ class User(Document, UserOut):
         """DB collection name."""
 
         name = "user"
+        indexes: ClassVar[list[IndexModel]] = [
+            # Only index users with tokens. A unique index would otherwise see
+            # every user without tokens as a duplicate null value
+            IndexModel(
+                [("tokens.value", ASCENDING)],
+                name="tokens_value_unique",
+                unique=True,
+                partialFilterExpression={"tokens.value": {"$type": "string"}},
+            ),
+        ]
 
     def __repr__(self) -> str:
         return f"<User {self.email}>"
@@ -134,6 +213,11 @@ class User(Document, UserOut):
     def __eq__(self, other: object) -> bool:
         return self.email == other.email if isinstance(other, User) else False
 
+    @after_event(Insert, Replace, Save, SaveChanges, Update, Delete)
+    def clear_cache(self) -> None:
+        """Drop any cached copies of this user after a write."""
+        user_cache.invalidate(self.email, *(self.old_emails or []))
+
     @property
     def created(self) -> datetime | None:
         """Datetime user was created from ID."""
@@ -152,7 +236,15 @@ class User(Document, UserOut):
     @classmethod
     async def by_email(cls, email: str) -> Self | None:
         """Get a user by email."""
-        return await cls.find_one(cls.email == email)
+        return await lookups.do((cls.__name__, "email", email), lambda: cls.find_one(cls.email == email))
+
+    @classmethod
+    async def view_by_email(cls, email: str, view: type[View]) -> View | None:
+        """Get only the fields in a user view by email."""
+        return await lookups.do(
+            (view.__name__, "email", email),
+            lambda: cls.find_one(cls.email == email, projection_model=view),
+        )
 
     @classmethod
     async def by_customer_id(cls, user_id: str) -> Self | None:
@@ -160,41 +252,114 @@ class User(Document, UserOut):
         return await cls.find_one(cls.stripe.customer_id == user_id)  # type: ignore
 
     @classmethod
-    async def from_stripe_session(cls, session: Session) -> Self | None:
+    async def from_stripe_session(cls, session: "Session") -> Self | None:
         """Get a user from a Stripe event session."""
         return await User.get(ObjectId(session.client_reference_id))
 
+    async def _update(self, *args: Mapping[str, Any], query: Mapping[str, Any] | None = None) -> None:
+        """Apply a targeted update to the stored user instead of a full save."""
+        await User.find_one({"_id": self.id, **(query or {})}).update(*args)
+        self.clear_cache()
+
+    async def set_fields(self, **fields: Any) -> None:
+        """Set top-level fields on the user."""
+        for key, value in fields.items():
+            setattr(self, key, value)
+        await self._update(Set(fields))
+
     async def add_default_documents(self) -> None:
         """Add initial embedded documents."""
         self.plan = await Plan.by_key("free")
 
     def get_token(self, value: str) -> tuple[int, UserToken | None]:
         """Return a token and index by its id."""
-        return next(
-            ((i, token) for i, token in enumerate(self.tokens) if str(token.id) == value),
-            (-1, None),
-        )
+        return find_token(self.tokens, value)
+
+    @staticmethod
+    async def _write_token(token: UserToken, write: Callable[[], Awaitable[None]]) -> None:
+        """Run a token write, generating a new value if it collides with another."""
+        for _ in range(TOKEN_ATTEMPTS - 1):
+            try:
+                await write()
+            except DuplicateKeyError:
+                token.refresh()
+            else:
+                return
+        await write()
+
+    async def add_token(self, token: UserToken) -> None:
+        """Add a new token to the user's list."""
+        await self._write_token(token, lambda: self._update(Push({"tokens": token})))
+        self.tokens.append(token)
+
+    async def update_token(self, token: UserToken, **fields: Any) -> UserToken:
+        """Update fields on an existing token."""
+        i, _ = self.get_token(str(token.id))
+        if i < 0:
+            msg = f"User does not have a token with ID {token.id}"
+            raise ValueError(msg)
+        self.tokens[i] = token = token.model_copy(update=fields)
+        if fields:
+            update = {f"tokens.$.{key}": value for key, value in fields.items()}
+            await self._update(Set(update), query={"tokens._id": _id_match(str(token.id))})
+        return token
 
-    def get_notification(self, value: str) -> tuple[int, Notification | None]:
-        """Return a notification and index by its string value."""
-        return next(
-            ((i, notification) for i, notification in enumerate(self.notifications) if notification.id == value),
-            (-1, None),
-        )
+    async def refresh_token(self, token: UserToken) -> UserToken:
+        """Generate a new value for an existing token."""
+        i, _ = self.get_token(str(token.id))
+        if i < 0:
+            msg = f"User does not have a token with ID {token.id}"
+            raise ValueError(msg)
+        token = token.model_copy()
+        token.refresh()
+        query = {"tokens._id": _id_match(str(token.id))}
+        await self._write_token(token, lambda: self._update(Set({"tokens.$.value": token.value}), query=query))
+        self.tokens[i] = token
+        return token
+
+    async def remove_token(self, token: UserToken) -> None:
+        """Remove a token from the user's list."""
+        self.tokens = [t for t in self.tokens if t.id != token.id]
+        await self._update(Pull({"tokens": {"_id": _id_match(str(token.id))}}))
+
+    async def remove_tokens_by_type(self, type: str) -> None:
+        """Remove all tokens with a matching type."""
+        self.tokens = [t for t in self.tokens if t.type != type]
+        await self._update(Pull({"tokens": {"type": type}}))
 
     async def add_notification(self, type: str, text: str) -> None:  # noqa A002
-        """Add a new notification to the user's list."""
-        self.notifications.append(Notification(type=type, text=text))
-        await self.save()
+        """Add a new notification for the user."""
+        if self.id is None:
+            msg = "Cannot add a notification to an unsaved user"
+            raise ValueError(msg)
+        await Notification(user_id=self.id, type=type, text=text).insert()
 
     def has_addon(self, key: str) -> bool:
         """Return True if the user has an addon with a matching key."""
         return any(addon.key == key for addon in self.addons)
 
-    def replace_addon(self, addon: UserAddon) -> None:
-        """Replace and Addon with the same key value."""
-        self.addons = [a for a in self.addons if a.key != addon.key]
+    async def add_addon(self, addon: UserAddon) -> None:
+        """Add a new addon and its entitlement flags."""
         self.addons.append(addon)
+        updates: list[Mapping[str, Any]] = [Push({"addons": addon})]
+        if addon.key == "overage":
+            self.allow_overage = True
+            updates.append(Set({"allow_overage": True}))
+        await self._update(*updates)
+
+    async def remove_addon(self, key: str) -> None:
+        """Remove an addon and its entitlement flags by key."""
+        self.addons = [a for a in self.addons if a.key != key]
+        updates: list[Mapping[str, Any]] = [Pull({"addons": {"key": key}})]
+        if key == "overage":
+            self.allow_overage = False
+            updates.append(Set({"allow_overage": False}))
+        await self._update(*updates)
+
+    async def replace_addon(self, addon: UserAddon) -> None:
+        """Switch an existing addon with the same key to the new addon's price."""
+        self.addons = [addon if a.key == addon.key else a for a in self.addons]
+        await self._update(Set({"addons.$.price_id": addon.price_id}), query={"addons.key": addon.key})
 
     def update_email(self, new_email: str) -> None:
         """Update email logging and replace."""
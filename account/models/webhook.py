@@ -0,0 +1,53 @@
+"""Stripe webhook inbox models."""
+
+from datetime import UTC, datetime, timedelta
+from typing import Any, ClassVar, Literal
+
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+from account.config import CONFIG
+
+EventStatus = Literal["pending", "processing", "done", "failed"]
+
+
+def _now() -> datetime:
+    return datetime.now(tz=UTC)
+
+
+class WebhookEvent(Document):
+    """Verified Stripe event waiting to be processed.
+
+    The document ID is the Stripe event ID, so redelivered events are dropped
+    by the insert instead of being processed twice.
+    """
+
+    id: str  # type: ignore[assignment]
+    type: str
+    # Events for the same customer are applied one at a time in created, then received order
+    customer_id: str | None = None
+    created: int = 0
+    payload: dict[str, Any]
+    status: EventStatus = "pending"
+    attempts: int = 0
+    error: str | None = None
+    received: datetime = Field(default_factory=_now)
+    # Earliest time a worker may pick up the event. Pushed forward on retry or while claimed
+    available: datetime = Field(default_factory=_now)
+    processed: datetime | None = None
+
+    class Settings:
+        """DB collection name and indexes."""
+
+        name = "webhook"
+        indexes: ClassVar[list[IndexModel]] = [
+            IndexModel([("status", ASCENDING), ("created", ASCENDING)], name="status_created"),
+            IndexModel([("customer_id", ASCENDING), ("created", ASCENDING)], name="customer_created"),
+            # Only processed events have the field, so pending events never expire
+            IndexModel(
+                [("processed", ASCENDING)],
+                name="processed_ttl",
+                expireAfterSeconds=int(timedelta(days=CONFIG.webhook_retention_days).total_seconds()),
+            ),
+        ]
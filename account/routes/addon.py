@@ -2,9 +2,9 @@
 
 from fastapi import APIRouter, Depends, HTTPException, Response
 
-from account.models.addon import Addon, AddonOut, UserAddon
-from account.models.user import User
-from account.util.current_user import current_user
+from account.models.addon import Addon, AddonOut, UserAddon, addons
+from account.models.user import User, UserAddonView
+from account.util.current_user import current_user, current_user_view
 from account.util.stripe import (
     add_to_subscription,
     get_session,
@@ -15,7 +15,7 @@ router = APIRouter(prefix="/addon", tags=["Addon"])
 
 
 @router.get("", response_model=list[AddonOut])
-async def get_user_addons(user: User = Depends(current_user)) -> list[UserAddon]:
+async def get_user_addons(user: UserAddonView = Depends(current_user_view(UserAddonView))) -> list[UserAddon]:
     """Return the current user's addons."""
     return user.addons
 
@@ -33,13 +33,10 @@ async def new_addon(key: str, user: User = Depends(current_user)):  # type: igno
         raise ValueError(msg)
     user_addon = addon.to_user(user.plan.key)
     if not user.has_subscription:
-        return get_session(user, user_addon.price_id, metered=addon.metered)
-    if not add_to_subscription(user, user_addon.price_id):
+        return await get_session(user, user_addon.price_id, metered=addon.metered)
+    if not await add_to_subscription(user, user_addon.price_id):
         raise HTTPException(500, "Unable to add addon to user subscription")
-    user.addons.append(user_addon)
-    if addon.key == "overage":
-        user.allow_overage = True
-    await user.save()
+    await user.add_addon(user_addon)
     return None
 
 
@@ -52,16 +49,16 @@ async def delete_addon(key: str, user: User = Depends(current_user)) -> Response
             break
     else:
         raise HTTPException(400, f"User does not have the {key} addon")
-    if not remove_from_subscription(user, addon.price_id):
+    if not await remove_from_subscription(user, addon.price_id):
         raise HTTPException(500, "Unable to remove addon from user subscription")
-    user.addons = [i for i in user.addons if i.key != key]
-    if addon.key == "overage":
-        user.allow_overage = False
-    await user.save()
+    await user.remove_addon(key)
+    # Removing the last subscription item also ends the subscription
+    if user.stripe is None:
+        await user.set_fields(stripe=None)
     return Response(status_code=204)
 
 
 @router.get("/all", response_model=list[AddonOut])
 async def get_addons() -> list[Addon]:
     """Return all addons."""
-    return await Addon.all().to_list()
+    return await addons.all()
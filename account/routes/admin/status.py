@@ -0,0 +1,55 @@
+"""Service status admin routes."""
+
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from account.models.addon import addons
+from account.models.cache import portal_cache, user_cache
+from account.models.coalesce import lookups
+from account.models.plan import plans
+from account.startup import startup_timer
+from account.util.billing import billing
+from account.util.current_user import admin_user
+from account.util.mailing import mailing_stats
+from account.util.outbox import outbox_stats, requeue_dead
+from account.util.password import password_pool
+from account.util.recaptcha import recaptcha
+from account.util.smtp import smtp_pool
+from account.util.webhook import inbox_stats
+
+router = APIRouter(prefix="/status")
+
+
+@router.get("", dependencies=[Depends(admin_user)])
+async def get_status() -> dict[str, Any]:
+    """Return in-process cache and worker statistics."""
+    return {
+        "startup": startup_timer.stats(),
+        "user_cache": user_cache.stats(),
+        "portal_cache": portal_cache.stats(),
+        "lookups": lookups.stats(),
+        "plans": plans.stats(),
+        "addons": addons.stats(),
+        "password_pool": password_pool.stats(),
+        "stripe_pool": billing.pool.stats(),
+        "smtp_pool": smtp_pool.stats(),
+        "recaptcha": recaptcha.stats(),
+        "webhooks": await inbox_stats(),
+        "outbox": await outbox_stats(),
+        "mailing": await mailing_stats(),
+    }
+
+
+@router.post("/catalog", dependencies=[Depends(admin_user)])
+async def refresh_catalog() -> dict[str, Any]:
+    """Reload the plan and addon catalogs in this process."""
+    await plans.refresh()
+    await addons.refresh()
+    return {"plans": plans.stats(), "addons": addons.stats()}
+
+
+@router.post("/outbox", dependencies=[Depends(admin_user)])
+async def requeue_outbox() -> dict[str, int]:
+    """Retry every dead-lettered email."""
+    return {"requeued": await requeue_dead()}
@@ -2,10 +2,11 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 
+from account.models.subscription import SubscriptionMirror
 from account.models.user import User
 from account.models.util import JustUrl
 from account.util.current_user import admin_user, embedded_user
-from account.util.stripe import get_portal_session
+from account.util.stripe import get_portal_url, load_subscription
 
 router = APIRouter(prefix="/stripe")
 
@@ -15,5 +16,12 @@ async def get_billing_url(user: User = Depends(embedded_user)) -> JustUrl:
     """Return the Stripe account portal for another user."""
     if not (user.stripe and user.stripe.customer_id):
         raise HTTPException(400, "No stripe fields available")
-    session = get_portal_session(user)
-    return JustUrl(url=session.url)
+    return JustUrl(url=await get_portal_url(user))
+
+
+@router.post("/subscription", dependencies=[Depends(admin_user)])
+async def get_subscription_mirror(user: User = Depends(embedded_user)) -> SubscriptionMirror:
+    """Return another user's mirrored subscription, refreshed from Stripe if stale."""
+    if not (user.stripe and user.stripe.subscription_id):
+        raise HTTPException(400, "No subscription available")
+    return await load_subscription(user.stripe.subscription_id)
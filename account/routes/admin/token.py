@@ -2,15 +2,32 @@
 
 from fastapi import APIRouter, Depends
 
-from account.models.token import AllTokenUsageOut
+from account.models.database import secondary_reads
+from account.models.token import AllTokenUsageOut, Granularity, TokenUsageOut
 from account.models.user import User
 from account.util.current_user import admin_user, embedded_user
-from account.util.token import token_usage_for
+from account.util.token import token_usage_for, user_usage_totals
 
 router = APIRouter(prefix="/token")
 
 
-@router.post("/history", dependencies=[Depends(admin_user)])
-async def get_all_history(days: int = 30, user: User = Depends(embedded_user)) -> list[AllTokenUsageOut]:
+@router.post("/history", dependencies=[Depends(admin_user), Depends(secondary_reads)])
+async def get_all_history(
+    days: int = 30,
+    granularity: Granularity = "day",
+    user: User = Depends(embedded_user),
+) -> list[AllTokenUsageOut]:
     """Return all recent token history for another user."""
-    return await token_usage_for(user, days)
+    return await token_usage_for(user, days, granularity)
+
+
+@router.post(
+    "/totals", dependencies=[Depends(admin_user), Depends(secondary_reads)], response_model=list[TokenUsageOut]
+)
+async def get_usage_totals(
+    days: int = 365,
+    granularity: Granularity = "month",
+    user: User = Depends(embedded_user),
+) -> list[TokenUsageOut]:
+    """Return total usage across all tokens for another user."""
+    return await user_usage_totals(user, days, granularity)
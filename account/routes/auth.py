@@ -5,8 +5,8 @@ from fastapi_jwt import JwtAuthorizationCredentials
 
 from account.jwt import access_security, refresh_security
 from account.models.auth import AccessToken, RefreshToken
-from account.models.user import User, UserAuth
-from account.util.password import hash_password
+from account.models.user import User, UserAuth, UserLoginView
+from account.util.password import verify_password
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
@@ -14,8 +14,8 @@ router = APIRouter(prefix="/auth", tags=["Auth"])
 @router.post("/login")
 async def login(user_auth: UserAuth) -> RefreshToken:
     """Authenticate and return the user's JWT."""
-    user = await User.by_email(user_auth.email)
-    if user is None or hash_password(user_auth.password) != user.password:
+    user = await User.view_by_email(user_auth.email, UserLoginView)
+    if user is None or not await verify_password(user_auth.password, user.password):
         raise HTTPException(status_code=401, detail="Bad email or password")
     if user.email_confirmed_at is None:
         raise HTTPException(status_code=400, detail="Email is not yet verified")
@@ -46,7 +46,6 @@ async def add_to_mailing_list(user: User = Depends(current_user)) -> Response:
     if user.subscribed:
         raise HTTPException(400, "User is already subscribed")
     await add_to_mailing(user)
-    await user.save()
     return Response(status_code=200)
 
 
@@ -56,5 +55,4 @@ async def remove_from_mailing_list(user: User = Depends(current_user)) -> Respon
     if not user.subscribed:
         raise HTTPException(400, "User is already unsubscribed")
     await remove_from_mailing(user)
-    await user.save()
     return Response(status_code=204)
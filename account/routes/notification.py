@@ -1,33 +1,47 @@
 """Notification router."""
 
-from fastapi import APIRouter, Depends, HTTPException, Response
+from beanie import PydanticObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 
-from account.models.user import Notification, User
-from account.util.current_user import current_user
+from account.models.notification import Notification, NotificationOut
+from account.models.user import UserView
+from account.util.current_user import current_user_view
 
 router = APIRouter(prefix="/notification", tags=["Notification"])
 
+_id_view = current_user_view(UserView)
 
-@router.get("")
-async def get_notifications(user: User = Depends(current_user)) -> list[Notification]:
-    """Return the user's notifications."""
-    return user.notifications
+
+@router.get("", response_model=list[NotificationOut])
+async def get_notifications(
+    after: PydanticObjectId | None = None,
+    limit: int | None = Query(None, ge=1, le=500),
+    user: UserView = Depends(_id_view),
+) -> list[Notification]:
+    """Return the user's notifications oldest first.
+
+    Pass a limit to page through them, and the last ID as after to get the next page.
+    """
+    return await Notification.for_user(user.id, after=after, limit=limit)
 
 
 @router.delete("")
-async def delete_notifications(user: User = Depends(current_user)) -> Response:
+async def delete_notifications(user: UserView = Depends(_id_view)) -> Response:
     """Delete all the user's notifications."""
-    user.notifications = []
-    await user.save()
+    await Notification.find(Notification.user_id == user.id).delete()
     return Response(status_code=204)
 
 
 @router.delete("/{value}")
-async def delete_notification(value: str, user: User = Depends(current_user)) -> Response:
+async def delete_notification(value: str, user: UserView = Depends(_id_view)) -> Response:
     """Delete a single notification."""
-    i, _ = user.get_notification(value)
-    if i < 0:
+    notification = None
+    if PydanticObjectId.is_valid(value):
+        notification = await Notification.find_one(
+            Notification.id == PydanticObjectId(value),
+            Notification.user_id == user.id,
+        )
+    if notification is None:
         raise HTTPException(404, f"Notification with value {value} does not exist")
-    user.notifications.pop(i)
-    await user.save()
+    await notification.delete()
     return Response(status_code=204)
@@ -2,16 +2,16 @@
 
 from fastapi import APIRouter, Body, Depends, HTTPException
 
-from account.models.plan import Plan, PlanOut
-from account.models.user import User
-from account.util.current_user import current_user
+from account.models.plan import Plan, PlanOut, plans
+from account.models.user import User, UserPlanView
+from account.util.current_user import current_user, current_user_view
 from account.util.stripe import cancel_subscription, change_subscription, get_session
 
 router = APIRouter(prefix="/plan", tags=["Plan"])
 
 
 @router.get("", response_model=PlanOut)
-async def get_user_plan(user: User = Depends(current_user)) -> Plan:
+async def get_user_plan(user: UserPlanView = Depends(current_user_view(UserPlanView))) -> PlanOut:
     """Return the current user's plan."""
     if not user.plan:
         raise HTTPException(404, "User has no plan")
@@ -35,7 +35,7 @@ async def change_plan(  # type: ignore[no-untyped-def]
     msg = f"Your {plan.name} plan is now active"
     if plan.stripe_id:
         if not user.has_subscription:
-            return get_session(user, plan)
+            return await get_session(user, plan.stripe_id)
         if not await change_subscription(user, plan):
             await user.add_notification("error", "Unable to update your subscription")
             raise HTTPException(500, "Unable to update your subscription")
@@ -50,4 +50,4 @@ async def change_plan(  # type: ignore[no-untyped-def]
 @router.get("/all", response_model=list[PlanOut])
 async def get_plans() -> list[Plan]:
     """Return all plans."""
-    return await Plan.all().to_list()
+    return await plans.all()
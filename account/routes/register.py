@@ -6,7 +6,7 @@ from pydantic import EmailStr
 from account.jwt import access_security, user_from_token
 from account.models.user import User, UserOut, UserRegister
 from account.util.mail import send_password_reset_email
-from account.util.password import hash_password
+from account.util.password import hash_password_async
 from account.util.recaptcha import verify
 
 router = APIRouter(prefix="/register", tags=["Register"])
@@ -20,7 +20,7 @@ async def user_registration(user_auth: UserRegister) -> User:
         raise HTTPException(409, "User with that email already exists")
     if not await verify(user_auth.token):
         raise HTTPException(407, "It doesn't look like you're a human")
-    hashed = hash_password(user_auth.password)
+    hashed = await hash_password_async(user_auth.password)
     user = User(email=user_auth.email, password=hashed)
     await user.add_default_documents()
     await user.create()
@@ -52,6 +52,6 @@ async def reset_password(token: str, password: str = Body(..., embed=True)) -> U
         raise HTTPException(400, "Email is not yet verified")
     if user.disabled:
         raise HTTPException(400, "Your account is disabled")
-    user.password = hash_password(password)
+    user.password = await hash_password_async(password)
     await user.save()
     return user
@@ -1,19 +1,13 @@
 """Stripe callback router."""
 
-import rollbar
 from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
-from stripe import SignatureVerificationError
 
 from account.models.user import User, UserOut
 from account.models.util import JustUrl
 from account.util.current_user import current_user
-from account.util.stripe import (
-    get_event,
-    get_portal_session,
-    invoice_failed,
-    invoice_paid,
-    new_subscription,
-)
+from account.util.report import report_message
+from account.util.stripe import get_event, get_portal_url
+from account.util.webhook import enqueue, is_handled
 
 router = APIRouter(prefix="/stripe", tags=["Stripe"])
 
@@ -32,35 +26,21 @@ async def stripe_cancel(user: User = Depends(current_user)) -> User:
     return user
 
 
-_EVENTS = {
-    # Payment is successful and the subscription is created.
-    # You should provision the subscription and save the customer ID to your database.
-    "checkout.session.completed": new_subscription,
-    # Continue to provision the subscription as payments continue to be made.
-    # Store the status in your database and check when a user accesses your service.
-    # This approach helps you avoid hitting rate limits.
-    "invoice.paid": invoice_paid,
-    # The payment failed or the customer does not have a valid payment method.
-    # The subscription becomes past_due. Notify your customer and send them to the
-    # customer portal to update their payment information.
-    "invoice.payment_failed": invoice_failed,
-}
-
-
 @router.post("/fulfill")
 async def stripe_fulfill(request: Request, stripe_signature: str = Header(None)) -> Response:
-    """Stripe event handler."""
+    """Stripe event handler. Verified events are queued and processed in the background."""
+    payload = await request.body()
     try:
-        event = get_event(await request.body(), stripe_signature)
-    except (ValueError, SignatureVerificationError) as exc:
+        event = get_event(payload, stripe_signature)
+    except ValueError as exc:
         raise HTTPException(400) from exc
-    if handler := _EVENTS.get(event.type):
-        if await handler(event.data.object):  # type: ignore
-            return Response()
-    else:
+    if not is_handled(event.type):
         print(f"Unhandled event type {event.type}")
-        rollbar.report_message(event)
-    raise HTTPException(400)
+        report_message(event)
+        raise HTTPException(400)
+    # Redelivered events are already in the inbox and only need to be acknowledged
+    await enqueue(event, payload)
+    return Response()
 
 
 @router.get("/portal")
@@ -68,5 +48,4 @@ async def customer_portal(user: User = Depends(current_user)) -> JustUrl:
     """Return the user's Stripe account portal URL."""
     if not (user.stripe and user.stripe.customer_id):
         raise HTTPException(400, "No stripe fields available")
-    session = get_portal_session(user)
-    return JustUrl(url=session.url)
+    return JustUrl(url=await get_portal_url(user))
@@ -1,26 +1,26 @@
 """Token management router."""
 
-from datetime import UTC, datetime, timedelta
-
-from bson.objectid import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 
+from account.models.database import secondary_reads
 from account.models.token import (
     AllTokenUsageOut,
+    Granularity,
     Token,
     TokenUpdate,
-    TokenUsage,
     TokenUsageOut,
 )
-from account.models.user import User, UserToken
-from account.util.current_user import current_user
-from account.util.token import token_usage_for
+from account.models.user import User, UserToken, UserTokenView
+from account.util.current_user import current_user, current_user_view
+from account.util.token import token_history, token_usage_for
 
 router = APIRouter(prefix="/token", tags=["Token"])
 
+_token_view = current_user_view(UserTokenView)
+
 
 @router.get("", response_model=list[Token])
-async def get_user_tokens(user: User = Depends(current_user)) -> list[UserToken]:
+async def get_user_tokens(user: UserTokenView = Depends(_token_view)) -> list[UserToken]:
     """Return the current user's tokens."""
     return user.tokens
 
@@ -28,20 +28,23 @@ async def get_user_tokens(user: User = Depends(current_user)) -> list[UserToken]
 @router.post("", response_model=Token)
 async def new_token(user: User = Depends(current_user)) -> UserToken:
     """Create a new user token."""
-    token = await UserToken.new()
-    user.tokens.append(token)
-    await user.save()
+    token = UserToken.new()
+    await user.add_token(token)
     return token
 
 
-@router.get("/history")
-async def get_all_history(days: int = 30, user: User = Depends(current_user)) -> list[AllTokenUsageOut]:
-    """Return all recent token history."""
-    return await token_usage_for(user, days)
+@router.get("/history", dependencies=[Depends(secondary_reads)])
+async def get_all_history(
+    days: int = Query(30, ge=1, le=366),
+    granularity: Granularity = "day",
+    user: UserTokenView = Depends(_token_view),
+) -> list[AllTokenUsageOut]:
+    """Return all recent token history summed by day, week, or month."""
+    return await token_usage_for(user, days, granularity)
 
 
 @router.get("/{value}", response_model=Token)
-async def get_token(value: str, user: User = Depends(current_user)) -> UserToken:
+async def get_token(value: str, user: UserTokenView = Depends(_token_view)) -> UserToken:
     """Return token details by string value."""
     _, token = user.get_token(value)
     if token is None:
@@ -52,42 +55,40 @@ async def get_token(value: str, user: User = Depends(current_user)) -> UserToken
 @router.patch("/{value}", response_model=Token)
 async def update_token(value: str, update: TokenUpdate, user: User = Depends(current_user)) -> UserToken:
     """Update token details by string value."""
-    i, token = user.get_token(value)
+    _, token = user.get_token(value)
     if token is None:
         raise HTTPException(404, f"Token with value {value} does not exist")
-    token = token.model_copy(update=update.model_dump(exclude_unset=True))
-    user.tokens[i] = token
-    await user.save()
-    return token
+    return await user.update_token(token, **update.model_dump(exclude_unset=True))
 
 
 @router.delete("/{value}")
 async def delete_token(value: str, user: User = Depends(current_user)) -> Response:
     """Delete a token by string value."""
-    i, token = user.get_token(value)
+    _, token = user.get_token(value)
     if token is None:
         raise HTTPException(404, f"Token with value {value} does not exist")
-    user.tokens.pop(i)
-    await user.save()
+    await user.remove_token(token)
     return Response(status_code=204)
 
 
 @router.post("/{value}/refresh", response_model=Token)
 async def refresh_token(value: str, user: User = Depends(current_user)) -> UserToken:
     """Refresh token value by string value."""
-    i, token = user.get_token(value)
+    _, token = user.get_token(value)
     if token is None:
         raise HTTPException(404, f"Token with value {value} does not exist")
-    await user.tokens[i].refresh()
-    await user.save()
-    return user.tokens[i]
+    return await user.refresh_token(token)
 
 
-@router.get("/{value}/history", response_model=list[TokenUsageOut])
-async def get_token_history(value: str, days: int = 30, user: User = Depends(current_user)) -> list[TokenUsage]:
-    """Return a token's usage history."""
+@router.get("/{value}/history", dependencies=[Depends(secondary_reads)], response_model=list[TokenUsageOut])
+async def get_token_history(
+    value: str,
+    days: int = Query(30, ge=1, le=366),
+    granularity: Granularity = "day",
+    user: UserTokenView = Depends(_token_view),
+) -> list[TokenUsageOut]:
+    """Return a token's usage history summed by day, week, or month. Periods without usage are zero."""
     _, token = user.get_token(value)
     if token is None:
         raise HTTPException(404, f"Token with value {value} does not exist")
-    days_since = datetime.now(tz=UTC) - timedelta(days=days)
-    return await TokenUsage.find(TokenUsage.token_id == ObjectId(token.id), TokenUsage.date >= days_since).to_list()
+    return await token_history(token.id, days, granularity)
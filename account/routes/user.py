@@ -4,7 +4,9 @@ from fastapi import APIRouter, Depends, HTTPException, Response, Security
 from fastapi_jwt import JwtAuthorizationCredentials
 
 from account.jwt import access_security
-from account.models.user import User, UserOut, UserUpdate
+from account.models.cache import user_cache
+from account.models.notification import Notification
+from account.models.user import User, UserOut, UserUpdate, UserView
 from account.util.current_user import current_user
 from account.util.mail import send_email_change
 from account.util.mailing import update_mailing
@@ -29,7 +31,7 @@ async def update_user(update: UserUpdate, user: User = Depends(current_user)) ->
             raise HTTPException(400, "Email already exists")
         if user.subscribed:
             await update_mailing(user.email, new_email)
-        update_stripe_email(user, new_email)
+        await update_stripe_email(user, new_email)
         await send_email_change(user.email, new_email)
         user.update_email(new_email)
     user = user.model_copy(update=fields)
@@ -42,5 +44,10 @@ async def delete_user(
     auth: JwtAuthorizationCredentials = Security(access_security),
 ) -> Response:
     """Delete current user."""
-    await User.find_one(User.email == auth.subject["username"]).delete()
+    email = auth.subject["username"]
+    if user := await User.view_by_email(email, UserView):
+        await User.find_one(User.id == user.id).delete()
+        # Notifications are stored apart from the user, so they're removed here
+        await Notification.find(Notification.user_id == user.id).delete()
+    user_cache.invalidate(email)
     return Response(status_code=204)
@@ -0,0 +1,35 @@
+"""Startup phase timing.
+
+Import this before anything else in the app so the first phase covers
+loading the rest of the package.
+"""
+
+from time import perf_counter
+
+# SDKs that should only load on first use
+LAZY_IMPORTS = ("stripe", "mailchimp3", "rollbar", "logfire")
+
+
+class StartupTimer:
+    """Records how long each startup phase took, in the order they ran."""
+
+    def __init__(self) -> None:
+        self.phases: dict[str, float] = {}
+        self._mark = perf_counter()
+
+    def phase(self, name: str) -> None:
+        """Record the time since the previous phase ended as a finished phase."""
+        now = perf_counter()
+        self.phases[name] = now - self._mark
+        self._mark = now
+
+    def report(self) -> str:
+        """Return phase timings in milliseconds."""
+        return ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+
+    def stats(self) -> dict[str, float]:
+        """Return phase timings in seconds and their total."""
+        return {**self.phases, "total": sum(self.phases.values())}
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,103 @@
+"""Async Stripe API adapter."""
+
+from typing import TYPE_CHECKING, Any
+
+from account.config import CONFIG
+from account.util.pool import WorkerPool
+
+# The SDK takes most of a second to import, so it's loaded with the first client
+if TYPE_CHECKING:
+    from stripe import HTTPClient, StripeClient, Subscription, SubscriptionItem
+    from stripe.billing_portal import Session as PortalSession
+    from stripe.checkout import Session as CheckoutSession
+
+
+class StripeAdapter:
+    """Async wrapper around the synchronous Stripe SDK.
+
+    Calls run in a bounded thread pool so a slow Stripe response only holds a
+    pool thread, never the event loop. Each thread keeps its own keep-alive
+    HTTP session, and every request has a timeout with retries for network
+    errors.
+    """
+
+    def __init__(self, workers: int, timeout: int, max_retries: int) -> None:
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.pool = WorkerPool(workers, "stripe")
+        self._client: StripeClient | None = None
+
+    @property
+    def client(self) -> "StripeClient":
+        """Return the shared Stripe client."""
+        if self._client is None:
+            from stripe import RequestsClient
+
+            self.use_http_client(RequestsClient(timeout=self.timeout))
+            assert self._client is not None
+        return self._client
+
+    def use_http_client(self, http_client: "HTTPClient") -> None:
+        """Send requests through a different transport."""
+        from stripe import StripeClient
+
+        base = {"api": CONFIG.stripe_api_base} if CONFIG.stripe_api_base else {}
+        self._client = StripeClient(
+            CONFIG.stripe_secret_key,
+            http_client=http_client,
+            base_addresses=base,  # type: ignore[arg-type]
+            max_network_retries=self.max_retries,
+        )
+
+    async def create_checkout(self, params: dict[str, Any]) -> "CheckoutSession":
+        """Create a Checkout session."""
+        return await self.pool.run(self.client.checkout.sessions.create, params)
+
+    async def create_portal(self, customer_id: str, return_url: str) -> "PortalSession":
+        """Create a billing portal session."""
+        params = {"customer": customer_id, "return_url": return_url}
+        return await self.pool.run(self.client.billing_portal.sessions.create, params)
+
+    async def get_subscription(self, subscription_id: str) -> "Subscription":
+        """Retrieve a subscription and its items."""
+        return await self.pool.run(self.client.subscriptions.retrieve, subscription_id)
+
+    async def list_subscriptions(self, customer_id: str, page_size: int = 100) -> "list[Subscription]":
+        """Return every subscription for a customer, following list pagination."""
+        params: dict[str, Any] = {"customer": customer_id, "status": "all", "limit": page_size}
+        subs: list[Subscription] = []
+        while True:
+            page = await self.pool.run(self.client.subscriptions.list, params)
+            subs += page.data
+            if not (page.has_more and page.data):
+                return subs
+            params = {**params, "starting_after": page.data[-1].id}
+
+    async def update_subscription(self, subscription_id: str, params: dict[str, Any]) -> "Subscription":
+        """Modify a subscription."""
+        return await self.pool.run(self.client.subscriptions.update, subscription_id, params)
+
+    async def cancel_subscription(self, subscription_id: str) -> "Subscription":
+        """Cancel a subscription immediately."""
+        return await self.pool.run(self.client.subscriptions.cancel, subscription_id)
+
+    async def add_item(self, subscription_id: str, price_id: str) -> "SubscriptionItem":
+        """Add a price to a subscription."""
+        params = {"subscription": subscription_id, "price": price_id}
+        return await self.pool.run(self.client.subscription_items.create, params)
+
+    async def delete_item(self, item_id: str, *, clear_usage: bool = False) -> "SubscriptionItem":
+        """Remove an item from a subscription."""
+        params = {"clear_usage": clear_usage}
+        return await self.pool.run(self.client.subscription_items.delete, item_id, params)
+
+    async def update_customer_email(self, customer_id: str, email: str) -> None:
+        """Change the email on a customer."""
+        await self.pool.run(self.client.customers.update, customer_id, {"email": email})
+
+    def shutdown(self) -> None:
+        """Stop the pool threads."""
+        self.pool.shutdown()
+
+
+billing = StripeAdapter(CONFIG.stripe_workers, CONFIG.stripe_timeout, CONFIG.stripe_max_retries)
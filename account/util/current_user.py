@@ -1,10 +1,12 @@
 """Current user dependency."""
 
+from collections.abc import Awaitable, Callable
+
 from fastapi import Body, HTTPException, Security
 from fastapi_jwt import JwtAuthorizationCredentials
 
-from account.jwt import access_security, user_from_credentials
-from account.models.user import User
+from account.jwt import access_security, user_from_credentials, view_from_credentials
+from account.models.user import User, View
 
 
 async def current_user(
@@ -19,6 +21,22 @@ async def current_user(
     return user
 
 
+def current_user_view(view: type[View]) -> Callable[[JwtAuthorizationCredentials], Awaitable[View]]:
+    """Return a dependency that loads only the current user fields in a view."""
+
+    async def _current_user_view(
+        auth: JwtAuthorizationCredentials = Security(access_security),
+    ) -> View:
+        if not auth:
+            raise HTTPException(401, "No authorization credentials found")
+        user = await view_from_credentials(auth, view)
+        if user is None:
+            raise HTTPException(404, "Authorized user could not be found")
+        return user
+
+    return _current_user_view
+
+
 async def embedded_user(email: str = Body(..., embed=True)) -> User:
     """Return a user from an embedded email."""
     if not email:
@@ -0,0 +1,39 @@
+"""Mongo leases for jobs that only one server process should run."""
+
+from datetime import UTC, datetime, timedelta
+
+from beanie import Document
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import DuplicateKeyError
+
+COLLECTION = "leases"
+
+
+def lease_collection(model: type[Document]) -> AsyncIOMotorCollection:
+    """Return the lease collection in the same database as a model."""
+    collection: AsyncIOMotorCollection = model.get_motor_collection().database[COLLECTION]
+    return collection
+
+
+async def acquire_lease(leases: AsyncIOMotorCollection, name: str, owner: str, seconds: float) -> bool:
+    """Take or renew a named lease. Returns False while another owner holds it.
+
+    The holder must renew before the lease runs out. A lease left by a
+    process that died is taken over once it expires.
+    """
+    now = datetime.now(tz=UTC)
+    try:
+        await leases.update_one(
+            {"_id": name, "$or": [{"owner": owner}, {"expires": {"$lte": now}}]},
+            {"$set": {"owner": owner, "expires": now + timedelta(seconds=seconds)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # The lease exists and is held by someone else, so the upsert tried to insert a second one
+        return False
+    return True
+
+
+async def release_lease(leases: AsyncIOMotorCollection, name: str, owner: str) -> None:
+    """Give up a lease so another process can take it right away."""
+    await leases.delete_one({"_id": name, "owner": owner})
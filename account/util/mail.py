@@ -1,22 +1,9 @@
 """Mail server config."""
 
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+from collections.abc import Iterable
 
 from account.config import CONFIG
-
-mail_conf = ConnectionConfig(
-    MAIL_USERNAME=CONFIG.mail_username,
-    MAIL_PASSWORD=CONFIG.mail_password,
-    MAIL_FROM=CONFIG.mail_sender,
-    MAIL_PORT=CONFIG.mail_port,
-    MAIL_SERVER=CONFIG.mail_server,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,  # StartTLS handles TLS and SSL
-    USE_CREDENTIALS=True,
-)
-
-mail = FastMail(mail_conf)
-
+from account.util.outbox import Email, enqueue
 
 VERIFY_TEMPLATE = """
 Welcome to AVWX!
@@ -55,36 +42,31 @@ CHANGE_EMAIL_OLD = "Your AVWX account email has been changed to {}. If you did n
 CHANGE_EMAIL_NEW = "Your AVWX account email has been changed. No further action is needed."
 
 
-async def _send(email: str, title: str, msg: str) -> None:
-    """Send to email or print to console."""
-    if CONFIG.mail_console:
-        print(msg)
-        return
-    message = MessageSchema(
-        recipients=[email],
-        subject=title,
-        body=msg,
-        subtype=MessageType.plain,
-    )
-    await mail.send_message(message)
-    return None
+async def _send(email: str, title: str, msg: str, key: str | None = None) -> None:
+    """Queue an email for delivery by the outbox workers. Emails with the same key are only sent once."""
+    await enqueue([(email, title, msg)], key)
+
+
+async def send_many(emails: Iterable[Email], key: str | None = None) -> int:
+    """Queue (email, title, message) notices together. Returns the number of new emails."""
+    return await enqueue(emails, key)
 
 
 async def send_verification_email(email: str, token: str) -> None:
     """Send user verification email."""
     # Change this later to public endpoint
     url = f"{CONFIG.root_url}/verify-email?t={token}"
-    await _send(email, "AVWX Email Verification", VERIFY_TEMPLATE.format(url))
+    await _send(email, "AVWX Email Verification", VERIFY_TEMPLATE.format(url), key=token)
 
 
 async def send_password_reset_email(email: str, token: str) -> None:
     """Send password reset email."""
     # Change this later to public endpoint
     url = f"{CONFIG.root_url}/forgot-password?t={token}"
-    await _send(email, "AVWX Password Reset", RESET_TEMPLATE.format(url))
+    await _send(email, "AVWX Password Reset", RESET_TEMPLATE.format(url), key=token)
 
 
-async def send_disable_email(email: str, portal_url: str, *, warning: bool = False) -> None:
+async def send_disable_email(email: str, portal_url: str, *, warning: bool = False, key: str | None = None) -> None:
     """Send missed payment email with portal link."""
     title = "AVWX Account "
     if warning:
@@ -93,16 +75,15 @@ async def send_disable_email(email: str, portal_url: str, *, warning: bool = Fal
     else:
         title += "Disabled"
         template = ACCOUNT_DISABLE
-    await _send(email, title, template.format(portal_url))
+    await _send(email, title, template.format(portal_url), key)
 
 
-async def send_enabled_email(email: str) -> None:
+async def send_enabled_email(email: str, key: str | None = None) -> None:
     """Send account re-enabled status email."""
-    await _send(email, "AVWX Account Re-Enabled", ACCOUNT_ENABLE)
+    await _send(email, "AVWX Account Re-Enabled", ACCOUNT_ENABLE, key)
 
 
 async def send_email_change(old: str, new: str) -> None:
     """Send email chnage to old and new address."""
     title = "AVWX Change Passord"
-    await _send(old, title, CHANGE_EMAIL_OLD.format(new))
-    await _send(new, title, CHANGE_EMAIL_NEW)
+    await send_many([(old, title, CHANGE_EMAIL_OLD.format(new)), (new, title, CHANGE_EMAIL_NEW)])
@@ -1,99 +1,308 @@
-"""Mailing list manager."""
+"""Mailing list manager.
 
+Subscribe, unsubscribe and email changes are stored as one pending job per
+email and sent to Mailchimp in bulk through the batch operations endpoint.
+"""
+
+import asyncio as aio
 import hashlib
+import io
+import json
+import tarfile
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
 
-import rollbar
-from kewkew import Kew
-from mailchimp3 import MailChimp
-from mailchimp3.mailchimpclient import MailChimpError
+from beanie.operators import In, Set
+from pymongo import ASCENDING
 
 from account.config import CONFIG
+from account.models.cache import user_cache
+from account.models.mailing import MailingAction, MailingJob
 from account.models.user import User
+from account.util.pool import WorkerPool
+from account.util.report import report_exc_info, report_message
 
+if TYPE_CHECKING:
+    from mailchimp3 import MailChimp
 
-class MailingKew(Kew):
-    """Mailing list queue manager."""
+NOT_FOUND = 404
+BAD_REQUEST = 400
+SERVER_ERROR = 500
+# Mailchimp statuses worth retrying. Anything else in the 4xx range is final
+RETRY_STATUS = {408, 429}
+_CLAIMABLE = {"$in": ["pending", "syncing"]}
 
-    async def worker(self, data: tuple[User, bool]) -> bool:
-        """Queue worker to add/remove subscriber and update."""
-        match data:
-            case (user, True | False as add):
-                handler = _add_to_mailing if add else _remove_from_mailing
-                if handler(user.email):
-                    user.subscribed = add
-                    await user.save()
-            case (old, new) if isinstance(old, str) and isinstance(new, str):
-                _update_mailing(old, new)
-        return True
+_counters = {"batches": 0, "synced": 0, "retried": 0, "failed": 0}
 
 
-if not CONFIG.testing:
-    kew = MailingKew()
-    if CONFIG.mc_key and CONFIG.mc_username:
-        chimp = MailChimp(mc_api=CONFIG.mc_key, mc_user=CONFIG.mc_username)
+def _now() -> datetime:
+    return datetime.now(tz=UTC)
 
 
-NOT_FOUND = 404
+def _age(since: datetime) -> float:
+    """Return seconds since a stored timestamp. Mongo returns naive UTC datetimes."""
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    return (_now() - since).total_seconds()
 
 
-async def add_to_mailing(user: User) -> None:
-    """Add an email to the mailing list."""
-    if not CONFIG.testing:
-        await kew.add((user, True))
-    user.subscribed = True
+def _member_path(email: str) -> str:
+    target = hashlib.md5(email.lower().encode("utf-8")).hexdigest()
+    return f"lists/{CONFIG.mc_list_id}/members/{target}"
 
 
-def _add_to_mailing(email: str) -> bool:
-    try:
-        chimp.lists.members.create(
-            CONFIG.mc_list_id,
-            {"email_address": email, "status": "subscribed"},
-        )
-    except MailChimpError as exc:
-        data = dict(exc.args[0])
-        detail = data.get("detail")
-        if detail and "fake or invalid" in detail:
-            return False
-        if data.get("title") != "Member Exists":
-            rollbar.report_message(data.update({"email": email}))
-    except ConnectionError:
-        return False
-    return True
+class MailchimpAdapter:
+    """Runs Mailchimp batch operations on a small thread pool.
 
+    The mailchimp3 client is synchronous, so each request runs in the pool
+    while the event loop waits for the batch to finish.
+    """
 
-async def remove_from_mailing(user: User) -> None:
-    """Delete an email from the mailing list."""
-    if not CONFIG.testing:
-        await kew.add((user, False))
-    user.subscribed = False
+    def __init__(self, workers: int, timeout: float) -> None:
+        self.pool = WorkerPool(workers, "mailchimp")
+        self.timeout = timeout
+        self._client: MailChimp | None = None
 
+    @property
+    def enabled(self) -> bool:
+        """Return True if there is a Mailchimp account to sync with."""
+        return self._client is not None or bool(CONFIG.mc_key and CONFIG.mc_username)
 
-def _remove_from_mailing(email: str) -> bool:
-    try:
-        target = hashlib.md5(email.encode("utf-8")).hexdigest()  # noqa S324
-        chimp.lists.members.delete(CONFIG.mc_list_id, target)
-    except MailChimpError as exc:
-        data = dict(exc.args[0])
-        if data.get("status") != NOT_FOUND:
-            rollbar.report_message(data)
-    return True
+    @property
+    def client(self) -> "MailChimp":
+        """Return the shared client."""
+        if self._client is None:
+            from mailchimp3 import MailChimp
+
+            self._client = MailChimp(mc_api=CONFIG.mc_key, mc_user=CONFIG.mc_username, timeout=self.timeout)
+            if CONFIG.mc_api_base:
+                self._client.base_url = CONFIG.mc_api_base
+        return self._client
+
+    def use_client(self, client: "MailChimp | None") -> None:
+        """Replace the client, such as with a local fake. None restores the default."""
+        self._client = client
+
+    def _results(self, url: str) -> list[dict[str, Any]]:
+        """Download and unpack a finished batch's per-operation responses."""
+        # Reuse the client's request hook so fakes and timeouts apply to the download too
+        resp = self.client._make_request(method="GET", url=url, timeout=self.timeout)
+        resp.raise_for_status()
+        results = []
+        with tarfile.open(fileobj=io.BytesIO(resp.content), mode="r:gz") as archive:
+            for member in archive.getmembers():
+                if member.isfile() and (file := archive.extractfile(member)):
+                    results += json.load(file)
+        return results
+
+    async def run_batch(self, operations: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        """Submit operations as one batch and return each result by operation ID."""
+        batch = await self.pool.run(self.client.batches.create, {"operations": operations})
+        deadline = _now() + timedelta(seconds=CONFIG.mc_batch_timeout)
+        while batch["status"] != "finished":
+            if _now() > deadline:
+                msg = f"Mailchimp batch {batch['id']} did not finish in {CONFIG.mc_batch_timeout}s"
+                raise TimeoutError(msg)
+            await aio.sleep(CONFIG.mc_batch_poll)
+            batch = await self.pool.run(self.client.batches.get, batch["id"])
+        _counters["batches"] += 1
+        results = await self.pool.run(self._results, batch["response_body_url"])
+        return {result["operation_id"]: result for result in results}
+
+    def shutdown(self) -> None:
+        """Stop the pool threads."""
+        self.pool.shutdown()
+
+
+mailchimp = MailchimpAdapter(CONFIG.mc_workers, CONFIG.mc_timeout)
+
+
+async def _queue(email: str, action: MailingAction, new_email: str | None = None) -> None:
+    """Replace any pending change for an email with a new one."""
+    now = _now()
+    await MailingJob.get_motor_collection().update_one(
+        {"_id": email},
+        {
+            "$set": {
+                "action": action,
+                "new_email": new_email,
+                "status": "pending",
+                "attempts": 0,
+                "error": None,
+                "available": now,
+            },
+            "$inc": {"version": 1},
+            "$setOnInsert": {"queued": now},
+        },
+        upsert=True,
+    )
+
+
+async def add_to_mailing(user: User) -> None:
+    """Add an email to the mailing list."""
+    await _queue(user.email, "subscribe")
+    await user.set_fields(subscribed=True)
+
+
+async def remove_from_mailing(user: User) -> None:
+    """Delete an email from the mailing list."""
+    await _queue(user.email, "unsubscribe")
+    await user.set_fields(subscribed=False)
 
 
 async def update_mailing(old: str, new: str) -> None:
     """Update an email on the mailing list."""
-    if not CONFIG.testing:
-        await kew.add((old, new))
+    pending = await MailingJob.get(old)
+    if pending and pending.status == "pending" and pending.action == "subscribe":
+        # The old address never reached Mailchimp, so subscribe the new one instead
+        await MailingJob.find_one({"_id": old, "version": pending.version}).delete()
+        await _queue(new, "subscribe")
+        return
+    # Rename the original address directly if it is still waiting to be renamed to the old one
+    chained = await MailingJob.find_one(
+        MailingJob.action == "update", MailingJob.new_email == old, MailingJob.status == "pending"
+    )
+    await _queue(chained.id if chained else old, "update", new)
+
+
+async def claim(limit: int) -> list[MailingJob]:
+    """Lease up to limit available jobs to this worker.
+
+    Jobs left syncing by a worker that died become available again once their
+    lease runs out.
+    """
+    collection = MailingJob.get_motor_collection()
+    now = _now()
+    query = {"status": _CLAIMABLE, "available": {"$lte": now}}
+    cursor = collection.find(query, projection={"_id": 1}, sort=[("available", ASCENDING)], limit=limit)
+    ids = [doc["_id"] async for doc in cursor]
+    if not ids:
+        return []
+    lease = uuid4().hex
+    # Jobs claimed by another worker since they were read no longer match
+    await collection.update_many(
+        {**query, "_id": {"$in": ids}},
+        {
+            "$set": {"status": "syncing", "available": now + timedelta(seconds=CONFIG.mc_lease), "lease": lease},
+            "$inc": {"attempts": 1},
+        },
+    )
+    return await MailingJob.find(MailingJob.lease == lease).to_list()
+
+
+def _operation(job: MailingJob) -> dict[str, Any]:
+    """Return the batch operation for a job."""
+    operation: dict[str, Any] = {"operation_id": job.id, "path": _member_path(job.id)}
+    match job.action:
+        case "subscribe":
+            body = {"email_address": job.id, "status_if_new": "subscribed", "status": "subscribed"}
+            operation.update(method="PUT", body=json.dumps(body))
+        case "unsubscribe":
+            operation.update(method="DELETE")
+        case "update":
+            operation.update(method="PATCH", body=json.dumps({"email_address": job.new_email}))
+    return operation
+
+
+def _outcome(job: MailingJob, result: dict[str, Any] | None) -> tuple[bool | None, str | None]:
+    """Return whether the job is done (True), final (False) or should retry (None) and any error."""
+    if result is None:
+        return None, "Missing from batch results"
+    status = int(result["status_code"])
+    if status < BAD_REQUEST or (status == NOT_FOUND and job.action != "subscribe"):
+        # Members that are already gone don't need to be removed or renamed
+        return True, None
+    error = result.get("response") or str(status)
+    if status >= SERVER_ERROR or status in RETRY_STATUS:
+        return None, error
+    return False, error
 
 
-def _update_mailing(old: str, new: str) -> None:
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=CONFIG.mc_retry_delay * 2 ** max(attempts - 1, 0))
+
+
+async def _retry(jobs: list[MailingJob], error: str) -> None:
+    """Make jobs available again later or mark them failed after the last attempt."""
+    for job in jobs:
+        query = MailingJob.find_one({"_id": job.id, "version": job.version})
+        if job.attempts >= CONFIG.mc_max_attempts:
+            await query.update({"$set": {"status": "failed", "error": error, "lease": None}})
+            _counters["failed"] += 1
+            report_message(f"Mailing sync for {job.id} ({job.action}) failed: {error}")
+            continue
+        fields = {"status": "pending", "available": _now() + _backoff(job.attempts), "error": error, "lease": None}
+        await query.update({"$set": fields})
+        _counters["retried"] += 1
+
+
+async def _set_subscribed(emails: list[str], *, subscribed: bool) -> None:
+    """Record the confirmed list status without loading the users."""
+    if emails:
+        await User.find(In(User.email, emails)).update(Set({User.subscribed: subscribed}))
+        user_cache.invalidate(*emails)
+
+
+async def flush(limit: int | None = None) -> int:
+    """Send the next batch of jobs to Mailchimp. Returns the number of jobs claimed."""
+    jobs = await claim(limit or CONFIG.mc_batch_size)
+    if not jobs:
+        return 0
     try:
-        target = hashlib.md5(old.encode("utf-8")).hexdigest()  # noqa S324
-        chimp.lists.members.update(
-            CONFIG.mc_list_id,
-            target,
-            {"email_address": new},
-        )
-    except MailChimpError as exc:
-        data = dict(exc.args[0])
-        if data.get("status") != NOT_FOUND:
-            rollbar.report_message(data)
+        results = await mailchimp.run_batch([_operation(job) for job in jobs])
+    except Exception as exc:  # noqa: BLE001
+        report_exc_info()
+        await _retry(jobs, repr(exc))
+        return len(jobs)
+    confirmed: dict[bool, list[str]] = {True: [], False: []}
+    retry: dict[str, list[MailingJob]] = {}
+    for job in jobs:
+        done, error = _outcome(job, results.get(job.id))
+        query = MailingJob.find_one({"_id": job.id, "version": job.version})
+        if done:
+            await query.delete()
+            _counters["synced"] += 1
+            if job.action != "update":
+                confirmed[job.action == "subscribe"].append(job.id)
+        elif done is None:
+            retry.setdefault(error or "", []).append(job)
+        else:
+            # Rejected addresses, such as ones Mailchimp considers fake, won't succeed on retry
+            await query.update({"$set": {"status": "failed", "error": error, "lease": None}})
+            _counters["failed"] += 1
+            if job.action == "subscribe":
+                confirmed[False].append(job.id)
+            else:
+                report_message(f"Mailing sync for {job.id} ({job.action}) failed: {error}")
+    for error, failed in retry.items():
+        await _retry(failed, error)
+    for subscribed, emails in confirmed.items():
+        await _set_subscribed(emails, subscribed=subscribed)
+    return len(jobs)
+
+
+async def mailing_worker() -> None:
+    """Sync mailing jobs forever, waiting between partial batches so changes can coalesce."""
+    while True:
+        try:
+            claimed = await flush()
+        except Exception:  # noqa: BLE001
+            report_exc_info()
+            claimed = 0
+        if claimed < CONFIG.mc_batch_size:
+            await aio.sleep(CONFIG.mc_sync_interval)
+
+
+async def mailing_stats() -> dict[str, Any]:
+    """Return job queue depth, sync lag and outcome counts."""
+    depth = {
+        status: await MailingJob.find(MailingJob.status == status).count()
+        for status in ("pending", "syncing", "failed")
+    }
+    oldest = (
+        await MailingJob.find({"status": {"$in": ["pending", "syncing"]}})
+        .sort(+MailingJob.queued)  # type: ignore[operator]
+        .first_or_none()
+    )
+    return {**depth, "lag": _age(oldest.queued) if oldest else 0.0, **_counters, "pool": mailchimp.pool.stats()}
@@ -0,0 +1,70 @@
+"""Move embedded user notifications into the notification collection."""
+
+from datetime import UTC, datetime
+from hashlib import sha256
+from typing import Any
+
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+from account.models.notification import Notification
+from account.models.user import User
+
+# Marker in the migrations collection once no user has embedded notifications
+NOTIFICATIONS = "notifications"
+
+
+def _notification_id(user_id: ObjectId, index: int, item: dict[str, Any]) -> ObjectId:
+    """Return the notification's original ID.
+
+    Entries saved without one get an ID from their timestamp and position, so
+    re-running the migration produces the same ID and pagination stays in time order.
+    """
+    if item.get("id"):
+        return ObjectId(str(item["id"]))
+    timestamp = item.get("timestamp") or datetime.now(tz=UTC)
+    seed = sha256(f"{user_id}:{index}".encode()).digest()[:8]
+    return ObjectId(ObjectId.from_datetime(timestamp).binary[:4] + seed)
+
+
+async def move_notifications() -> int:
+    """Copy embedded notifications with their original IDs, then remove them from the user.
+
+    Copies are upserts keyed on the ID, so a run that stopped part way through
+    can be repeated without duplicating notifications. Returns the number moved.
+    """
+    users = User.get_motor_collection()
+    notifications = Notification.get_motor_collection()
+    moved = 0
+    async for doc in users.find({"notifications": {"$exists": True}}, {"notifications": 1}):
+        writes = []
+        for i, item in enumerate(doc["notifications"] or []):
+            fields = {
+                "user_id": doc["_id"],
+                "type": item["type"],
+                "text": item["text"],
+                "timestamp": item.get("timestamp") or datetime.now(tz=UTC),
+            }
+            query = {"_id": _notification_id(doc["_id"], i, item)}
+            writes.append(UpdateOne(query, {"$setOnInsert": fields}, upsert=True))
+        if writes:
+            await notifications.bulk_write(writes, ordered=False)
+        await users.update_one({"_id": doc["_id"]}, {"$unset": {"notifications": ""}})
+        moved += len(writes)
+    return moved
+
+
+async def notifications_migrated() -> bool:
+    """Return False while any user still has embedded notifications.
+
+    The user scan only runs until it first comes back empty. That result is
+    stored in the migrations collection so later startups skip it.
+    """
+    users = User.get_motor_collection()
+    migrations = users.database["migrations"]
+    if await migrations.find_one({"_id": NOTIFICATIONS}):
+        return True
+    if await users.find_one({"notifications": {"$exists": True}}, {"_id": 1}):
+        return False
+    await migrations.update_one({"_id": NOTIFICATIONS}, {"$set": {"completed": datetime.now(tz=UTC)}}, upsert=True)
+    return True
@@ -0,0 +1,182 @@
+"""Durable outbound email delivery."""
+
+import asyncio as aio
+from collections.abc import Iterable
+from contextlib import suppress
+from datetime import UTC, datetime, timedelta
+from hashlib import sha256
+from typing import Any
+from uuid import uuid4
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from account.config import CONFIG
+from account.models.outbox import OutboxEmail
+from account.util.report import report_exc_info, report_message
+from account.util.smtp import build_message, smtp_pool
+
+# Seconds an idle worker waits before checking for retries that are now due
+POLL_INTERVAL = 1.0
+
+Email = tuple[str, str, str]
+
+_wake = aio.Event()
+_counters = {"queued": 0, "duplicate": 0, "sent": 0, "retried": 0, "dead": 0}
+_latency = {"total": 0.0, "max": 0.0}
+
+
+def _now() -> datetime:
+    return datetime.now(tz=UTC)
+
+
+def _age(since: datetime) -> float:
+    """Return seconds since a stored timestamp. Mongo returns naive UTC datetimes."""
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    return (_now() - since).total_seconds()
+
+
+def _id(email: str, title: str, key: str | None) -> str:
+    """Return the document ID for a message. Only messages with an idempotency key can collide."""
+    if key is None:
+        return uuid4().hex
+    return sha256(f"{key}\n{email}\n{title}".encode()).hexdigest()
+
+
+async def enqueue(emails: Iterable[Email], key: str | None = None) -> int:
+    """Store (email, title, body) messages for delivery. Returns the number of new emails.
+
+    Messages queued again with the same idempotency key, like the Stripe event
+    or token that triggered them, are dropped. Without a key nothing is deduped.
+    """
+    docs = {}
+    for email, title, body in emails:
+        doc_id = _id(email, title, key)
+        docs[doc_id] = OutboxEmail(id=doc_id, email=email, title=title, body=body)
+    if not docs:
+        return 0
+    queued = len(docs)
+    try:
+        await OutboxEmail.insert_many(list(docs.values()), ordered=False)
+    except BulkWriteError as exc:
+        # Duplicates are already queued or sent. Anything else is a real failure
+        errors = exc.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        queued -= len(errors)
+        _counters["duplicate"] += len(errors)
+    _counters["queued"] += queued
+    if queued:
+        _wake.set()
+    return queued
+
+
+async def claim() -> OutboxEmail | None:
+    """Lease the oldest available email to this worker.
+
+    Emails left sending by a worker that died become available again once
+    their lease runs out.
+    """
+    now = _now()
+    doc = await OutboxEmail.get_motor_collection().find_one_and_update(
+        {"status": {"$in": ["pending", "sending"]}, "available": {"$lte": now}},
+        {
+            "$set": {"status": "sending", "available": now + timedelta(seconds=CONFIG.mail_lease)},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("available", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        return None
+    email: OutboxEmail = OutboxEmail.model_validate(doc)
+    return email
+
+
+async def _deliver(email: OutboxEmail) -> None:
+    """Send an email or print it to the console."""
+    if CONFIG.mail_console:
+        print(email.body)
+        return
+    await smtp_pool.send(build_message(email.email, email.title, email.body))
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=CONFIG.mail_retry_delay * 2 ** max(attempts - 1, 0))
+
+
+async def process(email: OutboxEmail) -> bool:
+    """Deliver an email and record the result. Failures are retried with backoff."""
+    try:
+        await _deliver(email)
+    except Exception as exc:  # noqa: BLE001
+        error = repr(exc)
+    else:
+        await OutboxEmail.find_one({"_id": email.id}).update(
+            {"$set": {"status": "sent", "sent": _now(), "error": None}}
+        )
+        _counters["sent"] += 1
+        lag = _age(email.queued)
+        _latency["total"] += lag
+        _latency["max"] = max(_latency["max"], lag)
+        return True
+    query = OutboxEmail.find_one({"_id": email.id})
+    if email.attempts >= CONFIG.mail_max_attempts:
+        # Dead emails are kept until they are requeued or removed by hand
+        await query.update({"$set": {"status": "dead", "error": error}})
+        _counters["dead"] += 1
+        report_message(f"Email {email.id} to {email.email} ({email.title}) failed: {error}")
+        return False
+    fields = {"status": "pending", "available": _now() + _backoff(email.attempts), "error": error}
+    await query.update({"$set": fields})
+    _counters["retried"] += 1
+    return False
+
+
+async def mail_worker() -> None:
+    """Deliver outbox emails forever."""
+    while True:
+        try:
+            email = await claim()
+        except Exception:  # noqa: BLE001
+            report_exc_info()
+            email = None
+        if email is None:
+            _wake.clear()
+            with suppress(TimeoutError):
+                await aio.wait_for(_wake.wait(), POLL_INTERVAL)
+            continue
+        await process(email)
+
+
+async def requeue_dead() -> int:
+    """Return dead emails to the queue with a fresh set of attempts."""
+    result = await OutboxEmail.find(OutboxEmail.status == "dead").update(
+        {"$set": {"status": "pending", "attempts": 0, "available": _now()}}
+    )
+    count = result.modified_count if result else 0
+    if count:
+        _wake.set()
+    return count
+
+
+async def outbox_stats() -> dict[str, Any]:
+    """Return outbox depth, delivery lag and outcome counts."""
+    depth = {
+        status: await OutboxEmail.find(OutboxEmail.status == status).count()
+        for status in ("pending", "sending", "dead")
+    }
+    oldest = (
+        await OutboxEmail.find({"status": {"$in": ["pending", "sending"]}})
+        .sort(+OutboxEmail.queued)  # type: ignore[operator]
+        .first_or_none()
+    )
+    sent = _counters["sent"]
+    return {
+        **depth,
+        "lag": _age(oldest.queued) if oldest else 0.0,
+        **_counters,
+        "avg_latency": _latency["total"] / sent if sent else 0.0,
+        "max_latency": _latency["max"],
+    }
@@ -3,6 +3,7 @@
 import bcrypt
 
 from account.config import CONFIG
+from account.util.pool import WorkerPool
 
 
 def hash_password(password: str) -> str:
@@ -10,6 +11,25 @@ def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode(), CONFIG.salt).decode()
 
 
+def _check_password(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+
+# bcrypt releases the GIL while hashing, so threads are enough to let the
+# worker keep serving other requests during a burst of logins
+password_pool = WorkerPool(CONFIG.password_workers, "bcrypt")
+
+
+async def hash_password_async(password: str) -> str:
+    """Return a salted password hash without blocking the event loop."""
+    return await password_pool.run(hash_password, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """Return True if the password matches the stored hash."""
+    return await password_pool.run(_check_password, password, hashed)
+
+
 # def verify_and_update(original: str, password: str) -> Tuple[bool, str]:
 #     """Verify the original password and returns a new hash."""
 #     return _pass_context.verify_and_update(original, CONFIG.SALT + password)
@@ -0,0 +1,71 @@
+"""Bounded thread pools for blocking work."""
+
+import asyncio as aio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import monotonic
+from typing import Any
+
+
+def _timed[T](queued_at: float, func: Callable[[], T]) -> tuple[float, float, T]:
+    """Run func and return how long it waited in the pool queue and ran."""
+    started = monotonic()
+    result = func()
+    return started - queued_at, monotonic() - started, result
+
+
+class WorkerPool:
+    """Size-limited thread pool that keeps blocking calls off the event loop.
+
+    The worker count caps how many calls run at once. Extra calls wait in the
+    pool queue, which is reported by stats.
+    """
+
+    def __init__(self, workers: int, name: str) -> None:
+        self.workers = max(workers, 1)
+        self.name = name
+        self.pending = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_time = 0.0
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run[T](self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking function in the pool."""
+        loop = aio.get_running_loop()
+        call = partial(func, *args, **kwargs)
+        self.pending += 1
+        try:
+            wait, elapsed, result = await loop.run_in_executor(self._get_executor(), _timed, monotonic(), call)
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_time += elapsed
+        return result
+
+    def shutdown(self) -> None:
+        """Stop the pool threads. The pool restarts on next use."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict[str, float]:
+        """Return queue depth, wait and run time metrics."""
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "queued": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "avg_wait": self.total_wait / self.completed if self.completed else 0.0,
+            "max_wait": self.max_wait,
+            "avg_time": self.total_time / self.completed if self.completed else 0.0,
+        }
@@ -1,28 +1,130 @@
 """reCaptcha verification."""
 
-from httpx import AsyncClient
+from time import monotonic
+from typing import Any
+
+import httpx
 
 from account.config import CONFIG
+from account.util.report import report_message
 
 THRESHOLD = 0.6
-TIMEOUT = 10
 URL = "https://www.google.com/recaptcha/api/siteverify"
 
 
+class ReCaptcha:
+    """Verifies tokens over a shared keep-alive client behind a circuit breaker.
+
+    After a run of failed calls the breaker opens and verification is decided
+    by the fail-open setting without calling Google. Once the reset time has
+    passed, a single call is let through to test if the service recovered.
+    """
+
+    def __init__(self, timeout: float, failure_threshold: int, reset_after: float) -> None:
+        self.timeout = timeout
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial = False
+        self._client: httpx.AsyncClient | None = None
+        self._counters = {"passed": 0, "rejected": 0, "errors": 0, "short_circuited": 0}
+        self._latency = {"count": 0, "total": 0.0, "max": 0.0}
+
+    def start(self) -> httpx.AsyncClient:
+        """Return the shared client, creating it if it isn't open."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=10, keepalive_expiry=60),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        """Close the client's pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def state(self) -> str:
+        """Return the breaker state."""
+        if self.opened_at is None:
+            return "closed"
+        if self._trial or monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def _allow(self) -> bool:
+        """Return True if a call may be made to the service."""
+        match self.state:
+            case "closed":
+                return True
+            case "half-open" if not self._trial:
+                self._trial = True
+                return True
+        return False
+
+    def _record(self, elapsed: float, *, ok: bool) -> None:
+        self._latency["count"] += 1
+        self._latency["total"] += elapsed
+        self._latency["max"] = max(self._latency["max"], elapsed)
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+            return
+        self._counters["errors"] += 1
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                report_message(f"reCaptcha breaker opened after {self.failures} failures", "warning")
+            self.opened_at = monotonic()
+
+    async def _call(self, token: str) -> dict[str, Any] | None:
+        """Return the service response or None if the call failed."""
+        start = monotonic()
+        try:
+            resp = await self.start().post(URL, params={"response": token, "secret": CONFIG.recaptcha_secret_key})
+            resp.raise_for_status()
+            data: dict[str, Any] = resp.json()
+        except (httpx.HTTPError, ValueError):
+            self._record(monotonic() - start, ok=False)
+            return None
+        finally:
+            # Any outcome ends a trial, including a cancelled request, so the breaker can probe again
+            self._trial = False
+        self._record(monotonic() - start, ok=True)
+        return data
+
+    async def verify(self, token: str) -> bool:
+        """Call reCaptcha service to verify data token."""
+        if not self._allow():
+            self._counters["short_circuited"] += 1
+            return CONFIG.recaptcha_fail_open
+        if (data := await self._call(token)) is None:
+            return CONFIG.recaptcha_fail_open
+        score = data.get("score")
+        passed = data.get("success") is True and isinstance(score, float) and score >= THRESHOLD
+        self._counters["passed" if passed else "rejected"] += 1
+        return passed
+
+    def stats(self) -> dict[str, Any]:
+        """Return breaker state, outcome counts and call latency."""
+        count = self._latency["count"]
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            **self._counters,
+            "avg_latency": self._latency["total"] / count if count else 0.0,
+            "max_latency": self._latency["max"],
+        }
+
+
+recaptcha = ReCaptcha(CONFIG.recaptcha_timeout, CONFIG.recaptcha_failure_threshold, CONFIG.recaptcha_reset_after)
+
+
 async def verify(token: str) -> bool:
     """Call reCaptcha service to verify data token."""
     if CONFIG.testing:
         return True
-    async with AsyncClient(timeout=10) as client:
-        resp = await client.post(
-            URL,
-            params={
-                "response": token,
-                "secret": CONFIG.recaptcha_secret_key,
-            },
-        )
-    data: dict = resp.json()
-    if data.get("success") is not True:
-        return False
-    score = data.get("score")
-    return isinstance(score, float) and score >= THRESHOLD
+    return await recaptcha.verify(token)
@@ -0,0 +1,142 @@
+"""Compare user billing fields with what Stripe bills."""
+
+import asyncio as aio
+from collections.abc import AsyncIterator, Callable
+from time import monotonic
+from typing import TYPE_CHECKING, Any
+
+from pydantic import BaseModel
+
+from account.models.addon import Addon
+from account.models.plan import Plan
+from account.models.subscription import SubscriptionMirror
+from account.models.user import Stripe, User
+from account.util.billing import billing
+
+if TYPE_CHECKING:
+    from stripe import Subscription
+
+# Stripe statuses that still bill the customer
+ACTIVE = {"active", "trialing", "past_due"}
+
+
+class Mismatch(BaseModel):
+    """User billing field that differs from Stripe."""
+
+    email: str
+    field: str
+    stored: Any
+    stripe: Any
+
+
+class ReconcileReport(BaseModel):
+    """Reconciliation totals and throughput."""
+
+    checked: int = 0
+    mismatched: int = 0
+    fixed: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Return users checked per second."""
+        return self.checked / self.elapsed if self.elapsed else 0.0
+
+
+def _pick(user: User, subs: "list[Subscription]") -> "Subscription | None":
+    """Return the billing subscription, preferring the one stored on the user."""
+    active = [sub for sub in subs if sub.status in ACTIVE]
+    if user.stripe and (stored := next((sub for sub in active if sub.id == user.stripe.subscription_id), None)):
+        return stored
+    return max(active, key=lambda sub: sub.created, default=None)
+
+
+async def check_user(user: User, *, fix: bool = False) -> list[Mismatch]:
+    """Return a user's billing mismatches, updating the user to match Stripe if fix is set."""
+    if user.stripe is None:
+        return []
+    sub = _pick(user, await billing.list_subscriptions(user.stripe.customer_id))
+    items = sub["items"].data if sub else []
+    products = [item.price.product if isinstance(item.price.product, str) else item.price.product.id for item in items]
+    paid = [plan for item in items if (plan := await Plan.by_stripe_id(item.price.id))]
+    addons = await Addon.by_product_ids(*products)
+    plan = user.plan
+    if paid:
+        plan = paid[0]
+    elif user.plan and user.plan.stripe_id:
+        # Paid plans without a subscription fall back to free
+        plan = await Plan.by_key("free")
+    sub_id = sub.id if sub else None
+    expected = {
+        "subscription_id": sub_id,
+        "plan": plan.key if plan else None,
+        "addons": sorted(addon.key for addon in addons.values()),
+    }
+    stored = {
+        "subscription_id": user.stripe.subscription_id,
+        "plan": user.plan.key if user.plan else None,
+        "addons": sorted(addon.key for addon in user.addons),
+    }
+    mismatches = [
+        Mismatch(email=user.email, field=field, stored=stored[field], stripe=value)
+        for field, value in expected.items()
+        if stored[field] != value
+    ]
+    if fix and mismatches:
+        plan_key = plan.key if plan else "free"
+        await user.set_fields(
+            stripe=Stripe(customer_id=user.stripe.customer_id, subscription_id=sub_id),
+            plan=plan,
+            addons=[addon.to_user(plan_key) for addon in addons.values()],
+        )
+        if sub:
+            await SubscriptionMirror.store(sub)
+    return mismatches
+
+
+async def _stream_users(batch_size: int) -> AsyncIterator[list[User]]:
+    """Yield billed users in batches from a single cursor."""
+    cursor = User.get_motor_collection().find({"stripe.customer_id": {"$type": "string"}}, batch_size=batch_size)
+    batch: list[User] = []
+    async for doc in cursor:
+        batch.append(User.model_validate(doc))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def reconcile(
+    *,
+    fix: bool = False,
+    batch_size: int = 100,
+    concurrency: int = 8,
+    report: Callable[[Mismatch], None] = print,
+) -> ReconcileReport:
+    """Check every billed user against Stripe with bounded concurrency."""
+    result = ReconcileReport()
+    limit = aio.Semaphore(concurrency)
+    start = monotonic()
+
+    async def run(user: User) -> None:
+        async with limit:
+            try:
+                mismatches = await check_user(user, fix=fix)
+            except Exception as exc:  # noqa: BLE001
+                result.errors += 1
+                print(f"{user.email}: {exc!r}")
+                return
+        result.checked += 1
+        if mismatches:
+            result.mismatched += 1
+            if fix:
+                result.fixed += 1
+            for mismatch in mismatches:
+                report(mismatch)
+
+    async for batch in _stream_users(batch_size):
+        await aio.gather(*(run(user) for user in batch))
+    result.elapsed = monotonic() - start
+    return result
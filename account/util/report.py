@@ -0,0 +1,25 @@
+"""Error reporting.
+
+rollbar is only imported when there is a log key to report with, so workers
+and scripts without one don't load it.
+"""
+
+from typing import Any
+
+from account.config import CONFIG
+
+
+def report_exc_info() -> None:
+    """Report the exception being handled."""
+    if CONFIG.log_key:
+        import rollbar
+
+        rollbar.report_exc_info()
+
+
+def report_message(message: Any, level: str = "error") -> None:
+    """Report a message or object."""
+    if CONFIG.log_key:
+        import rollbar
+
+        rollbar.report_message(message, level)
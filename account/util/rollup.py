@@ -0,0 +1,141 @@
+"""Monthly token usage rollups."""
+
+import asyncio as aio
+from collections.abc import Iterator
+from contextlib import suppress
+from datetime import datetime, timedelta
+from typing import Any
+from uuid import uuid4
+
+from account.config import CONFIG
+from account.models.token import TokenUsage, TokenUsageMonth, UserUsageMonth
+from account.util.lease import acquire_lease, lease_collection, release_lease
+from account.util.report import report_exc_info
+from account.util.token import next_period
+
+# Number of token or user months recomputed per aggregation
+BATCH_SIZE = 500
+
+_MONTH = {"$dateTrunc": {"date": "$date", "unit": "month"}}
+
+LEASE = "rollup"
+# Identifies this process as the lease holder
+_owner = uuid4().hex
+
+
+def _batches(items: list[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+    for i in range(0, len(items), BATCH_SIZE):
+        yield items[i : i + BATCH_SIZE]
+
+
+def _merge_stages(into: str, on: list[str]) -> list[dict[str, Any]]:
+    """Shape grouped totals into rollup rows and upsert them."""
+    return [
+        {"$replaceWith": {"$mergeObjects": ["$_id", {"count": "$count", "updated": "$updated"}]}},
+        {"$merge": {"into": into, "on": on, "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+async def _rollup_tokens(match: dict[str, Any]) -> None:
+    """Recompute per-token monthly totals for matching daily usage."""
+    pipeline = [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {"user_id": "$user_id", "token_id": "$token_id", "date": _MONTH},
+                "count": {"$sum": "$count"},
+                "updated": {"$max": "$updated"},
+            }
+        },
+        *_merge_stages(TokenUsageMonth.Settings.name, ["token_id", "date"]),
+    ]
+    await TokenUsage.get_motor_collection().aggregate(pipeline).to_list(None)
+
+
+async def _rollup_users(match: dict[str, Any]) -> None:
+    """Recompute per-user monthly totals from per-token rollups."""
+    pipeline = [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {"user_id": "$user_id", "date": "$date"},
+                "count": {"$sum": "$count"},
+                "updated": {"$max": "$updated"},
+            }
+        },
+        *_merge_stages(UserUsageMonth.Settings.name, ["user_id", "date"]),
+    ]
+    await TokenUsageMonth.get_motor_collection().aggregate(pipeline).to_list(None)
+
+
+async def watermark() -> datetime | None:
+    """Return the latest daily usage update included in the rollups."""
+    latest = await TokenUsageMonth.find_all().sort(-TokenUsageMonth.updated).first_or_none()  # type: ignore[operator]
+    return latest.updated if latest else None
+
+
+async def refresh_rollups(*, backfill: bool = False) -> int:
+    """Update monthly rollups for daily usage changed since the last refresh.
+
+    Only the token months containing changed days are recomputed, so each
+    refresh costs a few dozen daily documents per active token. Returns the
+    number of token months updated.
+    """
+    if backfill:
+        await _rollup_tokens({})
+        await _rollup_users({})
+        return await TokenUsageMonth.count()
+    since = await watermark()
+    # Rows updated shortly before the watermark are reprocessed in case they were written late.
+    # Rollups are idempotent, so recomputing a month that didn't change is safe
+    match = {} if since is None else {"updated": {"$gte": since - timedelta(seconds=CONFIG.usage_rollup_overlap)}}
+    changed = await (
+        TokenUsage.get_motor_collection()
+        .aggregate(
+            [
+                {"$match": match},
+                {"$group": {"_id": {"user_id": "$user_id", "token_id": "$token_id", "date": _MONTH}}},
+            ]
+        )
+        .to_list(None)
+    )
+    if not changed:
+        return 0
+    for batch in _batches([item["_id"] for item in changed]):
+        # Recompute each changed month from every day in it, not just the changed days
+        await _rollup_tokens(
+            {
+                "$or": [
+                    {
+                        "token_id": item["token_id"],
+                        "date": {"$gte": item["date"], "$lt": next_period(item["date"], "month")},
+                    }
+                    for item in batch
+                ]
+            }
+        )
+    user_months = list({(item["_id"]["user_id"], item["_id"]["date"]) for item in changed})
+    for batch in _batches([{"user_id": user_id, "date": date} for user_id, date in user_months]):
+        await _rollup_users({"$or": batch})
+    return len(changed)
+
+
+async def rollup_worker(interval: int) -> None:
+    """Refresh monthly rollups forever at a fixed interval.
+
+    Every server process runs a worker, but only the one holding the rollup
+    lease refreshes. Another takes over if the holder stops renewing it.
+    """
+    leases = lease_collection(TokenUsageMonth)
+    lease = max(CONFIG.usage_rollup_lease, interval * 2)
+    try:
+        while True:
+            try:
+                if await acquire_lease(leases, LEASE, _owner, lease):
+                    await refresh_rollups()
+            except Exception:  # noqa: BLE001
+                report_exc_info()
+            await aio.sleep(interval)
+    finally:
+        with suppress(Exception):
+            await release_lease(leases, LEASE, _owner)
@@ -0,0 +1,116 @@
+"""Pooled SMTP transport."""
+
+import asyncio as aio
+from collections.abc import Iterable
+from email.message import EmailMessage
+from time import monotonic
+
+from aiosmtplib import SMTP, SMTPException, SMTPServerDisconnected
+
+from account.config import CONFIG
+
+
+def build_message(email: str, title: str, body: str) -> EmailMessage:
+    """Return a plain text email."""
+    message = EmailMessage()
+    message["From"] = CONFIG.mail_sender
+    message["To"] = email
+    message["Subject"] = title
+    message.set_content(body)
+    return message
+
+
+class SMTPPool:
+    """Small pool of authenticated SMTP connections that are kept open.
+
+    Each send borrows an idle connection or opens a new one, so independent
+    messages go out in parallel without a STARTTLS handshake and login per
+    email. Connections idle for longer than the idle timeout are replaced
+    since servers drop them.
+    """
+
+    def __init__(self, size: int, idle_timeout: float) -> None:
+        self.size = max(size, 1)
+        self.idle_timeout = idle_timeout
+        self.sent = 0
+        self.connects = 0
+        self.errors = 0
+        self._idle: list[tuple[float, SMTP]] = []
+        self._limit: aio.Semaphore | None = None
+
+    def _get_limit(self) -> aio.Semaphore:
+        # Created on first use so it binds to the running loop
+        if self._limit is None:
+            self._limit = aio.Semaphore(self.size)
+        return self._limit
+
+    async def _connect(self) -> SMTP:
+        smtp = SMTP(
+            hostname=CONFIG.mail_server,
+            port=CONFIG.mail_port,
+            username=CONFIG.mail_username or None,
+            password=CONFIG.mail_password or None,
+            start_tls=CONFIG.mail_starttls,
+            timeout=CONFIG.mail_timeout,
+        )
+        await smtp.connect()
+        self.connects += 1
+        return smtp
+
+    @staticmethod
+    async def _close(smtp: SMTP) -> None:
+        """Close a connection. Errors are ignored so they can't hide a send failure being handled."""
+        try:
+            await smtp.quit()
+        except (SMTPException, OSError, TimeoutError):
+            smtp.close()
+
+    async def _acquire(self) -> SMTP:
+        """Return the most recently used live connection or a new one."""
+        while self._idle:
+            used, smtp = self._idle.pop()
+            if smtp.is_connected and monotonic() - used < self.idle_timeout:
+                return smtp
+            await self._close(smtp)
+        return await self._connect()
+
+    async def send(self, message: EmailMessage) -> None:
+        """Send a message over a pooled connection."""
+        async with self._get_limit():
+            smtp = await self._acquire()
+            try:
+                try:
+                    await smtp.send_message(message)
+                except SMTPServerDisconnected:
+                    # The server closed the connection between sends. Retry once on a new one
+                    smtp = await self._connect()
+                    await smtp.send_message(message)
+            except Exception:
+                self.errors += 1
+                await self._close(smtp)
+                raise
+            self.sent += 1
+            self._idle.append((monotonic(), smtp))
+
+    async def send_many(self, messages: Iterable[EmailMessage]) -> list[BaseException | None]:
+        """Send messages concurrently. Returns the error for each message, if any."""
+        results = await aio.gather(*(self.send(message) for message in messages), return_exceptions=True)
+        return [result if isinstance(result, BaseException) else None for result in results]
+
+    async def close(self) -> None:
+        """Close all idle connections."""
+        idle, self._idle = self._idle, []
+        await aio.gather(*(self._close(smtp) for _, smtp in idle))
+        self._limit = None
+
+    def stats(self) -> dict[str, int]:
+        """Return connection and delivery counters."""
+        return {
+            "idle": len(self._idle),
+            "connects": self.connects,
+            "sent": self.sent,
+            "errors": self.errors,
+        }
+
+
+smtp_pool = SMTPPool(CONFIG.mail_pool_size, CONFIG.mail_idle_timeout)
@@ -1,74 +1,96 @@
 """Stripe subscription utilities."""
 
-import stripe
-from stripe import Event, Invoice, Price, Subscription, Webhook
+from typing import TYPE_CHECKING, Any
 
 from account.config import CONFIG
-from account.models.addon import Addon
+from account.models.addon import Addon, UserAddon
+from account.models.cache import portal_cache
+from account.models.coalesce import lookups
 from account.models.plan import Plan
+from account.models.subscription import SubscriptionMirror
 from account.models.user import Stripe, User, UserToken
+from account.models.util import JustUrl
 from account.util import mail
+from account.util.billing import billing
+
+# The Stripe SDK is only imported when it's first called. See account.util.billing
+if TYPE_CHECKING:
+    from stripe import Event, Invoice, Price, Subscription
+    from stripe.checkout import Session as CheckoutSession
 
-stripe.api_key = CONFIG.stripe_secret_key
 _SUCCESS_URL = f"{CONFIG.root_url}/stripe/success"
 _CANCEL_URL = f"{CONFIG.root_url}/stripe/cancel"
 
 
-def get_session(user: User, price_id: str, *, metered: bool = False) -> stripe.checkout.Session:
+async def get_session(user: User, price_id: str, *, metered: bool = False) -> "CheckoutSession":
     """Create a Stripe Session object to start a Checkout."""
-    if metered:
-        item = stripe.checkout.Session.CreateParamsLineItem(price=price_id)
-    else:
-        item = stripe.checkout.Session.CreateParamsLineItem(price=price_id, quantity=1)
+    item: dict[str, Any] = {"price": price_id}
+    if not metered:
+        item["quantity"] = 1
+    params: dict[str, Any] = {
+        "client_reference_id": str(user.id),
+        "mode": "subscription",
+        "line_items": [item],
+        "payment_method_types": ["card"],
+        "success_url": _SUCCESS_URL,
+        "cancel_url": _CANCEL_URL,
+    }
     if user.stripe:
-        return stripe.checkout.Session.create(
-            customer=user.stripe.customer_id,
-            client_reference_id=str(user.id),
-            mode="subscription",
-            line_items=[item],
-            payment_method_types=["card"],
-            success_url=_SUCCESS_URL,
-            cancel_url=_CANCEL_URL,
-        )
-    return stripe.checkout.Session.create(
-        customer_email=user.email,
-        client_reference_id=str(user.id),
-        mode="subscription",
-        line_items=[item],
-        payment_method_types=["card"],
-        success_url=_SUCCESS_URL,
-        cancel_url=_CANCEL_URL,
-    )
-
-
-def get_event(payload: str | bytes, sig: str) -> Event:
-    """Validate a Stripe event to weed out hacked calls."""
-    event: Event = Webhook.construct_event(payload, sig, CONFIG.stripe_sign_secret)
+        params["customer"] = user.stripe.customer_id
+    else:
+        params["customer_email"] = user.email
+    return await billing.create_checkout(params)
+
+
+def get_event(payload: str | bytes, sig: str) -> "Event":
+    """Validate a Stripe event to weed out hacked calls. Raises ValueError if it isn't valid."""
+    from stripe import SignatureVerificationError, Webhook
+
+    try:
+        event: Event = Webhook.construct_event(payload, sig, CONFIG.stripe_sign_secret)
+    except SignatureVerificationError as exc:
+        raise ValueError(str(exc)) from exc
     return event
 
 
-def get_portal_session(user: User) -> stripe.billing_portal.Session:
-    """Create a Stripe billing portal session."""
+async def get_portal_url(user: User) -> str:
+    """Return a Stripe billing portal URL, reusing a recent session for the customer."""
     if user.stripe is None:
         msg = "Cannot create billing session without stripe info"
         raise ValueError(msg)
-    return stripe.billing_portal.Session.create(
-        customer=user.stripe.customer_id,
-        return_url=f"{CONFIG.root_url}/plans",
-    )
+    customer_id = user.stripe.customer_id
+    if cached := portal_cache.get(customer_id):
+        return cached.url
+    epoch = portal_cache.epoch
+
+    async def create() -> JustUrl:
+        session = await billing.create_portal(customer_id, f"{CONFIG.root_url}/plans")
+        return JustUrl(url=session.url)
+
+    portal = await lookups.do(("portal", customer_id), create)
+    portal_cache.set(customer_id, portal, epoch)
+    return portal.url
 
 
-def get_subscription(session: stripe.checkout.Session) -> Subscription:
+async def get_subscription(session: "CheckoutSession") -> "Subscription":
     """Load Stripe subscription from checkout session."""
     if not session.subscription:
         msg = "No subscription found after checkout session."
         raise ValueError(msg)
-    if isinstance(session.subscription, Subscription):
-        return session.subscription
-    return Subscription.retrieve(session.subscription)
+    if isinstance(session.subscription, str):
+        return await billing.get_subscription(session.subscription)
+    return session.subscription
 
 
-def get_customer_id(session: stripe.checkout.Session | Invoice) -> str:
+async def load_subscription(subscription_id: str) -> SubscriptionMirror:
+    """Return the subscription mirror, refreshing it from Stripe when stale."""
+    mirror = await SubscriptionMirror.get(subscription_id)
+    if mirror is not None and mirror.is_fresh:
+        return mirror
+    return await SubscriptionMirror.store(await billing.get_subscription(subscription_id))
+
+
+def get_customer_id(session: "CheckoutSession | Invoice") -> str:
     """Load customer ID from Stripe objects."""
     if not session.customer:
         msg = "No customer ID found after checkout session."
@@ -76,26 +98,58 @@ def get_customer_id(session: stripe.checkout.Session | Invoice) -> str:
     return session.customer if isinstance(session.customer, str) else session.customer.id
 
 
-async def new_subscription(session: stripe.checkout.Session) -> bool:
+def event_customer_id(event: "Event") -> str | None:
+    """Return the customer an event applies to, if any."""
+    customer = event.data.object.get("customer")
+    if customer is None or isinstance(customer, str):
+        return customer
+    return str(customer.id)
+
+
+def _product_id(price: "Price") -> str:
+    return price.product if isinstance(price.product, str) else price.product.id
+
+
+async def new_subscription(session: "CheckoutSession") -> bool:
     """Create a new subscription for a validated Checkout Session."""
     user = await User.from_stripe_session(session)
     if user is None or user.plan is None:
         return False
-    sub = get_subscription(session)
-    user.stripe = Stripe(customer_id=get_customer_id(session), subscription_id=sub.id)
+    sub = await get_subscription(session)
+    await SubscriptionMirror.store(sub)
+    stripe_ids = Stripe(customer_id=get_customer_id(session), subscription_id=sub.id)
     price: Price = sub["items"].data[0].price
     if plan := await Plan.by_stripe_id(price.id):
-        user.plan = plan
-        token = await UserToken.new(type="dev")
-        user.tokens.append(token)
-    elif addon := await Addon.by_product_id(price.product if isinstance(price.product, str) else price.product.id):
-        user.addons.append(addon.to_user(user.plan.key))
+        await user.set_fields(stripe=stripe_ids, plan=plan)
+        await user.add_token(UserToken.new(type="dev"))
+    elif addon := await Addon.by_product_id(_product_id(price)):
+        await user.set_fields(stripe=stripe_ids)
+        await user.add_addon(addon.to_user(user.plan.key))
     else:
         return False
-    await user.save()
     return True
 
 
+async def _plan_items(sub: SubscriptionMirror, plan: Plan) -> tuple[list[dict[str, Any]], list[UserAddon]]:
+    """Return the item updates that move a subscription to a plan and the addons they reprice."""
+    items: list[dict[str, Any]] = []
+    replaced: list[UserAddon] = []
+    addons = await Addon.by_product_ids(*(item.product_id for item in sub.items))
+    for item in sub.items:
+        if addon := addons.get(item.product_id):
+            user_addon = addon.to_user(plan.key)
+            if user_addon.price_id != item.price_id:
+                replaced.append(user_addon)
+                items.append({"id": item.id, "price": user_addon.price_id})
+        elif plan.stripe_id:
+            # This updates an existing paid plan
+            items.append({"id": item.id, "plan": plan.stripe_id})
+        else:
+            msg = "Unable to find a stripe product ID to modify"
+            raise ValueError(msg)
+    return items, replaced
+
+
 async def change_subscription(user: User, plan: Plan) -> bool:
     """Change the subscription from one plan to another."""
     if not user.stripe:
@@ -103,33 +157,26 @@ async def change_subscription(user: User, plan: Plan) -> bool:
     sub_id = user.stripe.subscription_id
     if not sub_id or user.plan == plan:
         return False
-    items: list[Subscription.ModifyParamsItem] = []
-    sub = Subscription.retrieve(sub_id)
-    # Update existing subscription items
-    for item in sub["items"].data:
-        addon_id = item.price.product if isinstance(item.price.product, str) else item.price.product.id
-        if addon := await Addon.by_product_id(addon_id):
-            user_addon = addon.to_user(plan.key)
-            if user_addon.price_id != item.price.id:
-                user.replace_addon(user_addon)
-                items.append(Subscription.ModifyParamsItem(id=item.id, price=user_addon.price_id))
-        elif plan.stripe_id:
-            # This updates an existing paid plan
-            items.append(Subscription.ModifyParamsItem(id=item.id, plan=plan.stripe_id))
-        else:
-            msg = "Unable to find a stripe product ID to modify"
-            raise ValueError(msg)
-    sub.modify(
-        sub_id,
-        cancel_at_period_end=False,
-        items=items,
-    )
+    from stripe import InvalidRequestError
+
+    sub = await load_subscription(sub_id)
+    items, replaced = await _plan_items(sub, plan)
+    try:
+        updated = await billing.update_subscription(sub_id, {"cancel_at_period_end": False, "items": items})
+    except InvalidRequestError:
+        # The mirror may hold item IDs Stripe has since replaced, so retry once with its current items
+        sub = await SubscriptionMirror.store(await billing.get_subscription(sub_id))
+        items, replaced = await _plan_items(sub, plan)
+        updated = await billing.update_subscription(sub_id, {"cancel_at_period_end": False, "items": items})
+    await SubscriptionMirror.store(updated)
+    # Only touch the addons whose price changed so concurrent addon writes aren't lost
+    for user_addon in replaced:
+        await user.replace_addon(user_addon)
     # This adds a paid plan if coming from a free one after modifying any addons
     if user.plan and not user.plan.stripe_id and plan.stripe_id:
-        add_to_subscription(user, plan.stripe_id)
+        await add_to_subscription(user, plan.stripe_id)
     user.stripe.subscription_id = sub.id
-    user.plan = plan
-    await user.save()
+    await user.set_fields(stripe=user.stripe, plan=plan)
     return True
 
 
@@ -137,78 +184,88 @@ async def cancel_subscription(user: User, *, keep_addons: bool = False) -> bool:
     """Cancel a subscription."""
     if user.stripe is None or user.plan is None:
         return False
+    fields: dict[str, Any] = {}
     if user.stripe.subscription_id:
-        if keep_addons and not remove_from_subscription(user, user.plan.stripe_id):
+        if keep_addons and not await remove_from_subscription(user, user.plan.stripe_id):
             return False
-        if Subscription.retrieve(user.stripe.subscription_id).delete().ended_at:
+        canceled = await billing.cancel_subscription(user.stripe.subscription_id)
+        await SubscriptionMirror.store(canceled)
+        if canceled.ended_at:
             user.stripe.subscription_id = None
-            user.addons = []
-    user.plan = await Plan.by_key("free")
-    user.tokens = [t for t in user.tokens if t.type != "dev"]
-    await user.save()
+            # Addons are billed on the subscription, so they end with it
+            fields["addons"] = []
+    await user.set_fields(stripe=user.stripe, plan=await Plan.by_key("free"), **fields)
+    await user.remove_tokens_by_type("dev")
     return True
 
 
-def add_to_subscription(user: User, price_id: str) -> bool:
+async def add_to_subscription(user: User, price_id: str) -> bool:
     """Add an addon to an existing subscription."""
     if not user.has_subscription or user.stripe is None or user.stripe.subscription_id is None:
         return False
-    stripe.SubscriptionItem.create(subscription=user.stripe.subscription_id, price=price_id)
+    await billing.add_item(user.stripe.subscription_id, price_id)
+    await SubscriptionMirror.expire(user.stripe.subscription_id)
     return True
 
 
-def remove_from_subscription(user: User, price_id: str | None = None) -> bool:
+async def remove_from_subscription(user: User, price_id: str | None = None) -> bool:
     """Remove an addon from a subscription."""
     if not user.has_subscription or user.stripe is None or user.stripe.subscription_id is None:
         return False
-    sub = Subscription.retrieve(user.stripe.subscription_id)
-    for item in sub["items"].data:
-        if item.price.id == price_id:
-            if len(sub["items"].data) != 1:
-                return (
-                    stripe.SubscriptionItem.delete(item.id, clear_usage=item.plan.usage_type == "metered").deleted
-                    is True
-                )
+    sub = await load_subscription(user.stripe.subscription_id)
+    for item in sub.items:
+        if item.price_id == price_id:
+            if len(sub.items) != 1:
+                deleted = await billing.delete_item(item.id, clear_usage=item.usage_type == "metered")
+                await SubscriptionMirror.expire(sub.id)
+                return deleted.deleted is True
             # If nothing left in subscription
-            sub = stripe.Subscription.retrieve(user.stripe.subscription_id)
-            if sub.delete().ended_at:
+            canceled = await billing.cancel_subscription(sub.id)
+            await SubscriptionMirror.store(canceled)
+            if canceled.ended_at:
                 user.stripe = None
                 return True
     return False
 
 
-def update_email(user: User, new_email: str) -> bool:
+async def update_email(user: User, new_email: str) -> bool:
     """Update the email associated with the Stripe user."""
     if not user.has_subscription or user.stripe is None:
         return False
-    stripe.Customer.modify(user.stripe.customer_id, email=new_email)
+    await billing.update_customer_email(user.stripe.customer_id, new_email)
+    return True
+
+
+async def sync_subscription(event: "Event") -> bool:
+    """Update the subscription mirror from a subscription event."""
+    await SubscriptionMirror.store(event.data.object, as_of=event.created)  # type: ignore[arg-type]
     return True
 
 
-async def invoice_paid(invoice: Invoice) -> bool:
+async def invoice_paid(invoice: "Invoice") -> bool:
     """Re-enable a user account after invoice payment."""
     user = await User.by_customer_id(get_customer_id(invoice))
     if user is None:
         return False
     if user.disabled:
-        user.disabled = False
-        await user.save()
-        await mail.send_enabled_email(user.email)
+        await user.set_fields(disabled=False)
+        await mail.send_enabled_email(user.email, key=f"{invoice.id}:paid")
     return True
 
 
-async def invoice_failed(invoice: Invoice) -> bool:
+async def invoice_failed(invoice: "Invoice") -> bool:
     """Disable user account if two or more failed invoices."""
     if invoice.paid or invoice.attempt_count < 1:
         return True
     user = await User.by_customer_id(get_customer_id(invoice))
     if user is None:
         return False
-    url = get_portal_session(user).url
+    url = await get_portal_url(user)
+    # Each failed attempt is a new event for the same invoice
+    key = f"{invoice.id}:failed:{invoice.attempt_count}"
     if invoice.attempt_count == 1:
-        await mail.send_disable_email(user.email, url, warning=True)
+        await mail.send_disable_email(user.email, url, warning=True, key=key)
         return True
-    user.disabled = True
-    await user.save()
-    await mail.send_disable_email(user.email, url)
+    await user.set_fields(disabled=True)
+    await mail.send_disable_email(user.email, url, key=key)
     return True
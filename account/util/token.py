@@ -1,35 +1,184 @@
 """Shared token utilities."""
 
 from datetime import UTC, datetime, timedelta
+from typing import Any
 
 from bson.objectid import ObjectId
 
-from account.models.token import AllTokenUsageOut, TokenUsage
-from account.models.user import User
+from account.config import CONFIG
+from account.models.database import reader
+from account.models.token import (
+    AllTokenUsageOut,
+    Granularity,
+    TokenUsage,
+    TokenUsageMonth,
+    TokenUsageOut,
+    UserUsageMonth,
+)
+from account.models.user import User, UserTokenView, UserView
 
 
-async def token_usage_for(user: User, days: int) -> list[AllTokenUsageOut]:
-    """Get recent token history for a user."""
-    days_since = datetime.now(tz=UTC) - timedelta(days=days)
-    data = (
-        await TokenUsage.find(
-            TokenUsage.user_id == ObjectId(user.id),
-            TokenUsage.date >= days_since,
-        )
-        .aggregate(
-            [
-                {"$project": {"_id": 0, "date": 1, "count": 1, "token_id": 1}},
-                {
-                    "$group": {
-                        "_id": "$token_id",
-                        "days": {"$push": {"date": "$date", "count": "$count"}},
-                    }
+def _truncate(date: datetime, granularity: Granularity) -> datetime:
+    """Return the start of the bucket containing date. Matches $dateTrunc."""
+    date = date.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return date - timedelta(days=date.weekday())
+    if granularity == "month":
+        return date.replace(day=1)
+    return date
+
+
+def next_period(date: datetime, granularity: Granularity) -> datetime:
+    """Return the start of the following bucket."""
+    if granularity == "week":
+        return date + timedelta(weeks=1)
+    if granularity == "month":
+        return date.replace(year=date.year + date.month // 12, month=date.month % 12 + 1)
+    return date + timedelta(days=1)
+
+
+def usage_window(days: int, granularity: Granularity = "day") -> tuple[datetime, datetime]:
+    """Return the inclusive start and exclusive end of the last number of days in buckets."""
+    today = datetime.now(tz=UTC)
+    start = _truncate(today - timedelta(days=max(days, 1) - 1), granularity)
+    end = next_period(_truncate(today, granularity), granularity)
+    return start, end
+
+
+def _bucket_stages(granularity: Granularity) -> list[dict[str, Any]]:
+    """Sum daily usage into buckets."""
+    return [
+        {
+            "$group": {
+                "_id": {
+                    "token_id": "$token_id",
+                    "date": {"$dateTrunc": {"date": "$date", "unit": granularity, "startOfWeek": "monday"}},
                 },
-            ]
-        )
-        .to_list()
+                "count": {"$sum": "$count"},
+            }
+        },
+        {"$project": {"_id": 0, "token_id": "$_id.token_id", "date": "$_id.date", "count": 1}},
+    ]
+
+
+def _fill_stages(
+    start: datetime,
+    end: datetime,
+    granularity: Granularity,
+    token_ids: list[ObjectId] | None = None,
+) -> list[dict[str, Any]]:
+    """Fill buckets without usage with zero.
+
+    $densify only fills series that already have a row, so a zero row is added
+    at the start for each token. Without token IDs a single unpartitioned
+    series is seeded for totals.
+    """
+    if token_ids is None:
+        seeds: list[dict[str, Any]] = [{"date": start, "count": 0}]
+    else:
+        seeds = [{"token_id": token_id, "date": start, "count": 0} for token_id in token_ids]
+    stages: list[dict[str, Any]] = []
+    if seeds:
+        stages.append({"$unionWith": {"pipeline": [{"$documents": seeds}]}})
+    return [
+        *stages,
+        # Merge the seed rows into any usage in the same bucket
+        {"$group": {"_id": {"token_id": "$token_id", "date": "$date"}, "count": {"$sum": "$count"}}},
+        {"$project": {"_id": 0, "token_id": "$_id.token_id", "date": "$_id.date", "count": 1}},
+        {
+            "$densify": {
+                "field": "date",
+                "partitionByFields": ["token_id"],
+                "range": {"step": 1, "unit": granularity, "bounds": [start, end]},
+            }
+        },
+        {"$set": {"count": {"$ifNull": ["$count", 0]}}},
+        {"$sort": {"token_id": 1, "date": 1}},
+    ]
+
+
+def _use_rollups(granularity: Granularity) -> bool:
+    """Monthly totals are read from rollups when they are being maintained.
+
+    The current month can lag behind daily usage by the rollup interval.
+    """
+    return granularity == "month" and CONFIG.usage_rollup_interval > 0
+
+
+async def _aggregate_usage(
+    match: dict[str, Any],
+    days: int,
+    granularity: Granularity,
+    token_ids: list[ObjectId] | None,
+    *stages: dict[str, Any],
+) -> list[dict[str, Any]]:
+    """Return filled usage buckets from daily usage or monthly rollups."""
+    start, end = usage_window(days, granularity)
+    match = {**match, "date": {"$gte": start}}
+    if _use_rollups(granularity):
+        collection = reader(TokenUsageMonth)
+        pipeline = [
+            {"$match": match},
+            {"$project": {"_id": 0, "token_id": 1, "date": 1, "count": 1}},
+        ]
+    else:
+        collection = reader(TokenUsage)
+        pipeline = [{"$match": match}, *_bucket_stages(granularity)]
+    pipeline += [*_fill_stages(start, end, granularity, token_ids), *stages]
+    data: list[dict[str, Any]] = await collection.aggregate(pipeline).to_list(None)
+    return data
+
+
+async def token_usage_for(
+    user: User | UserTokenView,
+    days: int,
+    granularity: Granularity = "day",
+) -> list[AllTokenUsageOut]:
+    """Get recent token history for a user. Tokens without usage return zeros."""
+    data = await _aggregate_usage(
+        {"user_id": ObjectId(user.id)},
+        days,
+        granularity,
+        [ObjectId(token.id) for token in user.tokens],
+        {
+            "$group": {
+                "_id": "$token_id",
+                "days": {"$push": {"date": "$date", "count": "$count"}},
+            }
+        },
+        {"$project": {"_id": 0, "token_id": "$_id", "days": 1}},
     )
-    for i, item in enumerate(data):
-        data[i]["token_id"] = item["_id"]
-        del data[i]["_id"]
     return [AllTokenUsageOut.model_validate(d) for d in data]
+
+
+async def token_history(token_id: str, days: int, granularity: Granularity = "day") -> list[TokenUsageOut]:
+    """Get recent usage history for a single token."""
+    data = await _aggregate_usage({"token_id": ObjectId(token_id)}, days, granularity, [ObjectId(token_id)])
+    return [TokenUsageOut.model_validate(d) for d in data]
+
+
+async def user_usage_totals(
+    user: User | UserView,
+    days: int,
+    granularity: Granularity = "month",
+) -> list[TokenUsageOut]:
+    """Get a user's total usage across all tokens."""
+    if _use_rollups(granularity):
+        start, end = usage_window(days, granularity)
+        pipeline: list[dict[str, Any]] = [
+            {"$match": {"user_id": ObjectId(user.id), "date": {"$gte": start}}},
+            {"$project": {"_id": 0, "date": 1, "count": 1}},
+            *_fill_stages(start, end, granularity),
+        ]
+        data = await reader(UserUsageMonth).aggregate(pipeline).to_list(None)
+    else:
+        data = await _aggregate_usage(
+            {"user_id": ObjectId(user.id)},
+            days,
+            granularity,
+            None,
+            {"$group": {"_id": "$date", "count": {"$sum": "$count"}}},
+            {"$project": {"_id": 0, "date": "$_id", "count": 1}},
+            {"$sort": {"date": 1}},
+        )
+    return [TokenUsageOut.model_validate(d) for d in data]
@@ -0,0 +1,218 @@
+"""Durable Stripe webhook processing."""
+
+import asyncio as aio
+import json
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from account.config import CONFIG
+from account.models.webhook import WebhookEvent
+from account.util.report import report_exc_info, report_message
+from account.util.stripe import (
+    event_customer_id,
+    invoice_failed,
+    invoice_paid,
+    new_subscription,
+    sync_subscription,
+)
+
+if TYPE_CHECKING:
+    from stripe import Event
+
+# Seconds an idle worker waits before checking for retries that are now due
+POLL_INTERVAL = 1.0
+_UNFINISHED = {"$in": ["pending", "processing"]}
+
+EventHandler = Callable[["Event"], Awaitable[bool]]
+
+
+def _on_object(handler: Callable[[Any], Awaitable[bool]]) -> EventHandler:
+    """Adapt a handler that only needs the event's data object."""
+
+    async def run(event: "Event") -> bool:
+        return await handler(event.data.object)
+
+    return run
+
+
+_EVENTS: dict[str, EventHandler] = {
+    # Payment is successful and the subscription is created.
+    # You should provision the subscription and save the customer ID to your database.
+    "checkout.session.completed": _on_object(new_subscription),
+    # Continue to provision the subscription as payments continue to be made.
+    # Store the status in your database and check when a user accesses your service.
+    # This approach helps you avoid hitting rate limits.
+    "invoice.paid": _on_object(invoice_paid),
+    # The payment failed or the customer does not have a valid payment method.
+    # The subscription becomes past_due. Notify your customer and send them to the
+    # customer portal to update their payment information.
+    "invoice.payment_failed": _on_object(invoice_failed),
+    # Keep the local subscription mirror current with changes made anywhere
+    "customer.subscription.created": sync_subscription,
+    "customer.subscription.updated": sync_subscription,
+    "customer.subscription.deleted": sync_subscription,
+}
+
+_wake = aio.Event()
+_counters = {"processed": 0, "retried": 0, "failed": 0}
+_latency = {"total": 0.0, "max": 0.0}
+
+
+def _now() -> datetime:
+    return datetime.now(tz=UTC)
+
+
+def _age(since: datetime) -> float:
+    """Return seconds since a stored timestamp. Mongo returns naive UTC datetimes."""
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    return (_now() - since).total_seconds()
+
+
+def is_handled(event_type: str) -> bool:
+    """Return True if the event type has a handler."""
+    return event_type in _EVENTS
+
+
+async def enqueue(event: "Event", payload: str | bytes) -> bool:
+    """Store a verified event in the inbox. Returns False if it was already received."""
+    try:
+        await WebhookEvent(
+            id=event.id,
+            type=event.type,
+            customer_id=event_customer_id(event),
+            created=event.created,
+            payload=json.loads(payload),
+        ).insert()
+    except DuplicateKeyError:
+        return False
+    _wake.set()
+    return True
+
+
+def _next_events(now: datetime) -> list[dict[str, Any]]:
+    """Pipeline returning the oldest event that is due and first in line for its customer.
+
+    Stripe's created time only has second resolution, so events created in
+    the same second are ordered by when they were received.
+    """
+    order = {"created": ASCENDING, "received": ASCENDING, "_id": ASCENDING}
+    return [
+        {"$match": {"status": _UNFINISHED}},
+        {"$project": {"customer_id": 1, "created": 1, "received": 1, "status": 1, "available": 1}},
+        {"$sort": order},
+        # Events without a customer don't wait on any other event
+        {"$group": {"_id": {"$ifNull": ["$customer_id", "$_id"]}, "head": {"$first": "$$ROOT"}}},
+        {"$replaceWith": "$head"},
+        {"$match": {"available": {"$lte": now}}},
+        {"$sort": order},
+        {"$limit": 1},
+    ]
+
+
+async def claim() -> WebhookEvent | None:
+    """Lease the next available event to this worker.
+
+    Only the earliest unfinished event of each customer can be taken, so each
+    customer's events are applied in order while different customers are
+    processed in parallel. Events left processing by a worker that died
+    become available again once their lease runs out.
+    """
+    collection = WebhookEvent.get_motor_collection()
+    while True:
+        now = _now()
+        candidates = await collection.aggregate(_next_events(now)).to_list(1)
+        if not candidates:
+            return None
+        candidate = candidates[0]
+        # Only succeeds if no other worker claimed the event since it was read
+        doc = await collection.find_one_and_update(
+            {"_id": candidate["_id"], "status": candidate["status"], "available": candidate["available"]},
+            {
+                "$set": {"status": "processing", "available": now + timedelta(seconds=CONFIG.webhook_lease)},
+                "$inc": {"attempts": 1},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is not None:
+            event: WebhookEvent = WebhookEvent.model_validate(doc)
+            return event
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=CONFIG.webhook_retry_delay * 2 ** max(attempts - 1, 0))
+
+
+async def process(event: WebhookEvent) -> bool:
+    """Run an event's handler and record the result. Failures are retried with backoff."""
+    from stripe import Event
+
+    error = None
+    try:
+        handler = _EVENTS[event.type]
+        if not await handler(Event.construct_from(event.payload, CONFIG.stripe_secret_key)):
+            error = "Handler was unable to apply the event"
+    except Exception as exc:  # noqa: BLE001
+        report_exc_info()
+        error = repr(exc)
+    now = _now()
+    query = WebhookEvent.find_one({"_id": event.id})
+    if error is None:
+        await query.update({"$set": {"status": "done", "processed": now, "error": None}})
+        _counters["processed"] += 1
+        lag = _age(event.received)
+        _latency["total"] += lag
+        _latency["max"] = max(_latency["max"], lag)
+        return True
+    if event.attempts >= CONFIG.webhook_max_attempts:
+        # Failed events are kept until they are replayed or removed by hand
+        await query.update({"$set": {"status": "failed", "error": error}})
+        _counters["failed"] += 1
+        report_message(f"Webhook {event.id} ({event.type}) failed: {error}")
+        return False
+    fields = {"status": "pending", "available": now + _backoff(event.attempts), "error": error}
+    await query.update({"$set": fields})
+    _counters["retried"] += 1
+    return False
+
+
+async def webhook_worker() -> None:
+    """Process inbox events forever."""
+    while True:
+        try:
+            event = await claim()
+        except Exception:  # noqa: BLE001
+            report_exc_info()
+            event = None
+        if event is None:
+            _wake.clear()
+            with suppress(TimeoutError):
+                await aio.wait_for(_wake.wait(), POLL_INTERVAL)
+            continue
+        await process(event)
+
+
+async def inbox_stats() -> dict[str, Any]:
+    """Return inbox depth, processing lag and outcome counts."""
+    depth = {
+        status: await WebhookEvent.find(WebhookEvent.status == status).count()
+        for status in ("pending", "processing", "failed")
+    }
+    oldest = (
+        await WebhookEvent.find({"status": {"$in": ["pending", "processing"]}})
+        .sort(+WebhookEvent.received)  # type: ignore[operator]
+        .first_or_none()
+    )
+    processed = _counters["processed"]
+    return {
+        **depth,
+        "lag": _age(oldest.received) if oldest else 0.0,
+        **_counters,
+        "avg_latency": _latency["total"] / processed if processed else 0.0,
+        "max_latency": _latency["max"],
+    }
@@ -1,7 +1,8 @@
 """Pytest fixtures."""
 
-from collections.abc import AsyncIterator
+from collections.abc import AsyncIterator, Iterator
 
+import pytest
 import pytest_asyncio
 from asgi_lifespan import LifespanManager
 from decouple import config
@@ -14,8 +15,17 @@ from account.config import CONFIG
 CONFIG.testing = True
 CONFIG.mongo_uri = config("TEST_MONGO_URI", default="mongodb://localhost:27017")
 CONFIG.database = "account-tests"
+# Read monthly history from daily usage since the rollup worker doesn't run in tests
+CONFIG.usage_rollup_interval = 0
+CONFIG.stripe_sign_secret = "whsec_test"
+CONFIG.mc_list_id = "list_test"
+CONFIG.mc_batch_poll = 0
 
-from account.main import app  # noqa: E402
+from account.main import app
+from account.util.billing import billing
+from account.util.mailing import mailchimp
+from tests.fake_mailchimp import FakeMailChimp, FakeMailchimp
+from tests.fake_stripe import FakeHTTPClient, FakeStripe
 
 
 async def clear_database(server: FastAPI) -> None:
@@ -33,3 +43,21 @@ async def client() -> AsyncIterator[AsyncClient]:
                 yield _client
             finally:
                 await clear_database(app)
+
+
+@pytest.fixture()
+def fake_stripe() -> Iterator[FakeStripe]:
+    """Route billing calls to an in-memory Stripe."""
+    fake = FakeStripe()
+    billing.use_http_client(FakeHTTPClient(fake))
+    yield fake
+    billing._client = None
+
+
+@pytest.fixture()
+def fake_mailchimp() -> Iterator[FakeMailchimp]:
+    """Route mailing list syncs to an in-memory Mailchimp."""
+    fake = FakeMailchimp()
+    mailchimp.use_client(FakeMailChimp(fake))
+    yield fake
+    mailchimp.use_client(None)
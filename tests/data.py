@@ -6,9 +6,10 @@ import random
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 
+from account.models.notification import Notification
 from account.models.plan import Plan
 from account.models.token import TokenUsage
-from account.models.user import Notification, User, UserToken
+from account.models.user import User, UserToken
 from account.util.password import hash_password
 
 DATA = Path(__file__).parent / "data"
@@ -58,7 +59,7 @@ async def add_empty_user() -> str:
 async def add_token_user(*, history: bool = False) -> str:
     """Add user with an app token to user collection."""
     user = make_user("token@test.io", offset=7)
-    token = await UserToken.new()
+    token = UserToken.new()
     user.tokens = [token]
     await user.create()
     if history:
@@ -77,8 +78,10 @@ async def add_plan_user(plan: str = "free") -> str:
 async def add_notification_user(*text: str) -> str:
     """Add user with notifications to user collection."""
     user = make_user("notification@test.io")
-    user.notifications = [Notification(type="app", text=t) for t in text]
     await user.create()
+    assert user.id is not None
+    for value in text:
+        await Notification(user_id=user.id, type="app", text=value).insert()
     return user.email
 
 
@@ -0,0 +1,173 @@
+"""Local stand-in for the Mailchimp list member and batch operation APIs.
+
+Use it in-process by passing a FakeMailChimp client to the mailing adapter,
+or serve it with `uvicorn tests.fake_mailchimp:app --port 12112` and point
+MC_API_BASE at http://localhost:12112/3.0/. Batches finish as soon as they
+are submitted.
+"""
+
+import io
+import json
+import re
+import tarfile
+import threading
+from collections.abc import Callable
+from itertools import count
+from typing import Any
+from urllib.parse import urlsplit
+
+import requests
+from fastapi import FastAPI, Request, Response
+from mailchimp3 import MailChimp
+
+Result = tuple[int, Any]
+
+# Mailchimp API keys end with the data center
+FAKE_KEY = "0" * 32 + "-fake"
+
+
+def _error(status: int, title: str, detail: str) -> Result:
+    return status, {"status": status, "title": title, "detail": detail}
+
+
+class FakeMailchimp:
+    """In-memory Mailchimp account.
+
+    Addresses containing "invalid" are rejected like ones Mailchimp considers
+    fake, and paths in fail_paths return a 503 to exercise retries.
+    """
+
+    def __init__(self, base_url: str = "http://mailchimp.fake/3.0/") -> None:
+        self.base_url = base_url
+        self.members: dict[str, dict[str, Any]] = {}
+        self.batches: dict[str, dict[str, Any]] = {}
+        self.archives: dict[str, bytes] = {}
+        self.fail_paths: set[str] = set()
+        self.requests = 0
+        self._ids = count(1)
+        self._lock = threading.RLock()
+        self._routes: list[tuple[str, re.Pattern[str], Callable[..., Result]]] = [
+            ("PUT", re.compile(r"lists/(?P<list_id>[^/]+)/members/(?P<target>[^/]+)"), self._put_member),
+            ("PATCH", re.compile(r"lists/(?P<list_id>[^/]+)/members/(?P<target>[^/]+)"), self._patch_member),
+            ("DELETE", re.compile(r"lists/(?P<list_id>[^/]+)/members/(?P<target>[^/]+)"), self._delete_member),
+            ("POST", re.compile(r"batches"), self._create_batch),
+            ("GET", re.compile(r"batches/(?P<batch_id>[^/]+)"), self._get_batch),
+            ("GET", re.compile(r"results/(?P<batch_id>[^/]+)\.tar\.gz"), self._get_results),
+        ]
+
+    def emails(self) -> set[str]:
+        """Return every subscribed address."""
+        return {member["email_address"] for member in self.members.values()}
+
+    def handle(self, method: str, path: str, body: Any = None) -> Result:
+        """Dispatch an API request. The path is relative to the API root."""
+        with self._lock:
+            self.requests += 1
+            path = path.strip("/").removeprefix("3.0/")
+            if path in self.fail_paths:
+                return _error(503, "Service Unavailable", "Try again later")
+            for route_method, pattern, handler in self._routes:
+                if route_method == method and (match := pattern.fullmatch(path)):
+                    return handler(body, **match.groupdict())
+        return _error(404, "Resource Not Found", f"Unrecognized request ({method}: {path})")
+
+    def _put_member(self, body: dict[str, Any], list_id: str, target: str) -> Result:
+        email = body["email_address"]
+        if "invalid" in email:
+            return _error(400, "Invalid Resource", f"{email} looks fake or invalid, please enter a real email address.")
+        member = self.members.setdefault(target, {"id": target, "list_id": list_id})
+        member.update(email_address=email, status=body.get("status", "subscribed"))
+        return 200, member
+
+    def _patch_member(self, body: dict[str, Any], list_id: str, target: str) -> Result:
+        if not (member := self.members.pop(target, None)):
+            return _error(404, "Resource Not Found", "The requested resource could not be found.")
+        member["email_address"] = body["email_address"]
+        self.members[target] = member
+        return 200, member
+
+    def _delete_member(self, _: Any, list_id: str, target: str) -> Result:
+        if self.members.pop(target, None) is None:
+            return _error(404, "Resource Not Found", "The requested resource could not be found.")
+        return 204, None
+
+    def _create_batch(self, body: dict[str, Any]) -> Result:
+        batch_id = f"batch{next(self._ids):06d}"
+        results = []
+        for operation in body["operations"]:
+            data = json.loads(operation["body"]) if operation.get("body") else None
+            status, response = self.handle(operation["method"], operation["path"], data)
+            results.append(
+                {"status_code": status, "operation_id": operation.get("operation_id"), "response": json.dumps(response)}
+            )
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+            content = json.dumps(results).encode()
+            info = tarfile.TarInfo(f"{batch_id}/0.json")
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+        self.archives[batch_id] = archive.getvalue()
+        errored = sum(result["status_code"] >= 400 for result in results)
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "status": "finished",
+            "total_operations": len(results),
+            "finished_operations": len(results),
+            "errored_operations": errored,
+            "response_body_url": f"{self.base_url}results/{batch_id}.tar.gz",
+        }
+        # Submitted batches report pending like the real API
+        return 200, {**self.batches[batch_id], "status": "pending", "response_body_url": ""}
+
+    def _get_batch(self, _: Any, batch_id: str) -> Result:
+        if batch := self.batches.get(batch_id):
+            return 200, batch
+        return _error(404, "Resource Not Found", "The requested resource could not be found.")
+
+    def _get_results(self, _: Any, batch_id: str) -> Result:
+        if (archive := self.archives.get(batch_id)) is None:
+            return _error(404, "Resource Not Found", "The requested resource could not be found.")
+        return 200, archive
+
+
+def _response(status: int, body: Any, url: str) -> requests.Response:
+    """Build a requests response for a fake result."""
+    resp = requests.Response()
+    resp.status_code = status
+    resp.url = url
+    if isinstance(body, bytes):
+        resp._content = body
+        resp.headers["Content-Type"] = "application/gzip"
+    else:
+        resp._content = b"" if body is None else json.dumps(body).encode()
+        resp.headers["Content-Type"] = "application/json"
+    return resp
+
+
+class FakeMailChimp(MailChimp):
+    """mailchimp3 client that calls a FakeMailchimp without a network hop."""
+
+    def __init__(self, fake: FakeMailchimp) -> None:
+        super().__init__(mc_api=FAKE_KEY, mc_user="fake")
+        self.base_url = fake.base_url
+        self.fake = fake
+
+    def _make_request(self, **kwargs: Any) -> requests.Response:
+        url = kwargs["url"]
+        path = urlsplit(url).path.removeprefix(urlsplit(self.base_url).path)
+        status, body = self.fake.handle(kwargs["method"], path, kwargs.get("json"))
+        return _response(status, body, url)
+
+
+fake = FakeMailchimp("http://localhost:12112/3.0/")
+app = FastAPI(title="Fake Mailchimp")
+
+
+@app.api_route("/3.0/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def mailchimp_api(request: Request, path: str) -> Response:
+    """Serve the fake over HTTP."""
+    raw = await request.body()
+    status, body = fake.handle(request.method, path, json.loads(raw) if raw else None)
+    if isinstance(body, bytes):
+        return Response(body, status_code=status, media_type="application/gzip")
+    return Response(None if body is None else json.dumps(body), status_code=status, media_type="application/json")
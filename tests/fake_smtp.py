@@ -0,0 +1,68 @@
+"""Local stand-in for an SMTP relay.
+
+It speaks just enough plain SMTP for aiosmtplib to send messages without
+STARTTLS or login. Tests can refuse recipients and drop connections
+mid-session to exercise the SMTP pool's error handling.
+"""
+
+import asyncio as aio
+
+
+class FakeSMTP:
+    """In-memory SMTP server on a random local port."""
+
+    def __init__(self) -> None:
+        self.port = 0
+        self.connections = 0
+        self.messages: list[bytes] = []
+        self.refused: set[str] = set()
+        # Number of upcoming MAIL commands answered by closing the connection
+        self.disconnects = 0
+        self._server: aio.Server | None = None
+
+    async def start(self) -> int:
+        """Start listening and return the port."""
+        self._server = await aio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self) -> None:
+        """Stop listening."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _data(self, reader: aio.StreamReader) -> bytes:
+        lines = []
+        while (line := await reader.readline()) not in (b".\r\n", b""):
+            lines.append(line)
+        return b"".join(lines)
+
+    async def _handle(self, reader: aio.StreamReader, writer: aio.StreamWriter) -> None:
+        self.connections += 1
+        writer.write(b"220 fake.local ESMTP\r\n")
+        try:
+            while line := await reader.readline():
+                command = line.decode().strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb == "MAIL" and self.disconnects:
+                    self.disconnects -= 1
+                    break
+                if verb == "RCPT" and any(email in command for email in self.refused):
+                    reply = "550 No such user"
+                elif verb == "DATA":
+                    writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                    await writer.drain()
+                    self.messages.append(await self._data(reader))
+                    reply = "250 Queued"
+                elif verb == "QUIT":
+                    writer.write(b"221 Bye\r\n")
+                    break
+                elif verb in ("EHLO", "HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                    reply = "250 OK"
+                else:
+                    reply = "502 Not implemented"
+                writer.write(f"{reply}\r\n".encode())
+                await writer.drain()
+        finally:
+            writer.close()
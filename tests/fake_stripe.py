@@ -0,0 +1,304 @@
+"""Local stand-in for the subset of the Stripe API used by the billing code.
+
+Use it in-process by passing a FakeHTTPClient to the billing adapter, or
+serve it with `uvicorn tests.fake_stripe:app --port 12111` and point
+STRIPE_API_BASE at it. EventGenerator builds signed webhook payloads for the
+objects it creates.
+"""
+
+import hmac
+import json
+import re
+import threading
+import time
+from collections.abc import Callable, Iterable
+from hashlib import sha256
+from itertools import count
+from typing import Any
+from urllib.parse import parse_qsl, urlsplit
+
+from fastapi import FastAPI, Request, Response
+from stripe import HTTPClient
+
+Result = tuple[int, dict[str, Any]]
+
+
+def decode_params(pairs: Iterable[tuple[str, str]]) -> dict[str, Any]:
+    """Turn Stripe's bracketed form keys into nested dicts. List indexes become string keys."""
+    data: dict[str, Any] = {}
+    for key, value in pairs:
+        parts = key.replace("]", "").split("[")
+        node = data
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return data
+
+
+def as_list(value: dict[str, Any] | None) -> list[Any]:
+    """Return the values of a decoded form list in index order."""
+    if not value:
+        return []
+    return [value[key] for key in sorted(value, key=int)]
+
+
+def _error(status: int, message: str) -> Result:
+    return status, {"error": {"type": "invalid_request_error", "message": message}}
+
+
+def _flag(value: str | None) -> bool:
+    return str(value).lower() == "true"
+
+
+def sign_event(event: dict[str, Any], secret: str) -> tuple[bytes, dict[str, str]]:
+    """Return a webhook payload and the Stripe-Signature header for it."""
+    payload = json.dumps(event).encode()
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, sha256).hexdigest()
+    return payload, {"Stripe-Signature": f"t={timestamp},v1={signature}"}
+
+
+class FakeStripe:
+    """In-memory Stripe account."""
+
+    def __init__(self) -> None:
+        self.customers: dict[str, dict[str, Any]] = {}
+        self.prices: dict[str, dict[str, Any]] = {}
+        self.subscriptions: dict[str, dict[str, Any]] = {}
+        self.requests = 0
+        self._ids = count(1)
+        self._lock = threading.Lock()
+        self._routes: list[tuple[str, re.Pattern[str], Callable[..., Result]]] = [
+            ("GET", re.compile(r"/v1/subscriptions"), self._list_subscriptions),
+            ("GET", re.compile(r"/v1/subscriptions/(?P<sub_id>[^/]+)"), self._get_subscription),
+            ("POST", re.compile(r"/v1/subscriptions/(?P<sub_id>[^/]+)"), self._update_subscription),
+            ("DELETE", re.compile(r"/v1/subscriptions/(?P<sub_id>[^/]+)"), self._cancel_subscription),
+            ("POST", re.compile(r"/v1/subscription_items"), self._add_item),
+            ("DELETE", re.compile(r"/v1/subscription_items/(?P<item_id>[^/]+)"), self._delete_item),
+            ("POST", re.compile(r"/v1/customers/(?P<customer_id>[^/]+)"), self._update_customer),
+            ("POST", re.compile(r"/v1/checkout/sessions"), self._create_checkout),
+            ("POST", re.compile(r"/v1/billing_portal/sessions"), self._create_portal),
+        ]
+
+    def new_id(self, prefix: str) -> str:
+        """Return a unique object ID."""
+        return f"{prefix}_fake{next(self._ids):08d}"
+
+    def add_price(self, price_id: str, product_id: str, usage_type: str = "licensed") -> dict[str, Any]:
+        """Register a price for a product."""
+        price = {"id": price_id, "object": "price", "product": product_id, "usage_type": usage_type}
+        self.prices[price_id] = price
+        return price
+
+    def add_customer(self, email: str, customer_id: str | None = None) -> str:
+        """Create a customer and return its ID."""
+        customer_id = customer_id or self.new_id("cus")
+        self.customers[customer_id] = {"id": customer_id, "object": "customer", "email": email}
+        return customer_id
+
+    def _item(self, sub_id: str, price_id: str) -> dict[str, Any]:
+        price = self.prices.get(price_id) or self.add_price(price_id, f"prod_{price_id}")
+        return {
+            "id": self.new_id("si"),
+            "object": "subscription_item",
+            "subscription": sub_id,
+            "price": {"id": price_id, "object": "price", "product": price["product"]},
+            "plan": {"id": price_id, "object": "plan", "usage_type": price["usage_type"]},
+        }
+
+    def add_subscription(self, customer_id: str, *price_ids: str, status: str = "active") -> dict[str, Any]:
+        """Create a subscription for a customer with one item per price."""
+        sub_id = self.new_id("sub")
+        now = int(time.time())
+        sub = {
+            "id": sub_id,
+            "object": "subscription",
+            "customer": customer_id,
+            "status": status,
+            "cancel_at_period_end": False,
+            "created": now,
+            "ended_at": now if status == "canceled" else None,
+            "items": {"object": "list", "data": [self._item(sub_id, price) for price in price_ids]},
+        }
+        self.subscriptions[sub_id] = sub
+        return sub
+
+    def handle(self, method: str, path: str, params: dict[str, Any]) -> Result:
+        """Dispatch an API request."""
+        with self._lock:
+            self.requests += 1
+            for route_method, pattern, handler in self._routes:
+                if route_method == method and (match := pattern.fullmatch(path)):
+                    return handler(params, **match.groupdict())
+        return _error(404, f"Unrecognized request URL ({method}: {path})")
+
+    def _get_subscription(self, _: dict[str, Any], sub_id: str) -> Result:
+        if sub := self.subscriptions.get(sub_id):
+            return 200, sub
+        return _error(404, f"No such subscription: '{sub_id}'")
+
+    def _update_subscription(self, params: dict[str, Any], sub_id: str) -> Result:
+        if not (sub := self.subscriptions.get(sub_id)):
+            return _error(404, f"No such subscription: '{sub_id}'")
+        if "cancel_at_period_end" in params:
+            sub["cancel_at_period_end"] = _flag(params["cancel_at_period_end"])
+        items = {item["id"]: item for item in sub["items"]["data"]}
+        for change in as_list(params.get("items")):
+            if not (item := items.get(change.get("id"))):
+                return _error(400, f"No such subscription item: '{change.get('id')}'")
+            updated = self._item(sub_id, change.get("price") or change["plan"])
+            item["price"], item["plan"] = updated["price"], updated["plan"]
+        return 200, sub
+
+    def _cancel_subscription(self, _: dict[str, Any], sub_id: str) -> Result:
+        if not (sub := self.subscriptions.get(sub_id)):
+            return _error(404, f"No such subscription: '{sub_id}'")
+        sub["status"] = "canceled"
+        sub["ended_at"] = int(time.time())
+        return 200, sub
+
+    def _add_item(self, params: dict[str, Any]) -> Result:
+        if not (sub := self.subscriptions.get(params.get("subscription", ""))):
+            return _error(404, f"No such subscription: '{params.get('subscription')}'")
+        item = self._item(sub["id"], params["price"])
+        sub["items"]["data"].append(item)
+        return 200, item
+
+    def _delete_item(self, _: dict[str, Any], item_id: str) -> Result:
+        for sub in self.subscriptions.values():
+            items = sub["items"]["data"]
+            if any(item["id"] == item_id for item in items):
+                sub["items"]["data"] = [item for item in items if item["id"] != item_id]
+                return 200, {"id": item_id, "object": "subscription_item", "deleted": True}
+        return _error(404, f"No such subscription item: '{item_id}'")
+
+    def _update_customer(self, params: dict[str, Any], customer_id: str) -> Result:
+        if not (customer := self.customers.get(customer_id)):
+            return _error(404, f"No such customer: '{customer_id}'")
+        customer.update({key: params[key] for key in ("email",) if key in params})
+        return 200, customer
+
+    def _create_checkout(self, params: dict[str, Any]) -> Result:
+        session_id = self.new_id("cs")
+        return 200, {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.fake/{session_id}",
+            "mode": params.get("mode"),
+            "customer": params.get("customer"),
+            "customer_email": params.get("customer_email"),
+            "client_reference_id": params.get("client_reference_id"),
+            "subscription": None,
+        }
+
+    def _create_portal(self, params: dict[str, Any]) -> Result:
+        if params.get("customer") not in self.customers:
+            return _error(404, f"No such customer: '{params.get('customer')}'")
+        session_id = self.new_id("bps")
+        return 200, {
+            "id": session_id,
+            "object": "billing_portal.session",
+            "url": f"https://billing.fake/{session_id}",
+            "customer": params["customer"],
+            "return_url": params.get("return_url"),
+        }
+
+    def _list_subscriptions(self, params: dict[str, Any]) -> Result:
+        subs = [
+            sub
+            for sub in self.subscriptions.values()
+            if sub["customer"] == params.get("customer", sub["customer"])
+            and params.get("status", "active") in ("all", sub["status"])
+        ]
+        if after := params.get("starting_after"):
+            ids = [sub["id"] for sub in subs]
+            subs = subs[ids.index(after) + 1 :] if after in ids else []
+        limit = int(params.get("limit", 10))
+        return 200, {"object": "list", "url": "/v1/subscriptions", "has_more": len(subs) > limit, "data": subs[:limit]}
+
+
+class EventGenerator:
+    """Builds signed webhook events backed by objects in a FakeStripe."""
+
+    def __init__(self, fake: FakeStripe, secret: str) -> None:
+        self.fake = fake
+        self.secret = secret
+
+    def event(self, type: str, obj: dict[str, Any]) -> tuple[bytes, dict[str, str]]:
+        """Return a signed event payload and headers."""
+        event = {
+            "id": self.fake.new_id("evt"),
+            "object": "event",
+            "type": type,
+            "created": int(time.time()),
+            "data": {"object": obj},
+        }
+        return sign_event(event, self.secret)
+
+    def checkout_completed(self, user_id: str, email: str, price_id: str) -> tuple[str, tuple[bytes, dict[str, str]]]:
+        """Create a customer with a subscription. Returns the customer ID and the checkout event."""
+        customer_id = self.fake.add_customer(email)
+        sub = self.fake.add_subscription(customer_id, price_id)
+        session = {
+            "id": self.fake.new_id("cs"),
+            "object": "checkout.session",
+            "mode": "subscription",
+            "customer": customer_id,
+            "customer_email": email,
+            "client_reference_id": user_id,
+            "subscription": sub["id"],
+        }
+        return customer_id, self.event("checkout.session.completed", session)
+
+    def invoice(self, customer_id: str, *, paid: bool, attempt: int = 1) -> tuple[bytes, dict[str, str]]:
+        """Return an invoice.paid or invoice.payment_failed event."""
+        invoice = {
+            "id": self.fake.new_id("in"),
+            "object": "invoice",
+            "customer": customer_id,
+            "paid": paid,
+            "attempt_count": attempt,
+        }
+        return self.event("invoice.paid" if paid else "invoice.payment_failed", invoice)
+
+
+class FakeHTTPClient(HTTPClient):
+    """Stripe SDK transport that calls a FakeStripe without a network hop."""
+
+    name = "fake"
+
+    def __init__(self, fake: FakeStripe) -> None:
+        super().__init__()
+        self.fake = fake
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Any,
+        post_data: Any = None,
+        *,
+        _usage: Any = None,
+    ) -> tuple[str, int, dict[str, str]]:
+        """Send a request to the fake."""
+        parts = urlsplit(url)
+        if isinstance(post_data, bytes):
+            post_data = post_data.decode()
+        params = decode_params([*parse_qsl(parts.query), *parse_qsl(post_data or "")])
+        status, body = self.fake.handle(method.upper(), parts.path, params)
+        return json.dumps(body), status, {"Request-Id": self.fake.new_id("req")}
+
+    def close(self) -> None:
+        """Nothing to release."""
+
+
+fake = FakeStripe()
+app = FastAPI(title="Fake Stripe")
+
+
+@app.api_route("/v1/{path:path}", methods=["GET", "POST", "DELETE"])
+async def stripe_api(request: Request) -> Response:
+    """Serve the fake over HTTP."""
+    pairs = [*request.query_params.multi_items(), *parse_qsl((await request.body()).decode())]
+    status, body = fake.handle(request.method, request.url.path, decode_params(pairs))
+    return Response(json.dumps(body), status_code=status, media_type="application/json")
@@ -0,0 +1,82 @@
+"""In-process cache tests."""
+
+import pytest
+from httpx import AsyncClient
+
+from account.models import cache
+from account.models.cache import TTLCache, user_cache
+from account.models.util import JustUrl
+from tests.data import add_token_user
+from tests.util import auth_headers
+
+
+def test_cache_hit_and_miss() -> None:
+    """Test cached values are returned as copies and missing keys are counted."""
+    urls: TTLCache[JustUrl] = TTLCache(maxsize=2, ttl=60)
+    assert urls.get("a") is None
+    urls.set("a", JustUrl(url="https://a.test"))
+    value = urls.get("a")
+    assert value is not None
+    assert value.url == "https://a.test"
+    # Changing a returned value doesn't change the cached copy
+    value.url = "https://changed.test"
+    cached = urls.get("a")
+    assert cached is not None
+    assert cached.url == "https://a.test"
+    assert urls.stats() == {"size": 1, "hits": 2, "misses": 1}
+
+
+def test_cache_expiry(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test values expire after the time to live."""
+    now = 100.0
+    monkeypatch.setattr(cache, "monotonic", lambda: now)
+    urls: TTLCache[JustUrl] = TTLCache(maxsize=2, ttl=5)
+    urls.set("a", JustUrl(url="https://a.test"))
+    now = 104.0
+    assert urls.get("a") is not None
+    now = 106.0
+    assert urls.get("a") is None
+    assert len(urls) == 0
+
+
+def test_cache_eviction() -> None:
+    """Test the least recently used value is dropped at capacity."""
+    urls: TTLCache[JustUrl] = TTLCache(maxsize=2, ttl=60)
+    urls.set("a", JustUrl(url="https://a.test"))
+    urls.set("b", JustUrl(url="https://b.test"))
+    assert urls.get("a") is not None
+    urls.set("c", JustUrl(url="https://c.test"))
+    assert len(urls) == 2
+    assert urls.get("b") is None
+    assert urls.get("a") is not None
+    assert urls.get("c") is not None
+
+
+def test_cache_invalidation() -> None:
+    """Test invalidated keys are removed and loads started before are not cached."""
+    urls: TTLCache[JustUrl] = TTLCache(maxsize=2, ttl=60)
+    urls.set("a", JustUrl(url="https://a.test"))
+    epoch = urls.epoch
+    urls.invalidate("a")
+    assert urls.get("a") is None
+    urls.set("a", JustUrl(url="https://stale.test"), epoch)
+    assert urls.get("a") is None
+    urls.set("a", JustUrl(url="https://a.test"), urls.epoch)
+    assert urls.get("a") is not None
+
+
+@pytest.mark.asyncio
+async def test_user_cache_write_invalidation(client: AsyncClient) -> None:
+    """Test writing a user drops the cached copy used by authenticated requests."""
+    email = await add_token_user()
+    auth = await auth_headers(client, email)
+    resp = await client.get("/user", headers=auth)
+    assert resp.status_code == 200
+    assert user_cache.get(email) is not None
+    resp = await client.post("/token", headers=auth)
+    assert resp.status_code == 200
+    assert user_cache.get(email) is None
+    # The next request reads the new token instead of a stale copy
+    resp = await client.get("/token", headers=auth)
+    assert resp.status_code == 200
+    assert len(resp.json()) == 2
@@ -0,0 +1,59 @@
+"""Lookup coalescing tests."""
+
+import asyncio as aio
+
+import pytest
+
+from account.models.coalesce import SingleFlight
+from account.models.util import JustUrl
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_call() -> None:
+    """Test concurrent callers with the same key share one call and get their own copies."""
+    flights = SingleFlight()
+    calls = 0
+    release = aio.Event()
+
+    async def load() -> JustUrl:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return JustUrl(url="https://a.test")
+
+    tasks = [aio.create_task(flights.do("a", load)) for _ in range(3)]
+    other = aio.create_task(flights.do("b", load))
+    await aio.sleep(0)
+    assert len(flights) == 2
+    release.set()
+    results = await aio.gather(*tasks)
+    await other
+    assert calls == 2
+    assert all(result.url == "https://a.test" for result in results)
+    assert len({id(result) for result in results}) == 3
+    assert flights.stats() == {"in_flight": 0, "calls": 2, "shared": 2}
+
+
+@pytest.mark.asyncio
+async def test_single_flight_error() -> None:
+    """Test an error reaches every waiter and the key is released for the next call."""
+    flights = SingleFlight()
+    release = aio.Event()
+
+    async def fail() -> str:
+        await release.wait()
+        msg = "lookup failed"
+        raise ValueError(msg)
+
+    tasks = [aio.create_task(flights.do("a", fail)) for _ in range(3)]
+    await aio.sleep(0)
+    release.set()
+    results = await aio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(flights) == 0
+
+    async def load() -> str:
+        return "ok"
+
+    assert await flights.do("a", load) == "ok"
+    assert flights.calls == 2
@@ -0,0 +1,78 @@
+"""Mongo client and read routing tests."""
+
+import asyncio as aio
+
+import pytest
+from httpx import AsyncClient
+from pymongo.read_preferences import Nearest, Primary, _ServerMode
+
+from account.app import DOCUMENTS, app
+from account.config import CONFIG
+from account.models.database import (
+    init_models,
+    mongo_client,
+    primary,
+    read_preference,
+    reader,
+    secondary_reads,
+)
+from account.models.plan import Plan
+from account.models.token import TokenUsage
+
+
+def test_read_preference() -> None:
+    """Test read preferences are built from connection string names."""
+    assert read_preference("primary") == Primary()
+    assert read_preference("nearest") == Nearest(max_staleness=CONFIG.mongo_max_staleness)
+    with pytest.raises(ValueError, match="Unknown read preference"):
+        read_preference("fastest")
+
+
+@pytest.mark.asyncio
+async def test_mongo_client_options() -> None:
+    """Test the client uses the configured pool and read settings."""
+    settings = (CONFIG.mongo_max_pool_size, CONFIG.mongo_max_idle_time, CONFIG.mongo_read_preference)
+    try:
+        CONFIG.mongo_max_pool_size, CONFIG.mongo_max_idle_time, CONFIG.mongo_read_preference = 7, 30, "nearest"
+        client = mongo_client()
+        # Motor's stub types the options property as a method
+        pool = client.options.pool_options  # type: ignore[attr-defined]
+        assert pool.max_pool_size == 7
+        assert pool.max_idle_time_seconds == 30
+        assert client.read_preference == Nearest(max_staleness=CONFIG.mongo_max_staleness)
+        client.close()
+    finally:
+        CONFIG.mongo_max_pool_size, CONFIG.mongo_max_idle_time, CONFIG.mongo_read_preference = settings
+
+
+@pytest.mark.asyncio
+async def test_reader_follows_request(client: AsyncClient) -> None:
+    """Test only requests with secondary reads route reader() queries to secondaries."""
+
+    async def request() -> tuple[_ServerMode, _ServerMode]:
+        await secondary_reads()
+        return reader(Plan).read_preference, primary(Plan).read_preference
+
+    secondary, catalog = await aio.create_task(request())
+    assert secondary == read_preference(CONFIG.mongo_secondary_reads)
+    # Catalogs are shared across requests, so they ignore the request preference
+    assert catalog == Primary()
+    # The preference stays with the request's context
+    assert reader(Plan).read_preference == Plan.get_motor_collection().read_preference
+
+
+@pytest.mark.asyncio
+async def test_skip_indexes(client: AsyncClient) -> None:
+    """Test models can be initialized without creating their indexes."""
+    db = mongo_client()[f"{CONFIG.database}-indexes"]
+    name = TokenUsage.get_collection_name()
+    try:
+        await init_models(db, [TokenUsage], skip_indexes=True)
+        await db[name].insert_one({})
+        assert list(await db[name].index_information()) == ["_id_"]
+        await init_models(db, [TokenUsage])
+        assert set(await db[name].index_information()) == {"_id_", "user_id_date", "token_id_date", "updated"}
+    finally:
+        await db.client.drop_database(db.name)
+        # Point the models back at the test database for the fixture teardown
+        await init_models(app.state.db, DOCUMENTS, skip_indexes=True)
@@ -0,0 +1,16 @@
+"""Import cost tests."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+from account.startup import LAZY_IMPORTS
+
+PROBE = f"import sys, account.main; print(','.join(name for name in {LAZY_IMPORTS!r} if name in sys.modules))"
+
+
+def test_sdks_load_lazily() -> None:
+    """Test importing the app doesn't load SDKs only needed for billing, email or error reports."""
+    root = Path(__file__).parent.parent
+    proc = subprocess.run([sys.executable, "-c", PROBE], cwd=root, capture_output=True, text=True, check=True)
+    assert proc.stdout.strip() == ""
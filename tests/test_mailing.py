@@ -0,0 +1,83 @@
+"""Mailing list sync tests."""
+
+import pytest
+from httpx import AsyncClient
+
+from account.config import CONFIG
+from account.models.mailing import MailingJob
+from account.models.user import User
+from account.util.mailing import flush, update_mailing
+from tests.data import add_empty_user, make_user
+from tests.fake_mailchimp import FakeMailchimp
+from tests.util import auth_headers
+
+
+@pytest.mark.asyncio
+async def test_mailing_coalesce(client: AsyncClient, fake_mailchimp: FakeMailchimp) -> None:
+    """Test repeated list changes are sent once with the last action."""
+    email = await add_empty_user()
+    auth = await auth_headers(client, email)
+    for _ in range(3):
+        assert (await client.post("/mail/list", headers=auth)).status_code == 200
+        assert (await client.delete("/mail/list", headers=auth)).status_code == 204
+    assert (await client.post("/mail/list", headers=auth)).status_code == 200
+    job = await MailingJob.get(email)
+    assert job is not None
+    assert job.action == "subscribe"
+    assert job.version == 7
+    assert await flush() == 1
+    assert fake_mailchimp.emails() == {email}
+    assert await MailingJob.count() == 0
+    # Renames before a sync are chained into one update
+    await update_mailing(email, "middle@test.io")
+    await update_mailing("middle@test.io", "renamed@test.io")
+    assert await flush() == 1
+    assert fake_mailchimp.emails() == {"renamed@test.io"}
+    # Renaming an address that isn't on the list is a no-op
+    await update_mailing("pending@test.io", "ignored@test.io")
+    assert await flush() == 1
+    assert await MailingJob.count() == 0
+    # A subscribe that hasn't been sent moves to the new address
+    user = make_user("pending@test.io")
+    await user.create()
+    auth = await auth_headers(client, user.email)
+    assert (await client.post("/mail/list", headers=auth)).status_code == 200
+    await update_mailing(user.email, "moved@test.io")
+    assert await flush() == 1
+    assert fake_mailchimp.emails() == {"renamed@test.io", "moved@test.io"}
+
+
+@pytest.mark.asyncio
+async def test_mailing_failures(client: AsyncClient, fake_mailchimp: FakeMailchimp) -> None:
+    """Test rejected addresses are unsubscribed and outages are retried."""
+    invalid = make_user("invalid@test.io")
+    await invalid.create()
+    auth = await auth_headers(client, invalid.email)
+    assert (await client.post("/mail/list", headers=auth)).status_code == 200
+    assert await flush() == 1
+    user = await User.by_email(invalid.email)
+    assert user is not None
+    assert not user.subscribed
+    job = await MailingJob.get(invalid.email)
+    assert job is not None
+    assert job.status == "failed"
+    # Server errors are retried instead of failing the job
+    email = await add_empty_user()
+    auth = await auth_headers(client, email)
+    assert (await client.post("/mail/list", headers=auth)).status_code == 200
+    fake_mailchimp.fail_paths.add("batches")
+    retry_delay, CONFIG.mc_retry_delay = CONFIG.mc_retry_delay, 0
+    try:
+        assert await flush() == 1
+        job = await MailingJob.get(email)
+        assert job is not None
+        assert job.status == "pending"
+        assert job.error
+        fake_mailchimp.fail_paths.clear()
+        assert await flush() == 1
+    finally:
+        CONFIG.mc_retry_delay = retry_delay
+    user = await User.by_email(email)
+    assert user is not None
+    assert user.subscribed
+    assert fake_mailchimp.emails() == {email}
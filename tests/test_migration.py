@@ -0,0 +1,39 @@
+"""Notification migration tests."""
+
+from datetime import UTC, datetime
+
+import pytest
+from bson.objectid import ObjectId
+from httpx import AsyncClient
+
+from account.models.notification import Notification
+from account.models.user import User
+from account.util.migration import move_notifications, notifications_migrated
+from tests.data import make_user
+
+
+@pytest.mark.asyncio
+async def test_move_notifications(client: AsyncClient) -> None:
+    """Test embedded notifications keep their IDs and are only copied once."""
+    user = make_user("embedded@test.io")
+    await user.create()
+    users = User.get_motor_collection()
+    # A clean database is marked as migrated
+    assert await notifications_migrated()
+    await users.database["migrations"].delete_many({})
+    kept = ObjectId()
+    embedded = [
+        {"type": "app", "text": "Kept", "timestamp": datetime.now(tz=UTC), "id": kept},
+        {"type": "app", "text": "No ID", "timestamp": datetime.now(tz=UTC)},
+    ]
+    await users.update_one({"_id": user.id}, {"$set": {"notifications": embedded}})
+    assert not await notifications_migrated()
+    assert await move_notifications() == 2
+    # A run interrupted before the user was cleaned up is repeated
+    await users.update_one({"_id": user.id}, {"$set": {"notifications": embedded}})
+    assert await move_notifications() == 2
+    assert user.id is not None
+    notifications = await Notification.for_user(user.id)
+    assert len(notifications) == 2
+    assert kept in {item.id for item in notifications}
+    assert await notifications_migrated()
@@ -0,0 +1,61 @@
+"""Outbound email queue tests."""
+
+import pytest
+from httpx import AsyncClient
+
+from account.config import CONFIG
+from account.models.outbox import OutboxEmail
+from account.util.mail import send_email_change
+from account.util.outbox import claim, enqueue, process, requeue_dead
+
+
+@pytest.mark.asyncio
+async def test_outbox_dedupe(client: AsyncClient) -> None:
+    """Test emails are only deduped by an idempotency key."""
+    # Repeats without a key are legitimate and all sent
+    await send_email_change("old@test.io", "new@test.io")
+    await send_email_change("old@test.io", "new@test.io")
+    assert await OutboxEmail.count() == 4
+    assert await enqueue([("old@test.io", "Other", "Body")] * 2) == 2
+    # A handler that runs twice for the same event only queues once
+    assert await enqueue([("old@test.io", "Other", "Body")], key="evt_1") == 1
+    assert await enqueue([("old@test.io", "Other", "Body")], key="evt_1") == 0
+    assert await enqueue([("old@test.io", "Other", "Body")], key="evt_2") == 1
+    assert await OutboxEmail.count() == 8
+
+
+@pytest.mark.asyncio
+async def test_outbox_delivery(client: AsyncClient) -> None:
+    """Test emails are delivered, retried and dead-lettered."""
+    console, server, port, attempts = (
+        CONFIG.mail_console,
+        CONFIG.mail_server,
+        CONFIG.mail_port,
+        CONFIG.mail_max_attempts,
+    )
+    try:
+        CONFIG.mail_console = True
+        await enqueue([("sent@test.io", "Title", "Body")])
+        email = await claim()
+        assert email is not None
+        assert await claim() is None
+        assert await process(email)
+        sent = await OutboxEmail.get(email.id)
+        assert sent is not None
+        assert sent.status == "sent"
+        # Nothing is listening on the port, so every attempt fails
+        CONFIG.mail_console, CONFIG.mail_server, CONFIG.mail_port = False, "127.0.0.1", 1
+        CONFIG.mail_max_attempts = 1
+        await enqueue([("dead@test.io", "Title", "Body")])
+        email = await claim()
+        assert email is not None
+        assert not await process(email)
+        dead = await OutboxEmail.get(email.id)
+        assert dead is not None
+        assert dead.status == "dead"
+        assert dead.error
+        assert await requeue_dead() == 1
+        assert await claim() is not None
+    finally:
+        CONFIG.mail_console, CONFIG.mail_server, CONFIG.mail_port = console, server, port
+        CONFIG.mail_max_attempts = attempts
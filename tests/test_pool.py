@@ -0,0 +1,41 @@
+"""Blocking work pool tests."""
+
+import asyncio as aio
+import threading
+import time
+
+import pytest
+
+from account.util.pool import WorkerPool
+
+
+@pytest.mark.asyncio
+async def test_pool_offloads_calls() -> None:
+    """Test blocking calls run on pool threads, capped at the worker count."""
+    pool = WorkerPool(2, "test")
+
+    def work(value: int) -> str:
+        time.sleep(0.05)
+        return f"{threading.current_thread().name}:{value}"
+
+    ticks = 0
+
+    async def tick() -> None:
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await aio.sleep(0.01)
+
+    ticker = aio.create_task(tick())
+    results = await aio.gather(*(pool.run(work, i) for i in range(4)))
+    ticker.cancel()
+    # The event loop kept running while the calls blocked their threads
+    assert ticks > 3
+    assert all(result.startswith("test") for result in results)
+    assert [result.split(":")[1] for result in results] == ["0", "1", "2", "3"]
+    stats = pool.stats()
+    assert stats["completed"] == 4
+    assert stats["pending"] == 0
+    # Two calls had to wait for a free worker
+    assert stats["max_wait"] >= 0.04
+    pool.shutdown()
@@ -0,0 +1,90 @@
+"""reCaptcha circuit breaker tests."""
+
+import asyncio as aio
+
+import httpx
+import pytest
+
+from account.config import CONFIG
+from account.util.recaptcha import ReCaptcha
+
+
+def _recaptcha(transport: httpx.MockTransport) -> ReCaptcha:
+    recaptcha = ReCaptcha(timeout=1, failure_threshold=2, reset_after=0)
+    recaptcha._client = httpx.AsyncClient(transport=transport)
+    return recaptcha
+
+
+@pytest.mark.asyncio
+async def test_recaptcha_scores() -> None:
+    """Test tokens pass on a high enough score."""
+    scores = iter([0.9, 0.1])
+    recaptcha = _recaptcha(
+        httpx.MockTransport(lambda _: httpx.Response(200, json={"success": True, "score": next(scores)}))
+    )
+    assert await recaptcha.verify("human")
+    assert not await recaptcha.verify("bot")
+    stats = recaptcha.stats()
+    assert stats["passed"] == stats["rejected"] == 1
+    assert stats["state"] == "closed"
+    await recaptcha.close()
+
+
+@pytest.mark.asyncio
+async def test_recaptcha_breaker() -> None:
+    """Test the breaker opens after failures and closes once the service recovers."""
+    healthy = False
+
+    def handler(_: httpx.Request) -> httpx.Response:
+        if healthy:
+            return httpx.Response(200, json={"success": True, "score": 0.1})
+        return httpx.Response(503)
+
+    recaptcha = _recaptcha(httpx.MockTransport(handler))
+    recaptcha.reset_after = 60
+    # Fails closed by default
+    assert not await recaptcha.verify("token")
+    assert not await recaptcha.verify("token")
+    assert recaptcha.state == "open"
+    fail_open = CONFIG.recaptcha_fail_open
+    try:
+        CONFIG.recaptcha_fail_open = True
+        assert await recaptcha.verify("token")
+    finally:
+        CONFIG.recaptcha_fail_open = fail_open
+    assert recaptcha.stats()["short_circuited"] == 1
+    # The trial call after the reset time closes the breaker
+    healthy, recaptcha.reset_after = True, 0
+    assert not await recaptcha.verify("token")
+    assert recaptcha.state == "closed"
+    await recaptcha.close()
+
+
+@pytest.mark.asyncio
+async def test_recaptcha_cancelled_trial() -> None:
+    """Test a cancelled trial call doesn't keep the breaker from probing again."""
+    calls = 0
+    hang = aio.Event()
+
+    async def handler(_: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await hang.wait()
+        return httpx.Response(200, json={"success": True, "score": 0.9})
+
+    recaptcha = _recaptcha(httpx.MockTransport(handler))
+    recaptcha.opened_at = 0
+    task = aio.create_task(recaptcha.verify("token"))
+    while not calls:
+        await aio.sleep(0)
+    task.cancel()
+    with pytest.raises(aio.CancelledError):
+        await task
+    assert recaptcha.state == "half-open"
+    # The next call is let through as a new trial and closes the breaker
+    hang.set()
+    assert await recaptcha.verify("token")
+    assert calls == 2
+    assert recaptcha.state == "closed"
+    assert recaptcha.stats()["short_circuited"] == 0
+    await recaptcha.close()
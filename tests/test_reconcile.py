@@ -0,0 +1,48 @@
+"""Billing reconciliation tests."""
+
+import pytest
+from httpx import AsyncClient
+
+from account.models.plan import Plan
+from account.models.user import Stripe, User
+from account.util.reconcile import Mismatch, reconcile
+from tests.data import add_plans, make_user
+from tests.fake_stripe import FakeStripe
+
+
+async def _add_billed_user(email: str, plan: str, customer_id: str, subscription_id: str | None) -> None:
+    user = make_user(email)
+    user.plan = await Plan.by_key(plan)
+    user.stripe = Stripe(customer_id=customer_id, subscription_id=subscription_id)
+    await user.create()
+
+
+@pytest.mark.asyncio
+async def test_reconcile(client: AsyncClient, fake_stripe: FakeStripe) -> None:
+    """Test billing drift is reported and fixed."""
+    await add_plans("free", "pro")
+    for i in range(5):
+        customer = fake_stripe.add_customer(f"ok{i}@test.io")
+        sub = fake_stripe.add_subscription(customer, "price_pro")
+        await _add_billed_user(f"ok{i}@test.io", "pro", customer, sub["id"])
+    # Subscription was canceled in Stripe but the user still has the paid plan
+    customer = fake_stripe.add_customer("lapsed@test.io")
+    sub = fake_stripe.add_subscription(customer, "price_pro", status="canceled")
+    await _add_billed_user("lapsed@test.io", "pro", customer, sub["id"])
+
+    mismatches: list[Mismatch] = []
+    report = await reconcile(batch_size=2, concurrency=2, report=mismatches.append)
+    assert report.checked == 6
+    assert report.mismatched == 1
+    assert {item.field for item in mismatches} == {"subscription_id", "plan"}
+
+    report = await reconcile(fix=True, report=lambda _: None)
+    assert report.fixed == 1
+    user = await User.by_email("lapsed@test.io")
+    assert user is not None
+    assert user.plan is not None
+    assert user.plan.key == "free"
+    assert user.stripe is not None
+    assert user.stripe.subscription_id is None
+    report = await reconcile(report=lambda _: None)
+    assert report.mismatched == 0
@@ -0,0 +1,102 @@
+"""Monthly usage rollup tests."""
+
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import pytest
+from httpx import AsyncClient
+
+from account.config import CONFIG
+from account.models.token import TokenUsage, TokenUsageMonth, UserUsageMonth
+from account.models.user import UserToken
+from account.util.lease import acquire_lease, lease_collection, release_lease
+from account.util.rollup import refresh_rollups, watermark
+from account.util.token import token_history, user_usage_totals
+from tests.data import make_user
+
+_MONTH = {"$dateTrunc": {"date": "$date", "unit": "month"}}
+
+
+async def _daily_totals(*keys: str) -> dict[tuple[Any, ...], int]:
+    """Return monthly totals summed directly from daily usage."""
+    pipeline = [
+        {"$group": {"_id": {**{key: f"${key}" for key in keys}, "date": _MONTH}, "count": {"$sum": "$count"}}},
+    ]
+    rows = await TokenUsage.get_motor_collection().aggregate(pipeline).to_list(None)
+    return {(*(row["_id"][key] for key in keys), row["_id"]["date"]): row["count"] for row in rows}
+
+
+async def _rollup_totals(model: type[TokenUsageMonth | UserUsageMonth], *keys: str) -> dict[tuple[Any, ...], int]:
+    rows = await model.get_motor_collection().find().to_list(None)
+    return {(*(row[key] for key in keys), row["date"]): row["count"] for row in rows}
+
+
+async def _assert_rollups_match() -> None:
+    assert await _rollup_totals(TokenUsageMonth, "token_id") == await _daily_totals("token_id")
+    assert await _rollup_totals(UserUsageMonth, "user_id") == await _daily_totals("user_id")
+
+
+@pytest.mark.asyncio
+async def test_rollups_match_daily_usage(client: AsyncClient) -> None:
+    """Test refreshes, late updates and backfills keep rollups equal to daily usage."""
+    user = make_user("rollup@test.io")
+    tokens = [UserToken.new(), UserToken.new()]
+    user.tokens = tokens
+    await user.create()
+    assert user.id is not None
+    today = datetime.now(tz=UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    await TokenUsage.insert_many(
+        [
+            TokenUsage(
+                token_id=token.id,  # type: ignore[arg-type]
+                user_id=user.id,
+                count=(i + 1) * (n + 1),
+                date=today - timedelta(days=i),
+                updated=today - timedelta(days=i),
+            )
+            for n, token in enumerate(tokens)
+            for i in range(70)
+        ]
+    )
+    assert await refresh_rollups() >= 2 * 3
+    await _assert_rollups_match()
+    # A late write to an old day is past the watermark and recomputes its month
+    old = await TokenUsage.find_one(TokenUsage.date == today - timedelta(days=60))
+    assert old is not None
+    await TokenUsage.get_motor_collection().update_one(
+        {"_id": old.id}, {"$inc": {"count": 5}, "$set": {"updated": datetime.now(tz=UTC)}}
+    )
+    assert await refresh_rollups() >= 1
+    await _assert_rollups_match()
+    # A write that lands late with an update time before the watermark is caught by the overlap
+    since = await watermark()
+    assert since is not None
+    await TokenUsage.get_motor_collection().update_one(
+        {"_id": old.id}, {"$inc": {"count": 7}, "$set": {"updated": since - timedelta(minutes=5)}}
+    )
+    assert await refresh_rollups() >= 1
+    await _assert_rollups_match()
+    await refresh_rollups(backfill=True)
+    await _assert_rollups_match()
+    # Monthly history reads the same totals from rollups as from daily usage
+    interval = CONFIG.usage_rollup_interval
+    try:
+        daily = await token_history(str(tokens[0].id), 90, "month"), await user_usage_totals(user, 90, "month")
+        CONFIG.usage_rollup_interval = 300
+        rollup = await token_history(str(tokens[0].id), 90, "month"), await user_usage_totals(user, 90, "month")
+    finally:
+        CONFIG.usage_rollup_interval = interval
+    assert rollup == daily
+
+
+@pytest.mark.asyncio
+async def test_rollup_lease(client: AsyncClient) -> None:
+    """Test only one process holds the rollup lease at a time."""
+    leases = lease_collection(TokenUsageMonth)
+    assert await acquire_lease(leases, "rollup", "first", 60)
+    assert not await acquire_lease(leases, "rollup", "second", 60)
+    assert await acquire_lease(leases, "rollup", "first", 60)
+    await release_lease(leases, "rollup", "first")
+    assert await acquire_lease(leases, "rollup", "second", -1)
+    # An expired lease is taken over
+    assert await acquire_lease(leases, "rollup", "first", 60)
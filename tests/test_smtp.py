@@ -0,0 +1,74 @@
+"""Pooled SMTP transport tests."""
+
+from collections.abc import AsyncIterator
+
+import pytest
+import pytest_asyncio
+from aiosmtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+
+from account.config import CONFIG
+from account.util.smtp import SMTPPool, build_message
+from tests.fake_smtp import FakeSMTP
+
+
+@pytest_asyncio.fixture()
+async def fake_smtp() -> AsyncIterator[FakeSMTP]:
+    """Point the SMTP settings at a local fake server."""
+    settings = (CONFIG.mail_server, CONFIG.mail_port, CONFIG.mail_starttls, CONFIG.mail_username)
+    fake = FakeSMTP()
+    CONFIG.mail_server, CONFIG.mail_port = "127.0.0.1", await fake.start()
+    CONFIG.mail_starttls, CONFIG.mail_username = False, ""
+    yield fake
+    await fake.close()
+    CONFIG.mail_server, CONFIG.mail_port, CONFIG.mail_starttls, CONFIG.mail_username = settings
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connections(fake_smtp: FakeSMTP) -> None:
+    """Test sequential sends share one connection until it idles out."""
+    pool = SMTPPool(size=2, idle_timeout=60)
+    for i in range(3):
+        await pool.send(build_message(f"user{i}@test.io", "Title", "Body"))
+    assert len(fake_smtp.messages) == 3
+    assert fake_smtp.connections == 1
+    assert pool.stats() == {"idle": 1, "connects": 1, "sent": 3, "errors": 0}
+    await pool.close()
+    # Idle connections past the timeout are replaced
+    pool = SMTPPool(size=1, idle_timeout=0)
+    await pool.send(build_message("user@test.io", "Title", "Body"))
+    await pool.send(build_message("user@test.io", "Title", "Body"))
+    assert pool.connects == 2
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_reconnects(fake_smtp: FakeSMTP) -> None:
+    """Test a dropped connection is retried once on a new one."""
+    pool = SMTPPool(size=1, idle_timeout=60)
+    await pool.send(build_message("user@test.io", "Title", "Body"))
+    fake_smtp.disconnects = 1
+    await pool.send(build_message("user@test.io", "Title", "Body"))
+    assert len(fake_smtp.messages) == 2
+    assert pool.connects == 2
+    # A second drop fails the send with the original error
+    fake_smtp.disconnects = 2
+    with pytest.raises(SMTPServerDisconnected):
+        await pool.send(build_message("user@test.io", "Title", "Body"))
+    assert pool.errors == 1
+    assert pool.stats()["idle"] == 0
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_send_many_partial_failure(fake_smtp: FakeSMTP) -> None:
+    """Test one refused recipient doesn't stop the other messages."""
+    fake_smtp.refused.add("bad@test.io")
+    pool = SMTPPool(size=2, idle_timeout=60)
+    emails = ["one@test.io", "bad@test.io", "two@test.io"]
+    errors = await pool.send_many(build_message(email, "Title", "Body") for email in emails)
+    assert errors[0] is None
+    assert isinstance(errors[1], SMTPRecipientsRefused)
+    assert errors[2] is None
+    assert len(fake_smtp.messages) == 2
+    assert pool.stats()["errors"] == 1
+    await pool.close()
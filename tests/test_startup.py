@@ -0,0 +1,16 @@
+"""Startup phase timing tests."""
+
+from account.startup import StartupTimer
+
+
+def test_startup_timer() -> None:
+    """Test phases are recorded in the order they finish."""
+    timer = StartupTimer()
+    for name in ("imports", "database", "workers"):
+        timer.phase(name)
+    assert list(timer.phases) == ["imports", "database", "workers"]
+    assert all(seconds >= 0 for seconds in timer.phases.values())
+    stats = timer.stats()
+    assert list(stats) == ["imports", "database", "workers", "total"]
+    assert stats["total"] == sum(timer.phases.values())
+    assert timer.report().startswith("imports ")
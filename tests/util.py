@@ -1,8 +1,13 @@
 """Common test utilities."""
 
+import time
+from typing import Any
+
 from httpx import AsyncClient
 
+from account.config import CONFIG
 from account.models.auth import RefreshToken
+from tests.fake_stripe import sign_event
 
 
 def auth_header_token(token: str) -> dict[str, str]:
@@ -21,3 +26,9 @@ async def auth_headers(client: AsyncClient, email: str, password: str | None = N
     """Return the authorization headers for an email."""
     auth = await auth_payload(client, email, password)
     return auth_header_token(auth.access_token)
+
+
+def stripe_event(event_id: str, type: str, obj: dict[str, Any]) -> tuple[bytes, dict[str, str]]:
+    """Return a Stripe event payload and its signature header."""
+    event = {"id": event_id, "object": "event", "type": type, "created": int(time.time()), "data": {"object": obj}}
+    return sign_event(event, CONFIG.stripe_sign_secret)
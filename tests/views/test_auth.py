@@ -1,8 +1,12 @@
 """Authentication tests."""
 
+import threading
+
 import pytest
 from httpx import AsyncClient
 
+from account.util import password
+from account.util.password import password_pool
 from tests.data import add_empty_user
 from tests.util import auth_header_token, auth_payload
 
@@ -34,3 +38,26 @@ async def test_refresh(client: AsyncClient) -> None:
     headers = auth_header_token(resp.json()["access_token"])
     resp = await client.get("/user", headers=headers)
     assert resp.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_login_password_pool(client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test login checks passwords in the bcrypt pool instead of on the event loop."""
+    email = await add_empty_user()
+    threads: list[str] = []
+    check = password._check_password
+
+    def check_in_thread(value: str, hashed: str) -> bool:
+        threads.append(threading.current_thread().name)
+        return check(value, hashed)
+
+    monkeypatch.setattr(password, "_check_password", check_in_thread)
+    completed = password_pool.completed
+    resp = await client.post("/auth/login", json={"email": email, "password": email})
+    assert resp.status_code == 200
+    assert "access_token" in resp.json()
+    resp = await client.post("/auth/login", json={"email": email, "password": "wrong password"})
+    assert resp.status_code == 401
+    assert password_pool.completed == completed + 2
+    assert len(threads) == 2
+    assert all(name.startswith("bcrypt") for name in threads)
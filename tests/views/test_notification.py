@@ -24,6 +24,17 @@ async def test_get_notifications(client: AsyncClient) -> None:
         assert "id" in notification
 
 
+@pytest.mark.asyncio
+async def test_get_notifications_unpaged(client: AsyncClient) -> None:
+    """Test notifications aren't cut off when no limit is given."""
+    text = [f"Notification {i}" for i in range(120)]
+    email = await add_notification_user(*text)
+    auth = await auth_headers(client, email)
+    resp = await client.get("/notification", headers=auth)
+    assert resp.status_code == 200
+    assert [n["text"] for n in resp.json()] == text
+
+
 @pytest.mark.asyncio
 async def test_delete_notifications(client: AsyncClient) -> None:
     """Test deleting all user notifications."""
@@ -59,3 +70,19 @@ async def test_delete_notification(client: AsyncClient) -> None:
     assert len(notifications) == len(text) - 1
     for notification in notifications:
         assert notification["id"] != value
+
+
+@pytest.mark.asyncio
+async def test_notification_pages(client: AsyncClient) -> None:
+    """Test paging through notifications with a cursor."""
+    text = ("One", "Two", "Three")
+    email = await add_notification_user(*text)
+    auth = await auth_headers(client, email)
+    resp = await client.get("/notification", headers=auth, params={"limit": 2})
+    assert resp.status_code == 200
+    first = resp.json()
+    assert [n["text"] for n in first] == ["One", "Two"]
+    resp = await client.get("/notification", headers=auth, params={"limit": 2, "after": first[-1]["id"]})
+    assert resp.status_code == 200
+    second = resp.json()
+    assert [n["text"] for n in second] == ["Three"]
@@ -1,8 +1,11 @@
 """Plan information tests."""
 
+import asyncio as aio
+
 import pytest
 from httpx import AsyncClient
 
+from account.models.plan import plans
 from tests.data import add_plan_user, add_plans
 from tests.util import auth_headers
 
@@ -29,3 +32,27 @@ async def test_get_all_plans(client: AsyncClient) -> None:
     assert resp.status_code == 200
     plans = resp.json()
     assert len(plans) == len(keys)
+
+
+@pytest.mark.asyncio
+async def test_plan_catalog_refresh(client: AsyncClient) -> None:
+    """Test plan list reflects plans added after it was loaded."""
+    resp = await client.get("plan/all")
+    assert resp.json() == []
+    await add_plans("free")
+    resp = await client.get("plan/all")
+    assert resp.status_code == 200
+    assert [plan["key"] for plan in resp.json()] == ["free"]
+
+
+@pytest.mark.asyncio
+async def test_plan_catalog_invalidated_during_refresh(client: AsyncClient) -> None:
+    """Test a reload that started before a write doesn't hide the write."""
+    await add_plans("free")
+    refresh = aio.create_task(plans.refresh())
+    # Let the reload start its query before the write invalidates the catalog
+    await aio.sleep(0)
+    await add_plans("pro")
+    await refresh
+    assert plans.is_stale
+    assert sorted(plan.key for plan in await plans.all()) == ["free", "pro"]
@@ -0,0 +1,242 @@
+"""Stripe webhook tests."""
+
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import pytest
+from httpx import AsyncClient
+
+from account.config import CONFIG
+from account.models.addon import Addon, UserAddon
+from account.models.plan import Plan
+from account.models.subscription import SubscriptionMirror
+from account.models.user import Stripe, User
+from account.models.webhook import WebhookEvent
+from account.util.stripe import change_subscription, load_subscription
+from account.util.webhook import claim, process
+from tests.data import PLANS, add_plan_user, add_plans, make_user
+from tests.fake_stripe import EventGenerator, FakeStripe
+from tests.util import auth_headers, stripe_event
+
+
+@pytest.mark.asyncio
+async def test_fulfill_queues_event(client: AsyncClient) -> None:
+    """Test verified events are stored once and acknowledged."""
+    payload, headers = stripe_event("evt_1", "invoice.paid", {"object": "invoice", "customer": "cus_1"})
+    for _ in range(2):
+        resp = await client.post("/stripe/fulfill", content=payload, headers=headers)
+        assert resp.status_code == 200
+    events = await WebhookEvent.find_all().to_list()
+    assert len(events) == 1
+    assert events[0].id == "evt_1"
+    assert events[0].status == "pending"
+    assert events[0].customer_id == "cus_1"
+
+
+@pytest.mark.asyncio
+async def test_fulfill_rejects_bad_events(client: AsyncClient) -> None:
+    """Test unsigned and unhandled events are rejected."""
+    payload, headers = stripe_event("evt_2", "invoice.paid", {"object": "invoice"})
+    resp = await client.post("/stripe/fulfill", content=payload, headers={"Stripe-Signature": "t=1,v1=bad"})
+    assert resp.status_code == 400
+    payload, headers = stripe_event("evt_3", "customer.created", {"object": "customer"})
+    resp = await client.post("/stripe/fulfill", content=payload, headers=headers)
+    assert resp.status_code == 400
+    assert await WebhookEvent.count() == 0
+
+
+@pytest.mark.asyncio
+async def test_claim_orders_by_customer(client: AsyncClient) -> None:
+    """Test a customer's events are leased one at a time in order."""
+    events = [("evt_a1", "cus_a", 1), ("evt_a2", "cus_a", 2), ("evt_b1", "cus_b", 3)]
+    for event_id, customer, created in events:
+        payload, headers = stripe_event(event_id, "invoice.paid", {"object": "invoice", "customer": customer})
+        await client.post("/stripe/fulfill", content=payload, headers=headers)
+        await WebhookEvent.find_one({"_id": event_id}).update({"$set": {"created": created}})
+    first, second = await claim(), await claim()
+    assert first is not None
+    assert second is not None
+    assert (first.id, second.id) == ("evt_a1", "evt_b1")
+    assert await claim() is None
+
+
+def _subscription(status: str) -> dict[str, Any]:
+    item = {
+        "id": "si_1",
+        "object": "subscription_item",
+        "price": {"id": "price_1", "object": "price", "product": "prod_1"},
+    }
+    return {
+        "id": "sub_1",
+        "object": "subscription",
+        "customer": "cus_1",
+        "status": status,
+        "cancel_at_period_end": False,
+        "ended_at": None,
+        "items": {"object": "list", "data": [item]},
+    }
+
+
+@pytest.mark.asyncio
+async def test_claim_orders_same_second_by_arrival(client: AsyncClient) -> None:
+    """Test events created in the same second are applied in the order they arrived."""
+    received = datetime.now(tz=UTC)
+    for i, event_id in enumerate(("evt_z", "evt_a")):
+        await WebhookEvent(
+            id=event_id,
+            type="invoice.paid",
+            customer_id="cus_tie",
+            created=5,
+            payload={},
+            received=received + timedelta(milliseconds=i),
+        ).insert()
+    first = await claim()
+    assert first is not None
+    assert first.id == "evt_z"
+    assert await claim() is None
+
+
+@pytest.mark.asyncio
+async def test_claim_skips_blocked_customers(client: AsyncClient) -> None:
+    """Test a long queue for one customer doesn't hide other customers' events."""
+    for i in range(30):
+        await WebhookEvent(
+            id=f"evt_busy{i}", type="invoice.paid", customer_id="cus_busy", created=i, payload={}
+        ).insert()
+    await WebhookEvent(id="evt_free", type="invoice.paid", customer_id="cus_free", created=100, payload={}).insert()
+    first, second = await claim(), await claim()
+    assert first is not None
+    assert second is not None
+    assert (first.id, second.id) == ("evt_busy0", "evt_free")
+    assert await claim() is None
+
+
+@pytest.mark.asyncio
+async def test_subscription_mirror(client: AsyncClient) -> None:
+    """Test subscription events update the mirror and ignore older state."""
+    for event_id, status, created in (("evt_new", "past_due", 20), ("evt_old", "active", 10)):
+        payload, headers = stripe_event(event_id, "customer.subscription.updated", _subscription(status))
+        await client.post("/stripe/fulfill", content=payload, headers=headers)
+        event = await WebhookEvent.get(event_id)
+        assert event is not None
+        event.payload["created"] = created
+        assert await process(event)
+    mirror = await SubscriptionMirror.get("sub_1")
+    assert mirror is not None
+    assert mirror.status == "past_due"
+    assert mirror.as_of == 20
+    assert mirror.is_fresh
+    assert [item.price_id for item in mirror.items] == ["price_1"]
+
+
+@pytest.mark.asyncio
+async def test_checkout_and_failed_invoices(client: AsyncClient, fake_stripe: FakeStripe) -> None:
+    """Test generated events upgrade, disable and re-enable a user."""
+    await add_plans("free", "pro")
+    email = await add_plan_user("free")
+    user = await User.by_email(email)
+    assert user is not None
+    events = EventGenerator(fake_stripe, CONFIG.stripe_sign_secret)
+    customer_id, checkout = events.checkout_completed(str(user.id), email, "price_pro")
+    for payload, headers in (
+        checkout,
+        events.invoice(customer_id, paid=False, attempt=1),
+        events.invoice(customer_id, paid=False, attempt=2),
+    ):
+        resp = await client.post("/stripe/fulfill", content=payload, headers=headers)
+        assert resp.status_code == 200
+    while event := await claim():
+        assert await process(event)
+    user = await User.by_email(email)
+    assert user is not None
+    assert user.plan is not None
+    assert user.plan.key == "pro"
+    assert user.stripe is not None
+    assert user.stripe.customer_id == customer_id
+    assert user.disabled
+    payload, headers = events.invoice(customer_id, paid=True)
+    await client.post("/stripe/fulfill", content=payload, headers=headers)
+    event = await claim()
+    assert event is not None
+    assert await process(event)
+    user = await User.by_email(email)
+    assert user is not None
+    assert not user.disabled
+
+
+@pytest.mark.asyncio
+async def test_portal_reuses_session(client: AsyncClient, fake_stripe: FakeStripe) -> None:
+    """Test repeated portal requests share one Stripe session."""
+    user = make_user("portal@test.io")
+    user.stripe = Stripe(customer_id=fake_stripe.add_customer(user.email), subscription_id=None)
+    await user.create()
+    auth = await auth_headers(client, user.email)
+    urls = set()
+    for _ in range(3):
+        resp = await client.get("/stripe/portal", headers=auth)
+        assert resp.status_code == 200
+        urls.add(resp.json()["url"])
+    assert len(urls) == 1
+    assert fake_stripe.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_change_plan_keeps_concurrent_addons(client: AsyncClient, fake_stripe: FakeStripe) -> None:
+    """Test a plan change only updates the addons it reprices."""
+    await add_plans("pro")
+    await Plan(**{**PLANS["pro"], "key": "pro-year", "stripe_id": "price_pro_year"}).create()
+    await Addon(
+        key="overage",
+        name="Overage",
+        description="Overage",
+        product_id="prod_overage",
+        price_ids={"monthly": "price_over_month", "yearly": "price_over_year"},
+        metered=True,
+    ).create()
+    fake_stripe.add_price("price_over_month", "prod_overage", "metered")
+    customer_id = fake_stripe.add_customer("addons@test.io")
+    sub = fake_stripe.add_subscription(customer_id, "price_pro", "price_over_month")
+    user = make_user("addons@test.io")
+    user.plan = await Plan.by_key("pro")
+    user.stripe = Stripe(customer_id=customer_id, subscription_id=sub["id"])
+    user.addons = [UserAddon(key="overage", name="Overage", description="Overage", price_id="price_over_month")]
+    await user.create()
+    # Another request adds an addon after this copy of the user was loaded
+    stale = await User.by_email(user.email)
+    assert stale is not None
+    extra = UserAddon(key="extra", name="Extra", description="Extra", price_id="price_extra")
+    await user.add_addon(extra)
+    year = await Plan.by_key("pro-year")
+    assert year is not None
+    assert await change_subscription(stale, year)
+    stored = await User.by_email(user.email)
+    assert stored is not None
+    assert stored.plan is not None
+    assert stored.plan.key == "pro-year"
+    assert {addon.key: addon.price_id for addon in stored.addons} == {
+        "overage": "price_over_year",
+        "extra": "price_extra",
+    }
+
+
+@pytest.mark.asyncio
+async def test_change_plan_refreshes_stale_items(client: AsyncClient, fake_stripe: FakeStripe) -> None:
+    """Test a plan change retries with Stripe's items when the mirror's are out of date."""
+    await add_plans("pro")
+    await Plan(**{**PLANS["pro"], "key": "pro-year", "stripe_id": "price_pro_year"}).create()
+    customer_id = fake_stripe.add_customer("stale@test.io")
+    sub = fake_stripe.add_subscription(customer_id, "price_pro")
+    await load_subscription(sub["id"])
+    # Stripe replaced the item without a subscription webhook reaching the mirror
+    sub["items"]["data"][0]["id"] = "si_replaced"
+    user = make_user("stale@test.io")
+    user.plan = await Plan.by_key("pro")
+    user.stripe = Stripe(customer_id=customer_id, subscription_id=sub["id"])
+    await user.create()
+    year = await Plan.by_key("pro-year")
+    assert year is not None
+    assert await change_subscription(user, year)
+    assert sub["items"]["data"][0]["price"]["id"] == "price_pro_year"
+    mirror = await SubscriptionMirror.get(sub["id"])
+    assert mirror is not None
+    assert [(item.id, item.price_id) for item in mirror.items] == [("si_replaced", "price_pro_year")]
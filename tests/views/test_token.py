@@ -1,11 +1,15 @@
 """Token management tests."""
 
+import asyncio as aio
 from datetime import datetime
 
 import pytest
 from httpx import AsyncClient
+from pymongo.errors import DuplicateKeyError
 
-from tests.data import add_empty_user, add_token_user
+from account.models import user as user_model
+from account.models.user import TOKEN_ATTEMPTS, User, UserToken
+from tests.data import add_empty_user, add_token_user, make_user
 from tests.util import auth_headers
 
 
@@ -70,6 +74,49 @@ async def test_new_token(client: AsyncClient) -> None:
     await assert_token_count(client, auth, 1)
 
 
+@pytest.mark.asyncio
+async def test_new_token_concurrent(client: AsyncClient) -> None:
+    """Test parallel token creation doesn't overwrite other changes."""
+    email = await add_empty_user()
+    auth = await auth_headers(client, email)
+    resps = await aio.gather(*(client.post("/token", headers=auth) for _ in range(3)))
+    assert all(resp.status_code == 200 for resp in resps)
+    await assert_token_count(client, auth, 3)
+
+
+@pytest.mark.asyncio
+async def test_new_token_collision(client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test a token value already in use is regenerated before it's stored."""
+    owner = await User.by_email(await add_token_user())
+    assert owner is not None
+    taken = owner.tokens[0].value
+    user = make_user("collision@test.io")
+    await user.create()
+    values = iter([taken, "fresh-value"])
+    monkeypatch.setattr(user_model, "token_urlsafe", lambda _: next(values))
+    token = UserToken.new()
+    await user.add_token(token)
+    assert token.value == "fresh-value"
+    stored = await User.by_email(user.email)
+    assert stored is not None
+    assert [t.value for t in stored.tokens] == ["fresh-value"]
+    # A value that keeps colliding fails once the attempts run out
+    calls = 0
+
+    def collide(_: int) -> str:
+        nonlocal calls
+        calls += 1
+        return taken
+
+    monkeypatch.setattr(user_model, "token_urlsafe", collide)
+    with pytest.raises(DuplicateKeyError):
+        await user.add_token(UserToken.new())
+    assert calls == TOKEN_ATTEMPTS
+    stored = await User.by_email(user.email)
+    assert stored is not None
+    assert len(stored.tokens) == 1
+
+
 @pytest.mark.asyncio
 async def test_get_token(client: AsyncClient) -> None:
     """Test fetching a user token by value."""
@@ -137,10 +184,51 @@ async def test_token_history(client: AsyncClient) -> None:
     email = await add_token_user(history=True)
     auth = await auth_headers(client, email)
     value = (await get_token(client, auth))["_id"]
-    # Fetch single token history
+    # Fetch single token history with empty days filled
     resp = await client.get(f"/token/{value}/history", headers=auth)
     assert resp.status_code == 200
     history: list[dict] = resp.json()
-    assert len(history) == 3
+    assert len(history) == 30
     for item in history:
         assert_token_history(item)
+    assert sum(1 for item in history if item["count"]) <= 3
+    # Fetch monthly totals
+    resp = await client.get(f"/token/{value}/history", headers=auth, params={"granularity": "month", "days": 90})
+    assert resp.status_code == 200
+    history = resp.json()
+    assert len(history) in (3, 4)
+
+
+@pytest.mark.asyncio
+async def test_token_history_without_usage(client: AsyncClient) -> None:
+    """Test tokens without usage still return a full series of zeros."""
+    email = await add_token_user()
+    auth = await auth_headers(client, email)
+    value = (await get_token(client, auth))["_id"]
+    resp = await client.get(f"/token/{value}/history", headers=auth)
+    assert resp.status_code == 200
+    history: list[dict] = resp.json()
+    assert len(history) == 30
+    assert all(item["count"] == 0 for item in history)
+    resp = await client.get("/token/history", headers=auth, params={"days": 7})
+    assert resp.status_code == 200
+    tokens: list[dict] = resp.json()
+    assert len(tokens) == 1
+    assert tokens[0]["token_id"] == value
+    assert len(tokens[0]["days"]) == 7
+    assert all(item["count"] == 0 for item in tokens[0]["days"])
+
+
+@pytest.mark.asyncio
+async def test_token_history_days_limit(client: AsyncClient) -> None:
+    """Test history requests are limited to a year of days."""
+    email = await add_token_user()
+    auth = await auth_headers(client, email)
+    value = (await get_token(client, auth))["_id"]
+    for days in (0, 367, 10**6):
+        resp = await client.get(f"/token/{value}/history", headers=auth, params={"days": days})
+        assert resp.status_code == 422
+        resp = await client.get("/token/history", headers=auth, params={"days": days})
+        assert resp.status_code == 422
+    resp = await client.get(f"/token/{value}/history", headers=auth, params={"days": 366})
+    assert resp.status_code == 200
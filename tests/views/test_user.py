@@ -3,7 +3,8 @@
 import pytest
 from httpx import AsyncClient
 
-from tests.data import add_empty_user
+from account.models.notification import Notification
+from tests.data import add_empty_user, add_notification_user
 from tests.util import auth_headers
 
 
@@ -85,3 +86,14 @@ async def test_user_delete(client: AsyncClient) -> None:
     # Check deletion
     resp = await client.get("/user", headers=auth)
     assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_user_delete_notifications(client: AsyncClient) -> None:
+    """Test deleting a user also deletes their notifications."""
+    email = await add_notification_user("Thank you", "Testing")
+    auth = await auth_headers(client, email)
+    assert await Notification.count() == 2
+    resp = await client.delete("/user", headers=auth)
+    assert resp.status_code == 204
+    assert await Notification.count() == 0
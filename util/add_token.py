@@ -17,9 +17,8 @@ async def main(email: str) -> int:
         print(f"User with email {email} does not exist")
         return 1
 
-    token = await UserToken.new()
-    user.tokens.append(token)
-    await user.save()
+    token = UserToken.new()
+    await user.add_token(token)
     print(f"Token created: {token.value}")
     return 0
 
@@ -0,0 +1,128 @@
+"""Replay generated Stripe webhooks through /stripe/fulfill and report throughput."""
+
+import asyncio as aio
+import io
+from contextlib import redirect_stdout
+from statistics import quantiles
+from time import monotonic
+
+import typer
+from loader import CONFIG
+
+# Keep emails on the console, billing on the fake and background tasks under our control
+CONFIG.testing = True
+CONFIG.mail_console = True
+CONFIG.usage_rollup_interval = 0
+CONFIG.stripe_sign_secret = "whsec_bench"
+
+from httpx import ASGITransport, AsyncClient
+
+from account.main import app
+from account.models.plan import Plan
+from account.models.user import User
+from account.models.webhook import WebhookEvent
+from account.util.billing import billing
+from account.util.webhook import webhook_worker
+from tests.data import add_plans
+from tests.fake_stripe import EventGenerator, FakeHTTPClient, FakeStripe
+
+Event = tuple[bytes, dict[str, str]]
+
+
+def _percentiles(values: list[float]) -> str:
+    if len(values) < 2:
+        return "n/a"
+    cuts = quantiles(values, n=100)
+    return f"p50 {cuts[49] * 1000:.1f}ms, p99 {cuts[98] * 1000:.1f}ms"
+
+
+async def _seed(customers: int, failed_ratio: float, generator: EventGenerator) -> list[Event]:
+    """Create free users and interleave each one's checkout and invoice events."""
+    await add_plans("free", "pro")
+    free = await Plan.by_key("free")
+    users = [User(email=f"bench{i}@test.io", password="", plan=free) for i in range(customers)]
+    await User.insert_many(users)
+    streams = []
+    for i, user in enumerate(await User.find_all().to_list()):
+        customer_id, checkout = generator.checkout_completed(str(user.id), user.email, "price_pro")
+        stream = [checkout]
+        if i < customers * failed_ratio:
+            stream += [generator.invoice(customer_id, paid=False, attempt=n) for n in (1, 2)]
+        stream.append(generator.invoice(customer_id, paid=True))
+        streams.append(stream)
+    # Round-robin so each customer's events arrive in order but spread across the run
+    events = []
+    for step in range(max(len(stream) for stream in streams)):
+        events += [stream[step] for stream in streams if step < len(stream)]
+    return events
+
+
+async def _replay(client: AsyncClient, events: list[Event], concurrency: int) -> list[float]:
+    """Post every event and return each acknowledgement latency."""
+    limit = aio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def post(payload: bytes, headers: dict[str, str]) -> None:
+        async with limit:
+            start = monotonic()
+            resp = await client.post("/stripe/fulfill", content=payload, headers=headers)
+            latencies.append(monotonic() - start)
+            resp.raise_for_status()
+
+    await aio.gather(*(post(*event) for event in events))
+    return latencies
+
+
+async def _drain() -> None:
+    """Wait until every event has been processed or has failed."""
+    while await WebhookEvent.find({"status": {"$in": ["pending", "processing"]}}).count():
+        await aio.sleep(0.1)
+
+
+async def main(customers: int, failed_ratio: float, concurrency: int, workers: int, database: str) -> None:
+    """Seed a bench database, replay events and print the results."""
+    if database == "account":
+        msg = "Refusing to benchmark against the main database"
+        raise ValueError(msg)
+    CONFIG.database = database
+    fake = FakeStripe()
+    billing.use_http_client(FakeHTTPClient(fake))
+    async with app.router.lifespan_context(app):
+        db = app.state.db
+        for name in await db.list_collection_names():
+            await db[name].delete_many({})
+        events = await _seed(customers, failed_ratio, EventGenerator(fake, CONFIG.stripe_sign_secret))
+        print(f"Replaying {len(events)} events for {customers} customers")
+        with redirect_stdout(io.StringIO()):
+            tasks = [aio.create_task(webhook_worker()) for _ in range(workers)]
+            start = monotonic()
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:  # type: ignore
+                latencies = await _replay(client, events, concurrency)
+            acked = monotonic() - start
+            await _drain()
+            drained = monotonic() - start
+            for task in tasks:
+                task.cancel()
+        done = await WebhookEvent.find(WebhookEvent.status == "done").to_list()
+        failed = await WebhookEvent.find(WebhookEvent.status == "failed").count()
+        lags = [(event.processed - event.received).total_seconds() for event in done if event.processed]
+    print(f"Fulfill: {len(events) / acked:.0f} events/s, {_percentiles(latencies)}")
+    print(
+        f"Processed: {len(done) / drained:.0f} events/s, {len(done)} done, {failed} failed, {fake.requests} Stripe calls"
+    )
+    print(f"Receive to done: {_percentiles(lags)}")
+
+
+def bench_webhooks(
+    customers: int = 1000,
+    failed_ratio: float = 0.2,
+    concurrency: int = 32,
+    workers: int = CONFIG.webhook_workers,
+    database: str = "account-bench",
+) -> None:
+    """Replay checkout, invoice paid and invoice failed events against a local fake Stripe."""
+    aio.run(main(customers, failed_ratio, concurrency, workers, database))
+
+
+if __name__ == "__main__":
+    typer.run(bench_webhooks)
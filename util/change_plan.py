@@ -6,6 +6,7 @@ import typer
 from loader import load_models
 
 from account.models.addon import Addon
+from account.models.subscription import SubscriptionMirror
 from account.models.user import Plan, User
 from account.util.stripe import cancel_subscription, change_subscription
 
@@ -30,7 +31,7 @@ async def _change_plan(user: User, plan: Plan, *, remove_addons: bool) -> int:
 
 async def main(email: str, plan: str, *, remove_addons: bool) -> int:
     """Update a user's plan information."""
-    await load_models(Addon, Plan, User)
+    await load_models(Addon, Plan, SubscriptionMirror, User)
 
     user = await User.by_email(email)
     if not user:
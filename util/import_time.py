@@ -0,0 +1,74 @@
+"""Measure how long the server takes to import and which SDKs it loads."""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+from statistics import median
+from typing import Any
+
+import loader  # noqa: F401
+import typer
+
+from account.startup import LAZY_IMPORTS
+
+ROOT = Path(__file__).parent.parent.absolute()
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import account.main
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def _probe() -> tuple[dict[str, Any], str]:
+    """Import the app in a fresh interpreter. Returns its stats and the -X importtime log."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", PROBE % (LAZY_IMPORTS,)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.splitlines()[-1]), proc.stderr
+
+
+def _top_packages(log: str, count: int) -> list[tuple[str, float]]:
+    """Return the slowest third-party packages. Times include the packages each one imports."""
+    totals: dict[str, float] = {}
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if "." not in name and name != "account" and cumulative.strip().isdigit():
+            totals.setdefault(name, int(cumulative) / 1_000_000)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def import_time(runs: int = 5, top: int = 10, output: Path | None = None) -> None:
+    """Import account.main in fresh interpreters and report the median time, memory and loaded SDKs."""
+    results = [_probe() for _ in range(runs)]
+    stats = [result[0] for result in results]
+    lines = [
+        f"account.main import: {median(stat['seconds'] for stat in stats):.3f}s median of {runs} runs",
+        f"Max RSS after import: {median(stat['max_rss_mb'] for stat in stats):.1f} MB",
+        f"Lazy SDKs loaded: {', '.join(stats[0]['loaded']) or 'none'}",
+        "",
+        "Slowest packages (cumulative, last run):",
+        *(f"  {name:<24} {seconds:.3f}s" for name, seconds in _top_packages(results[-1][1], top)),
+    ]
+    report = "\n".join(lines)
+    print(report)
+    if output:
+        output.write_text(report + "\n")
+
+
+if __name__ == "__main__":
+    typer.run(import_time)
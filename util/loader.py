@@ -6,15 +6,15 @@ from pathlib import Path
 
 # library
 from beanie import Document, init_beanie
-from motor.motor_asyncio import AsyncIOMotorClient
 
 sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
 
 # module
 from account.config import CONFIG
+from account.models.database import mongo_client
 
 
 async def load_models(*model: Document) -> None:
     """Initialize beanie models."""
-    db = AsyncIOMotorClient(CONFIG.mongo_uri).account
+    db = mongo_client()[CONFIG.database]
     await init_beanie(db, document_models=model)
@@ -0,0 +1,20 @@
+"""Move embedded user notifications into the notification collection."""
+
+import asyncio as aio
+
+from loader import load_models
+
+from account.models.notification import Notification
+from account.models.user import User
+from account.util.migration import move_notifications
+
+
+async def main() -> None:
+    """Move embedded user notifications into the notification collection. Safe to re-run."""
+    await load_models(Notification, User)
+    moved = await move_notifications()
+    print(f"Moved {moved} notifications")
+
+
+if __name__ == "__main__":
+    aio.run(main())
@@ -0,0 +1,40 @@
+"""Compare user billing fields with Stripe subscriptions."""
+
+import asyncio as aio
+
+import typer
+from loader import load_models
+
+from account.models.addon import Addon
+from account.models.plan import Plan
+from account.models.subscription import SubscriptionMirror
+from account.models.user import User
+from account.util.reconcile import Mismatch, reconcile
+
+
+def _print(mismatch: Mismatch) -> None:
+    print(f"{mismatch.email}: {mismatch.field} is {mismatch.stored!r}, Stripe has {mismatch.stripe!r}")
+
+
+async def main(*, fix: bool, batch_size: int, concurrency: int) -> int:
+    """Report and optionally fix billing drift for every billed user."""
+    await load_models(Addon, Plan, SubscriptionMirror, User)
+    report = await reconcile(fix=fix, batch_size=batch_size, concurrency=concurrency, report=_print)
+    print(
+        f"Checked {report.checked} users in {report.elapsed:.1f}s ({report.rate:.1f}/s). "
+        f"{report.mismatched} mismatched, {report.fixed} fixed, {report.errors} errors"
+    )
+    return 1 if report.errors or (report.mismatched and not fix) else 0
+
+
+def reconcile_billing(
+    fix: bool = False,
+    batch_size: int = 100,
+    concurrency: int = 8,
+) -> None:
+    """Compare user plans and addons with Stripe. Set STRIPE_API_BASE to use a local fake."""
+    raise typer.Exit(aio.run(main(fix=fix, batch_size=batch_size, concurrency=concurrency)))
+
+
+if __name__ == "__main__":
+    typer.run(reconcile_billing)
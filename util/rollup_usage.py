@@ -0,0 +1,37 @@
+"""Refresh or backfill monthly token usage rollups."""
+
+import asyncio as aio
+from uuid import uuid4
+
+import typer
+from loader import load_models
+
+from account.config import CONFIG
+from account.models.token import TokenUsage, TokenUsageMonth, UserUsageMonth
+from account.util.lease import acquire_lease, lease_collection, release_lease
+from account.util.rollup import LEASE, refresh_rollups
+
+
+async def main(*, backfill: bool) -> int:
+    """Refresh or backfill monthly token usage rollups unless a server is already refreshing them."""
+    await load_models(TokenUsage, TokenUsageMonth, UserUsageMonth)
+    leases = lease_collection(TokenUsageMonth)
+    owner = f"rollup_usage-{uuid4().hex}"
+    if not await acquire_lease(leases, LEASE, owner, CONFIG.usage_rollup_lease):
+        print("Another process is refreshing rollups. Try again later")
+        return 1
+    try:
+        count = await refresh_rollups(backfill=backfill)
+    finally:
+        await release_lease(leases, LEASE, owner)
+    print(f"Updated {count} token months")
+    return 0
+
+
+def rollup_usage(backfill: bool = False) -> None:
+    """Refresh monthly rollups. Backfill recomputes every month from all daily usage."""
+    raise typer.Exit(aio.run(main(backfill=backfill)))
+
+
+if __name__ == "__main__":
+    typer.run(rollup_usage)
@@ -0,0 +1,46 @@
+"""Create and verify the indexes declared on every document model."""
+
+import asyncio as aio
+from time import monotonic
+
+import typer
+from loader import CONFIG
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from account.app import DOCUMENTS
+from account.models.database import init_models, mongo_client
+
+
+async def _index_names(db: AsyncIOMotorDatabase, names: list[str]) -> dict[str, set[str]]:
+    return {name: set(await db[name].index_information()) for name in names}
+
+
+async def main(*, drop: bool) -> int:
+    """Build missing indexes and print what changed in each collection."""
+    db = mongo_client()[CONFIG.database]
+    await init_models(db, DOCUMENTS, skip_indexes=True)
+    names = [model.get_collection_name() for model in DOCUMENTS]
+    before = await _index_names(db, names)
+    start = monotonic()
+    await init_models(db, DOCUMENTS, drop_indexes=drop)
+    elapsed = monotonic() - start
+    after = await _index_names(db, names)
+    changed = 0
+    for name in names:
+        created, dropped = after[name] - before[name], before[name] - after[name]
+        changed += len(created) + len(dropped)
+        status = ", ".join(
+            [*(f"created {index}" for index in sorted(created)), *(f"dropped {index}" for index in sorted(dropped))]
+        )
+        print(f"{name}: {len(after[name])} indexes{f' ({status})' if status else ''}")
+    print(f"Verified {len(names)} collections in {elapsed:.1f}s. {changed} indexes changed")
+    return 0
+
+
+def sync_indexes(drop: bool = False) -> None:
+    """Build missing indexes before starting workers with SKIP_INDEXES. Drop removes undeclared indexes."""
+    raise typer.Exit(aio.run(main(drop=drop)))
+
+
+if __name__ == "__main__":
+    typer.run(sync_indexes)